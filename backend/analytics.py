@@ -0,0 +1,170 @@
+"""Fleet utilization and revenue over a date window, computed with numpy.
+
+Bookings overlapping the window are fetched as columns rather than rows: each
+column comes back as one comma-separated string (string_agg / group_concat)
+of day numbers since 1970-01-01, which numpy parses straight into an int
+array. From there everything is array arithmetic:
+
+* each booking is clipped to the window, [start, end) in day offsets;
+* +1 at every start and -1 at every end, accumulated with bincount and
+  cumsum, gives the number of cars occupied on each day (and the same with
+  price weights gives revenue per day);
+* np.add.reduceat sums the days into day / week / month buckets;
+* bincount over the car index gives the per-car totals.
+
+Non-cancelled bookings count as occupied. Revenue is days x the car's current
+price_per_day (the same figure the confirmation email quotes), split into
+confirmed revenue and the pending pipeline.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select, func, cast, case, Integer, Text, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from models import db, Car, Booking
+
+BUCKETS = ('day', 'week', 'month')
+MAX_WINDOW_DAYS = 366 * 20
+EPOCH = date(1970, 1, 1)
+
+
+def _day_number(column, dialect):
+    """Days since 1970-01-01 for a Date column, as an integer SQL expression."""
+    if dialect == 'postgresql':
+        return column - literal_column("DATE '1970-01-01'")
+    return cast(func.julianday(column) - 2440587.5, Integer)
+
+
+def _column_agg(expr, dialect):
+    if dialect == 'postgresql':
+        return func.string_agg(cast(expr, Text), aggregate_order_by(literal_column("','"), Booking.id))
+    return func.group_concat(expr, ',')
+
+
+def _parse(column):
+    if not column:
+        return np.empty(0, dtype=np.int64)
+    return np.array(column.split(','), dtype=np.int64)
+
+
+def load_intervals(start, end, car_ids=None):
+    """(car_id, start_day, end_day, confirmed) int arrays for bookings overlapping [start, end).
+
+    ``car_ids`` limits it to those cars.
+    """
+    dialect = db.session.get_bind().dialect.name
+    columns = (
+        Booking.car_id,
+        _day_number(Booking.start_date, dialect),
+        _day_number(Booking.end_date, dialect),
+        case((Booking.status == 'confirmed', 1), else_=0),
+    )
+    query = (
+        select(*(_column_agg(column, dialect) for column in columns))
+        .where(Booking.overlapping(start, end))
+    )
+    if car_ids is not None:
+        query = query.where(Booking.car_id.in_(car_ids))
+    row = db.session.execute(query).one()
+    return tuple(_parse(column) for column in row)
+
+
+def bucket_edges(start, end, bucket):
+    """Day offsets from ``start`` where each bucket begins, plus the window length."""
+    days = (end - start).days
+    first = np.datetime64(start, 'D')
+    if bucket == 'day':
+        edges = np.arange(days)
+    elif bucket == 'week':
+        # Weeks start on Monday; day 0 of datetime64 (1970-01-01) was a Thursday
+        offset = (7 - (first.astype(np.int64) - 4) % 7) % 7
+        edges = np.concatenate(([0], np.arange(offset, days, 7)))
+    else:
+        months = np.arange(first.astype('datetime64[M]') + 1,
+                           np.datetime64(end, 'D').astype('datetime64[M]') + 1)
+        edges = np.concatenate(([0], (months.astype('datetime64[D]') - first).astype(np.int64)))
+    edges = np.unique(edges[edges < days])
+    return edges, days
+
+
+def utilization(start, end, bucket='day', intervals=None):
+    """Per-car, per-bucket and fleet-wide occupancy and revenue for [start, end).
+
+    ``intervals`` can pass in an earlier ``load_intervals(start, end)`` result.
+    """
+    cars = db.session.execute(
+        select(Car.id, Car.brand, Car.model, Car.price_per_day).order_by(Car.id)
+    ).all()
+    car_ids = np.array([car.id for car in cars], dtype=np.int64)
+    prices = np.array([car.price_per_day for car in cars], dtype=np.float64)
+
+    car_id, first_day, last_day, confirmed = intervals or load_intervals(start, end)
+    # The cars and the bookings are two reads: drop bookings of a car added in
+    # between, which has no place in car_ids
+    known = np.isin(car_id, car_ids)
+    if not known.all():
+        car_id, first_day, last_day, confirmed = (column[known] for column in
+                                                  (car_id, first_day, last_day, confirmed))
+    window_start = (start - EPOCH).days
+    edges, days = bucket_edges(start, end, bucket)
+
+    # Clip to the window, as offsets from its first day
+    lo = np.clip(first_day - window_start, 0, days)
+    hi = np.clip(last_day - window_start, 0, days)
+    length = hi - lo
+    car_index = np.searchsorted(car_ids, car_id)
+    price = prices[car_index] if len(car_ids) else np.zeros(len(car_id))
+    confirmed = confirmed.astype(bool)
+
+    def per_day(weights=None):
+        change = (np.bincount(lo, weights=weights, minlength=days + 1)
+                  - np.bincount(hi, weights=weights, minlength=days + 1))
+        return np.cumsum(change)[:days]
+
+    occupied = per_day()
+    revenue = per_day(np.where(confirmed, price, 0.0))
+    pending = per_day(np.where(confirmed, 0.0, price))
+
+    occupied_by_bucket = np.add.reduceat(occupied, edges) if days else occupied
+    revenue_by_bucket = np.add.reduceat(revenue, edges) if days else revenue
+    bucket_days = np.diff(np.append(edges, days))
+    capacity = bucket_days * len(car_ids)
+
+    car_days = np.bincount(car_index, weights=length, minlength=len(car_ids))
+    car_revenue = np.bincount(car_index, weights=np.where(confirmed, length * price, 0.0),
+                              minlength=len(car_ids))
+    car_bookings = np.bincount(car_index, minlength=len(car_ids))
+
+    def ratio(numerator, denominator):
+        return np.round(np.divide(numerator, denominator, out=np.zeros(len(numerator)),
+                                  where=denominator > 0), 4)
+
+    bucket_starts = [start + timedelta(days=int(day)) for day in edges]
+    return {
+        'from': start,
+        'to': end,
+        'bucket': bucket,
+        'fleet_size': len(car_ids),
+        'fleet': {
+            'bookings': int(len(length)),
+            'occupied_days': int(occupied.sum()),
+            'available_days': days * len(car_ids),
+            'utilization': round(float(occupied.sum()) / (days * len(car_ids)), 4) if len(car_ids) and days else 0.0,
+            'revenue': round(float(revenue.sum()), 2),
+            'pending_revenue': round(float(pending.sum()), 2),
+        },
+        'buckets': [
+            {'start': bucket_start, 'end': bucket_end, 'occupied_days': int(days_), 'utilization': float(rate),
+             'revenue': round(float(amount), 2)}
+            for bucket_start, bucket_end, days_, rate, amount in zip(
+                bucket_starts, bucket_starts[1:] + [end], occupied_by_bucket,
+                ratio(occupied_by_bucket, capacity), revenue_by_bucket)
+        ],
+        'cars': [
+            {'car_id': car.id, 'brand': car.brand, 'model': car.model, 'bookings': int(count),
+             'occupied_days': int(days_), 'utilization': float(rate), 'revenue': round(float(amount), 2)}
+            for car, count, days_, rate, amount in zip(
+                cars, car_bookings, car_days, ratio(car_days, np.full(len(car_ids), days)), car_revenue)
+        ],
+    }
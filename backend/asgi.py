@@ -0,0 +1,11 @@
+"""ASGI entry point: catalog and review reads on an async engine, everything else as under WSGI.
+
+    uvicorn asgi:app --workers 4 --port 8000
+
+See async_reads.py. The same settings and environment apply as for wsgi.py,
+and the database must be a file or a server (not the test profile's in-memory one).
+"""
+from app import create_app
+from async_reads import AsyncReads
+
+app = AsyncReads(create_app())
@@ -0,0 +1,295 @@
+"""Catalog and review reads on an async engine, for serving the API under ASGI.
+
+    uvicorn asgi:app --workers 4
+
+Browsing - ``GET /cars``, ``GET /cars/<id>`` and ``GET /reviews/car/<id>/`` -
+is nearly all waiting on the database. Under WSGI every waiting request holds a
+worker thread, so a process serves as many of them at once as it has threads.
+Here those routes run as coroutines on an async SQLAlchemy engine (aiosqlite,
+asyncpg) over the same models, schemas and keyset pagination as the Flask
+views: a process serves as many at once as its connection pool allows
+(``DB_POOL_SIZE`` + ``DB_MAX_OVERFLOW``), and the rest wait without holding a
+thread. Every other request goes to the Flask app on a pool of
+``ASGI_WSGI_THREADS`` threads, unchanged.
+
+The async routes answer like the Flask ones: the same bodies, ETag /
+Last-Modified and 304s from resource_versions, pagination headers, CORS, the
+ip and route limits in RATE_LIMITS and the request metrics. They read from
+``ASYNC_DATABASE_URI`` (env ASYNC_DATABASE_URL), by default the primary. The
+replica router's rules (read-your-writes, fresh ETags) aren't applied here, so
+point it at a replica only if its lag doesn't matter. An in-memory database
+(test profile) can't be shared with a second engine, so use a file or a server.
+"""
+import asyncio
+import logging
+import math
+import re
+import time
+from urllib.parse import parse_qsl
+
+import orjson
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+from config import database_uri, engine_options
+from metrics import metrics
+from models import Car, CAR_STATUSES
+from pagination import page_query
+from ratelimit import MemoryBackend, client_ip, rate_limiter
+from serializers import CAR, CAR_REVIEW, STREAM_CHUNK_SIZE, car_reviews_select
+from versions import resource_versions
+from views.car import CAR_SORTS, filter_by_price
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_engine_args(config, uri):
+    """(URL, create_async_engine options) for ``uri`` and the DB_* settings."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend}; use SQLite or PostgreSQL")
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        raise ValueError("An in-memory database can't be shared with the async engine; use a file")
+
+    options = engine_options(config, uri)
+    connect_args = {}
+    if options.pop('connect_args', None):
+        # libpq's "-c statement_timeout=..." in asyncpg's terms
+        connect_args['server_settings'] = {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}
+    if 'sslmode' in url.query:
+        # asyncpg takes ssl=, not libpq's sslmode=
+        connect_args['ssl'] = url.query['sslmode']
+        url = url.difference_update_query(['sslmode'])
+    if connect_args:
+        options['connect_args'] = connect_args
+    return url.set(drivername=ASYNC_DRIVERS[backend]), options
+
+
+class Request:
+    def __init__(self, scope):
+        self.scope = scope
+        self.headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        self.args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+
+    @property
+    def base_url(self):
+        host = self.headers.get('host') or '{}:{}'.format(*self.scope['server'])
+        return f"{self.scope['scheme']}://{host}{self.scope.get('root_path', '')}{self.scope['path']}"
+
+    def client_ip(self, hops):
+        remote_addr = self.scope['client'][0] if self.scope.get('client') else None
+        forwarded = self.headers.get('x-forwarded-for')
+        access_route = [ip.strip() for ip in forwarded.split(',')] if forwarded else [remote_addr]
+        return client_ip(hops, access_route, remote_addr)
+
+
+def json_error(status, message, headers=None):
+    return status, orjson.dumps({'error': message}), headers or {}
+
+
+#=========================app=========================
+class AsyncReads:
+    """ASGI app: the read routes below on the async engine, the rest to ``flask_app``."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+        config.setdefault('ASYNC_DATABASE_URI', None)
+        config.setdefault('ASGI_WSGI_THREADS', 10)
+        uri = config['ASYNC_DATABASE_URI'] or config['SQLALCHEMY_DATABASE_URI']
+        self.url, self.options = async_engine_args(config, database_uri(uri))
+        self.engine = None
+        self.wsgi = WSGIMiddleware(flask_app, workers=config['ASGI_WSGI_THREADS'])
+        # (path, endpoint and rule of the Flask view it stands in for, handler)
+        self.routes = [
+            (re.compile(r'/cars'), 'car_bp.fetch_all_cars', '/cars', self.fetch_all_cars),
+            (re.compile(r'/cars/(\d+)/?'), 'car_bp.fetch_car', '/cars/<int:car_id>/', self.fetch_car),
+            (re.compile(r'/reviews/car/(\d+)/'), 'review.get_reviews_by_car', '/reviews/car/<int:car_id>/',
+             self.get_reviews_by_car),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, endpoint, rule, handler in self.routes:
+                match = pattern.fullmatch(scope['path'])
+                if match:
+                    return await self.serve(Request(scope), send, endpoint, rule, handler,
+                                            *map(int, match.groups()))
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # The version cache reads its first versions with a blocking query
+                await asyncio.get_running_loop().run_in_executor(None, resource_versions.current)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.engine is not None:
+                    await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def connect(self):
+        if self.engine is None:
+            self.engine = create_async_engine(self.url, **self.options)
+        return self.engine.connect()
+
+    #=========================requests=========================
+    async def serve(self, request, send, endpoint, rule, handler, *args):
+        started = time.perf_counter()
+        recording = self.flask_app.config['METRICS_ENABLED']
+        if recording:
+            metrics.in_flight.inc()
+        status = 500
+        slots = rate_limiter.slots.get(endpoint)
+        acquired = False
+        try:
+            response = await self.rate_limited(request, endpoint)
+            if response is None and slots is not None:
+                acquired = slots.acquire(blocking=False)
+                if not acquired:
+                    response = json_error(503, 'Server busy, please try again shortly', {'Retry-After': '1'})
+            if response is None:
+                try:
+                    response = await handler(request, *args)
+                except Exception:
+                    logger.exception("Error serving %s %s", request.scope['method'], request.scope['path'])
+                    response = json_error(500, 'Internal server error')
+            status, body, headers = response
+            await self.send(send, request, status, body, headers)
+        finally:
+            if acquired:
+                slots.release()
+            if recording:
+                metrics.record_request('GET', rule, str(status), time.perf_counter() - started)
+
+    async def rate_limited(self, request, endpoint):
+        """429 as RateLimiter would answer it, or None."""
+        wait = 0.0
+        for kind, rate, capacity in rate_limiter.rules.get(endpoint, ()):
+            if kind == 'ip':
+                key = request.client_ip(self.flask_app.config['TRUSTED_PROXY_HOPS'])
+            elif kind == 'route':
+                key = 'all'
+            else:
+                continue  # user and email limits are for writes, not these public reads
+            take = rate_limiter.backend.take
+            if isinstance(rate_limiter.backend, MemoryBackend):
+                wait = max(wait, take(f'{endpoint}:{kind}:{key}', rate, capacity))
+            else:
+                # Shared storage is a network round trip: keep it off the event loop
+                wait = max(wait, await asyncio.get_running_loop().run_in_executor(
+                    None, take, f'{endpoint}:{kind}:{key}', rate, capacity))
+        if wait:
+            return json_error(429, 'Too many requests, please try again later', {'Retry-After': str(math.ceil(wait))})
+        return None
+
+    async def send(self, send, request, status, body, headers):
+        headers = {**headers, **self.cors_headers(request)}
+        if status != 304:
+            headers['Content-Type'] = 'application/json'
+        if isinstance(body, bytes):
+            headers['Content-Length'] = str(len(body))
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in headers.items()]})
+        if isinstance(body, bytes):
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        async for chunk in body:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def cors_headers(self, request):
+        # What CORS(app) sends on the Flask side
+        expose = {'Access-Control-Expose-Headers': 'Link, X-Last-Write, X-Next-Cursor'}
+        origin = request.headers.get('origin')
+        if origin:
+            return {'Access-Control-Allow-Origin': origin, 'Vary': 'Origin', **expose}
+        return {'Access-Control-Allow-Origin': '*', **expose}
+
+    async def conditional(self, request, names, view):
+        """``view()`` with ETag / Last-Modified, or 304, as versions.conditional serves it."""
+        # Read the version before the data, as the Flask views do
+        etag, last_modified = resource_versions.current(*names)
+        not_modified = False
+        if 'if-none-match' in request.headers:
+            not_modified = parse_etags(request.headers['if-none-match']).contains(etag)
+        elif 'if-modified-since' in request.headers and last_modified:
+            since = parse_date(request.headers['if-modified-since'])
+            not_modified = since is not None and last_modified.replace(microsecond=0) <= since
+
+        if not_modified:
+            status, body, headers = 304, b'', {}
+        else:
+            status, body, headers = await view()
+            if status != 200:
+                return status, body, headers
+
+        headers = {**headers, 'ETag': quote_etag(etag), 'Cache-Control': 'no-cache'}
+        if last_modified:
+            headers['Last-Modified'] = http_date(last_modified)
+        return status, body, headers
+
+    #=========================routes=========================
+    async def fetch_all_cars(self, request):
+        return await self.conditional(request, ('cars',), lambda: self._fetch_all_cars(request))
+
+    async def _fetch_all_cars(self, request):
+        args = request.args
+        statement = select(*CAR.columns)
+        brand = args.get('brand')
+        status = args.get('status')
+        if brand:
+            statement = statement.where(Car.brand == brand)
+        if status:
+            if status not in CAR_STATUSES:
+                return json_error(400, 'Invalid status')
+            statement = statement.where(Car.status == status)
+
+        try:
+            statement = filter_by_price(statement, args)
+            statement, page = page_query(statement, Car, CAR_SORTS, args)
+        except ValueError as e:
+            return json_error(400, str(e))
+
+        async with self.connect() as conn:
+            page = page((await conn.execute(statement)).all())
+        return 200, orjson.dumps(CAR.dump_many(page.items)), page.headers(request.base_url, args.to_dict())
+
+    async def fetch_car(self, request, car_id):
+        return await self.conditional(request, ('cars',), lambda: self._fetch_car(car_id))
+
+    async def _fetch_car(self, car_id):
+        async with self.connect() as conn:
+            car = (await conn.execute(select(*CAR.columns).where(Car.id == car_id))).first()
+        if not car:
+            return json_error(404, 'Car not found')
+        return 200, orjson.dumps(CAR.dump(car)), {}
+
+    async def get_reviews_by_car(self, request, car_id):
+        return await self.conditional(request, ('reviews', 'cars'), lambda: self._get_reviews_by_car(car_id))
+
+    async def _get_reviews_by_car(self, car_id):
+        async def body():
+            # A JSON array, fetched and sent STREAM_CHUNK_SIZE rows at a time
+            async with self.connect() as conn:
+                result = await conn.stream(
+                    car_reviews_select(car_id).execution_options(yield_per=STREAM_CHUNK_SIZE))
+                yield b'['
+                separator = b''
+                async for rows in result.partitions():
+                    yield separator + CAR_REVIEW.json_items(rows)
+                    separator = b','
+                yield b']'
+        return 200, body(), {}
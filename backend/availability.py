@@ -0,0 +1,151 @@
+"""Per-car availability calendars as day bitmaps.
+
+A car-month is stored as 4 bytes: bit ``i`` (little-endian within each byte)
+is set when day ``i + 1`` of the month is blocked by a non-cancelled booking,
+i.e. falls in its [start_date, end_date) - the same rule the overlap check
+uses, so the checkout day stays bookable. Responses concatenate the days of
+consecutive months and pack them again, one bit per day.
+
+Months are built with numpy from the booking intervals (one columnar query,
+see analytics.load_intervals, for all the missing car-months of a request)
+and cached per car-month in each worker. The cache belongs to one version of
+the ``bookings`` resource: creating, updating or deleting a booking bumps it
+(see versions.py), so the next read starts over - at once in the worker that
+wrote, within ``VERSION_SYNC_INTERVAL`` in the others.
+"""
+import base64
+import calendar
+import threading
+import zlib
+from collections import ChainMap
+from datetime import date
+
+import numpy as np
+from analytics import load_intervals, EPOCH
+from versions import resource_versions
+
+MONTH_BYTES = 4
+MAX_MONTHS = 12
+MAX_CACHED_MONTHS = 200000
+
+
+def parse_month(value):
+    """First day of a 'YYYY-MM' month; ValueError if malformed."""
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def add_months(first, count):
+    months = first.year * 12 + first.month - 1 + count
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def month_days(first):
+    return calendar.monthrange(first.year, first.month)[1]
+
+
+def build_months(car_ids, months):
+    """{(car_id, month): 4-byte bitmap} for every car in ``car_ids`` and month in ``months``."""
+    car_ids = np.array(sorted(car_ids), dtype=np.int64)
+    first, end = min(months), add_months(max(months), 1)
+    days = (end - first).days
+
+    # Small sets filter in SQL; for most of the fleet, reading everything is cheaper
+    car_id, first_day, last_day, _ = load_intervals(
+        first, end, car_ids.tolist() if len(car_ids) <= 500 else None)
+    known = np.isin(car_id, car_ids)
+    row = np.searchsorted(car_ids, car_id[known])
+    origin = (first - EPOCH).days
+    lo = np.clip(first_day[known] - origin, 0, days)
+    hi = np.clip(last_day[known] - origin, 0, days)
+
+    # +1 where a booking starts, -1 where it ends, per car; running sum > 0 is blocked
+    width = days + 1
+    size = len(car_ids) * width
+    change = (np.bincount(row * width + lo, minlength=size)
+              - np.bincount(row * width + hi, minlength=size)).reshape(len(car_ids), width)
+    blocked = np.cumsum(change, axis=1)[:, :days] > 0
+
+    bitmaps = {}
+    for month in months:
+        offset = (month - first).days
+        bits = np.zeros((len(car_ids), MONTH_BYTES * 8), dtype=bool)
+        bits[:, :month_days(month)] = blocked[:, offset:offset + month_days(month)]
+        packed = np.packbits(bits, axis=1, bitorder='little')
+        for car, bitmap in zip(car_ids.tolist(), packed):
+            bitmaps[car, month] = bitmap.tobytes()
+    return bitmaps
+
+
+class CalendarCache:
+    def __init__(self, max_entries=MAX_CACHED_MONTHS):
+        self.max_entries = max_entries
+        self._months = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def blocked_days(self, car_ids, first, months):
+        """Bool array (cars x days) of blocked days for ``months`` months from ``first``."""
+        # Read the version before the data, as @conditional does
+        generation = resource_versions.current('bookings')[0]
+        starts = [add_months(first, i) for i in range(months)]
+
+        with self._lock:
+            if generation != self._generation:
+                self._months, self._generation = {}, generation
+            cached = self._months
+
+        missing = [(car, month) for month in starts for car in car_ids if (car, month) not in cached]
+        if missing:
+            built = build_months({car for car, _ in missing}, sorted({month for _, month in missing}))
+            with self._lock:
+                if generation == self._generation:
+                    if len(self._months) + len(built) > self.max_entries:
+                        self._months = {}
+                    self._months.update(built)
+            cached = ChainMap(built, cached)
+
+        columns = []
+        for month in starts:
+            packed = np.frombuffer(b''.join(cached[car, month] for car in car_ids), dtype=np.uint8)
+            bits = np.unpackbits(packed.reshape(len(car_ids), MONTH_BYTES), axis=1, bitorder='little')
+            columns.append(bits[:, :month_days(month)].astype(bool))
+        return np.hstack(columns)
+
+    def clear(self):
+        with self._lock:
+            self._months = {}
+
+
+calendar_cache = CalendarCache()
+
+
+def encode(blocked):
+    """Pack a days bool array one bit per day, little-endian within each byte."""
+    return np.packbits(blocked, bitorder='little').tobytes()
+
+
+def car_calendar(car_id, first, months):
+    blocked = calendar_cache.blocked_days([car_id], first, months)[0]
+    return {
+        'car_id': car_id,
+        'from': first,
+        'to': add_months(first, months),
+        'days': len(blocked),
+        'bitmap': base64.b64encode(encode(blocked)).decode(),
+    }
+
+
+def fleet_calendar(car_ids, first, months):
+    """Every car's bitmap, padded to whole bytes and concatenated in ``car_ids`` order, then deflated."""
+    blocked = calendar_cache.blocked_days(car_ids, first, months)
+    rows = np.packbits(blocked, axis=1, bitorder='little')
+    return {
+        'from': first,
+        'to': add_months(first, months),
+        'days': blocked.shape[1],
+        'car_ids': list(car_ids),
+        'bytes_per_car': rows.shape[1],
+        'encoding': 'deflate',
+        'bitmap': base64.b64encode(zlib.compress(rows.tobytes(), 9)).decode(),
+    }
@@ -0,0 +1,134 @@
+"""Benchmark the fleet utilization analytics (analytics.utilization).
+
+Seeds a throwaway database with back-to-back bookings (about three years of
+them with the defaults), then times ``utilization()`` for day, week and month
+buckets over the whole span, split into the columnar load and the numpy
+computation. For reference it also runs the straightforward version: fetch
+rows, loop in Python.
+
+    python -m benchmarks.analytics_benchmark                   # in-memory SQLite, 2M bookings
+    python -m benchmarks.analytics_benchmark --bookings 5000000 --database-url postgresql://localhost/bench
+
+Use an empty scratch database: all tables in models.py are dropped first.
+"""
+import argparse
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+from flask import Flask
+from sqlalchemy import text
+
+import analytics
+from models import db, metadata, User, Car, Booking
+
+STATUSES = np.array(['confirmed', 'pending', 'cancelled'])
+
+
+def seed(cars, bookings, rng):
+    start = date(2023, 1, 1)
+    with db.engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {'id': 1, 'username': 'bench', 'email': 'bench@example.com', 'password_hash': 'x'}
+        ])
+        conn.execute(Car.__table__.insert(), [
+            {'id': i, 'brand': 'Toyota', 'model': f'Model {i}',
+             'price_per_day': float(rng.integers(20, 300) * 100), 'status': 'available'}
+            for i in range(1, cars + 1)
+        ])
+
+    # Back-to-back bookings per car with random lengths and gaps, never overlapping
+    per_car = bookings // cars
+    car_id = np.repeat(np.arange(1, cars + 1), per_car)
+    length = rng.integers(1, 8, len(car_id))
+    gap = rng.integers(0, 3, len(car_id))
+    step = (length + gap).reshape(cars, per_car)
+    offset = (np.cumsum(step, axis=1) - step).ravel()
+    span = int((offset + length).max())
+    status = STATUSES[rng.choice(3, len(car_id), p=[0.8, 0.1, 0.1])]
+
+    rows = [
+        (int(car), 1, (start + timedelta(days=int(first))).isoformat(),
+         (start + timedelta(days=int(first + days))).isoformat(), state, '2023-01-01 00:00:00')
+        for car, first, days, state in zip(car_id, offset, length, status)
+    ]
+    sql = ('INSERT INTO bookings (car_id, user_id, start_date, end_date, status, created_at) '
+           'VALUES (?, ?, ?, ?, ?, ?)')
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if db.engine.dialect.name != 'sqlite':
+            sql = sql.replace('?', '%s')
+        for i in range(0, len(rows), 100000):
+            cursor.executemany(sql, rows[i:i + 100000])
+        raw.commit()
+    finally:
+        raw.close()
+    return start, start + timedelta(days=span), len(rows)
+
+
+def python_loop(start, end):
+    """Per-day fleet occupancy and revenue the obvious way, for comparison."""
+    prices = dict(db.session.execute(db.select(Car.id, Car.price_per_day)).all())
+    occupied, revenue = defaultdict(int), defaultdict(float)
+    rows = db.session.execute(
+        db.select(Booking.car_id, Booking.start_date, Booking.end_date, Booking.status)
+        .where(Booking.overlapping(start, end))
+    )
+    for car_id, first, last, status in rows:
+        day = max(first, start)
+        while day < min(last, end):
+            occupied[day] += 1
+            if status == 'confirmed':
+                revenue[day] += prices[car_id]
+            day += timedelta(days=1)
+    return occupied, revenue
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--cars', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=2000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-loop', action='store_true', help='Skip the pure Python baseline')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    db.init_app(app)
+
+    with app.app_context():
+        metadata.drop_all(db.engine)
+        metadata.create_all(db.engine)
+        started = time.perf_counter()
+        start, end, count = seed(args.cars, args.bookings, np.random.default_rng(args.seed))
+        with db.engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+        print(f"Seeded {count} bookings for {args.cars} cars, {start} to {end}, "
+              f"in {time.perf_counter() - started:.1f}s on {db.engine.dialect.name}\n")
+
+        intervals, load_ms = timed(analytics.load_intervals, start, end)
+        print(f"columnar load of {len(intervals[0])} intervals: {load_ms:.0f}ms\n")
+
+        print(f"{'bucket':<8} {'buckets':>8} {'compute':>9}")
+        for bucket in analytics.BUCKETS:
+            result, compute_ms = timed(analytics.utilization, start, end, bucket, intervals)
+            print(f"{bucket:<8} {len(result['buckets']):>8} {compute_ms:>7.0f}ms")
+        print(f"\nfleet: {result['fleet']}")
+
+        if not args.skip_loop:
+            (occupied, _), loop_ms = timed(python_loop, start, end)
+            print(f"\npython loop (rows + per-day loop): {loop_ms:.0f}ms, "
+                  f"occupied days {sum(occupied.values())} (numpy: {result['fleet']['occupied_days']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""Concurrent connections per process: WSGI (gunicorn gthread) vs ASGI (asgi.py under uvicorn).
+
+Boots one server process in each mode on the same scratch SQLite database and
+drives the browse routes (``GET /cars?limit=20``, ``/cars/<id>``,
+``/reviews/car/<id>/``) with more and more keep-alive connections, from an
+asyncio client so the client itself stays cheap. For each number of
+connections it prints requests per second, p50/p99 latency and errors.
+
+A local SQLite answers in microseconds, which is not what browsing waits on in
+production. ``--db-latency-ms`` adds a round trip to every SQL statement (a
+sleep in the SQLite trace callback, on the thread that runs the statement:
+the request thread under WSGI, aiosqlite's connection thread under ASGI), like
+a database across the network. Under WSGI the process then serves at most
+``--threads`` requests at a time; under ASGI up to ``--pool-size`` (both use a
+pool of that size).
+
+    python -m benchmarks.asgi_benchmark
+    python -m benchmarks.asgi_benchmark --connections 32,128,512 --threads 32 --db-latency-ms 5
+    python -m benchmarks.asgi_benchmark --database-url postgresql://localhost/bench   # real latency
+
+``--database-url`` runs against an existing, migrated and seeded database (see
+``flask seed data``) instead of the scratch one, without added latency.
+Needs gunicorn, uvicorn and aiosqlite (or asyncpg).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the server process before the app is loaded
+LATENCY = """
+import os, time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+latency = float(os.environ.get('BENCHMARK_DB_LATENCY_MS', '0')) / 1000
+
+def round_trip(statement):
+    time.sleep(latency)
+
+@event.listens_for(Engine, 'connect')
+def add_latency(dbapi_connection, record):
+    if not latency:
+        return
+    if hasattr(dbapi_connection, 'run_async'):
+        # aiosqlite: set it on the sqlite3 connection, in aiosqlite's thread
+        dbapi_connection.run_async(lambda conn: conn.set_trace_callback(round_trip))
+    elif hasattr(dbapi_connection, 'set_trace_callback'):
+        dbapi_connection.set_trace_callback(round_trip)
+"""
+SERVERS = {
+    'wsgi': LATENCY + """
+import sys
+from gunicorn.app.wsgiapp import run
+port, threads = sys.argv[1:3]
+sys.argv = ['gunicorn', '-c', 'gunicorn.conf.py', '--workers', '1', '--worker-class', 'gthread',
+            '--threads', threads, '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null', 'wsgi:app']
+run()
+""",
+    'asgi': LATENCY + """
+import sys
+import uvicorn
+uvicorn.run('asgi:app', host='127.0.0.1', port=int(sys.argv[1]), workers=1, log_level='warning',
+            backlog=4096)
+""",
+}
+
+
+#=========================setup=========================
+def prepare(url, cars, reviews_per_car):
+    from sqlalchemy import insert
+    from app import create_app
+    from models import db, User, Car, Review
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': url, 'CREATE_TABLES': True, 'RATE_LIMIT_ENABLED': False})
+    with app.app_context():
+        db.session.execute(insert(User), [{'username': f'user{i}', 'email': f'user{i}@example.com',
+                                           'password_hash': '-', 'role': 'user', 'is_admin': False}
+                                          for i in range(1, 101)])
+        db.session.execute(insert(Car), [{'brand': 'Toyota', 'model': f'Corolla {i}', 'price_per_day': 2000 + i,
+                                          'status': 'available', 'image1': 'a.jpg', 'image2': 'b.jpg'}
+                                         for i in range(1, cars + 1)])
+        db.session.execute(insert(Review), [{'user_id': 1 + (i * 7) % 100, 'car_id': 1 + i % cars, 'rating': 4,
+                                             'comment': 'Smooth drive, would book again.'}
+                                            for i in range(cars * reviews_per_car)])
+        db.session.commit()
+
+
+def boot(mode, port, env, threads, log):
+    server = subprocess.Popen([sys.executable, '-c', SERVERS[mode], str(port), str(threads)],
+                              cwd=BACKEND, env=env, stdout=log, stderr=log)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'{mode} server exited; see {log.name}')
+        try:
+            status = asyncio.run(probe(port))
+            if status == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'{mode} server did not come up; see {log.name}')
+
+
+#=========================client=========================
+async def fetch(reader, writer, path):
+    """GET ``path`` on a keep-alive connection; returns the status."""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    return status
+
+
+async def probe(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        return await fetch(reader, writer, '/cars?limit=1')
+    finally:
+        writer.close()
+
+
+def pick_path(rng, cars):
+    roll = rng.random()
+    if roll < 0.4:
+        return '/cars?limit=20'
+    if roll < 0.7:
+        return f'/cars/{rng.randint(1, cars)}'
+    return f'/reviews/car/{rng.randint(1, cars)}/'
+
+
+async def drive(port, connections, duration, cars, timeout):
+    results = []  # (status, seconds)
+    deadline = time.monotonic() + duration
+
+    async def client(i):
+        rng = random.Random(i)
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port, limit=2 ** 20),
+                                                    timeout)
+        except (OSError, asyncio.TimeoutError):
+            results.append((0, timeout))
+            return
+        try:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(fetch(reader, writer, pick_path(rng, cars)), timeout)
+                except (OSError, ValueError, IndexError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    results.append((0, time.perf_counter() - started))
+                    return
+                results.append((status, time.perf_counter() - started))
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(connections)))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    ok = sorted(seconds * 1000 for status, seconds in results if status == 200)
+
+    def percentile(share):
+        return round(ok[min(len(ok) - 1, int(len(ok) * share))], 1) if ok else None
+
+    return {'rps': round(len(ok) / elapsed, 1), 'p50_ms': percentile(0.50), 'p99_ms': percentile(0.99),
+            'errors': sum(1 for status, _ in results if status != 200)}
+
+
+#=========================main=========================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', default='16,64,256', help='Comma-separated levels.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level.')
+    parser.add_argument('--db-latency-ms', type=float, default=5.0)
+    parser.add_argument('--threads', type=int, default=16, help='gthread threads of the WSGI worker.')
+    parser.add_argument('--pool-size', type=int, default=64, help='Database connections per process.')
+    parser.add_argument('--cars', type=int, default=500)
+    parser.add_argument('--reviews-per-car', type=int, default=20)
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--database-url', help='An existing seeded database instead of a scratch SQLite one.')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds before a request counts as failed.')
+    parser.add_argument('--port', type=int, default=5066)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+    levels = [int(level) for level in args.connections.split(',')]
+
+    with tempfile.TemporaryDirectory(prefix='asgi-benchmark-') as scratch:
+        url, latency = args.database_url, 0
+        if not url:
+            url, latency = f"sqlite:///{os.path.join(scratch, 'bench.db')}", args.db_latency_ms
+            prepare(url, args.cars, args.reviews_per_car)
+        env = {**os.environ, 'APP_PROFILE': 'local', 'DATABASE_URL': url,
+               'JWT_SECRET_KEY': 'benchmark-secret', 'RATE_LIMIT_ENABLED': '0',
+               'QUERY_INSPECTOR': '0', 'DB_POOL_SIZE': str(args.pool_size), 'DB_MAX_OVERFLOW': '0',
+               'DB_POOL_TIMEOUT': str(args.timeout), 'BENCHMARK_DB_LATENCY_MS': str(latency)}
+
+        results = {}
+        for mode in args.modes.split(','):
+            with open(os.path.join(scratch, f'{mode}.log'), 'w') as log:
+                server = boot(mode, args.port, env, args.threads, log)
+                try:
+                    for connections in levels:
+                        run = asyncio.run(drive(args.port, connections, args.duration, args.cars, args.timeout))
+                        results.setdefault(mode, {})[connections] = summarize(*run)
+                finally:
+                    server.terminate()
+                    server.wait()
+
+    print(f"{args.db_latency_ms if latency else 0} ms per statement, WSGI {args.threads} threads, "
+          f"pool {args.pool_size}, {os.cpu_count()} CPUs")
+    print(f"{'connections':>11} " + ' '.join(f"{mode + ' req/s':>11} {'p50':>8} {'p99':>8} {'errors':>6}"
+                                           for mode in results))
+    for connections in levels:
+        row = []
+        for mode in results:
+            r = results[mode][connections]
+            row.append(f"{r['rps']:>11.1f} {r['p50_ms'] or 0:>6.1f}ms {r['p99_ms'] or 0:>6.1f}ms {r['errors']:>6}")
+        print(f"{connections:>11} " + ' '.join(row))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
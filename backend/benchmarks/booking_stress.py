@@ -0,0 +1,95 @@
+"""Fire parallel booking requests at one car and check nobody double-books it.
+
+Runs against a live API, e.g. one started with `flask run` on a local database:
+
+    python benchmarks/booking_stress.py --base-url http://127.0.0.1:5000 \
+        --admin-email admin11@gmail.com --admin-password admin --clients 50
+
+Exactly one request should get 201, the rest 400/409, and none a 5xx. Start
+the API with RATE_LIMIT_ENABLED=0, or the limits on POST /bookings answer
+most of the clients with 429/503 first.
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib import request as urlrequest
+from urllib.error import HTTPError
+
+
+def call(base_url, method, path, body=None, token=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urlrequest.Request(base_url + path, data=data, method=method)
+    req.add_header('Content-Type', 'application/json')
+    if token:
+        req.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urlrequest.urlopen(req) as res:
+            return res.status, json.loads(res.read() or b'null')
+    except HTTPError as e:
+        return e.code, json.loads(e.read() or b'null')
+
+
+def login(base_url, email, password):
+    status, body = call(base_url, 'POST', '/login', {'email': email, 'password_hash': password})
+    if status != 200:
+        sys.exit(f"Login failed for {email}: {status} {body}")
+    return body['access_token']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--admin-email', required=True)
+    parser.add_argument('--admin-password', required=True)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--start-date', default='2030-01-10')
+    parser.add_argument('--end-date', default='2030-01-15')
+    args = parser.parse_args()
+    base_url = args.base_url.rstrip('/')
+    run_id = uuid.uuid4().hex[:8]
+
+    admin_token = login(base_url, args.admin_email, args.admin_password)
+    status, body = call(base_url, 'POST', '/cars', {
+        'brand': 'Stress',
+        'model': f'Test {run_id}',
+        'image1': 'https://example.com/1.jpg',
+        'image2': 'https://example.com/2.jpg',
+        'price_per_day': 1000,
+    }, admin_token)
+    if status != 201:
+        sys.exit(f"Could not create car: {status} {body}")
+    car_id = body['car_id']
+
+    # One user per client, so the contention is on the car and not the user
+    tokens = []
+    for i in range(args.clients):
+        email = f'stress-{run_id}-{i}@example.com'
+        call(base_url, 'POST', '/users', {'username': f'stress-{run_id}-{i}', 'email': email, 'password': 'stress'})
+        tokens.append(login(base_url, email, 'stress'))
+
+    def book(token):
+        return call(base_url, 'POST', '/bookings', {
+            'car_id': car_id,
+            'start_date': args.start_date,
+            'end_date': args.end_date,
+        }, token)[0]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        statuses = Counter(pool.map(book, tokens))
+    elapsed = time.perf_counter() - started
+
+    print(f"car {car_id}: {args.clients} parallel bookings in {elapsed:.2f}s -> {dict(statuses)}")
+
+    errors = sum(count for code, count in statuses.items() if code >= 500)
+    if statuses[201] != 1 or errors:
+        sys.exit(f"FAIL: expected exactly one 201 and no 5xx")
+    print("OK: exactly one booking succeeded")
+
+
+if __name__ == '__main__':
+    main()
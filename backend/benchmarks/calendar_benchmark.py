@@ -0,0 +1,100 @@
+"""Size and latency of the availability calendars (availability.py).
+
+Seeds a fleet with a year of back-to-back bookings at a chosen occupancy,
+then builds the fleet-wide calendar for the whole year cold (empty cache)
+and warm, a single car's year, and prints the payload sizes next to the JSON
+list of bookings the date picker used to download.
+
+    python -m benchmarks.calendar_benchmark                    # in-memory SQLite, 1,000 cars
+    python -m benchmarks.calendar_benchmark --occupancy 0.3 --database-url postgresql://localhost/bench
+
+Use an empty scratch database: all tables in models.py are dropped first.
+"""
+import argparse
+import base64
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from flask import Flask
+
+from models import db, metadata, User, Car, Booking
+from versions import resource_versions
+from serializers import BOOKING
+from availability import calendar_cache, car_calendar, fleet_calendar
+
+
+def seed(cars, first, occupancy, rng):
+    with db.engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {'id': 1, 'username': 'bench', 'email': 'bench@example.com', 'password_hash': 'x'}
+        ])
+        conn.execute(Car.__table__.insert(), [
+            {'id': i, 'brand': 'Toyota', 'model': f'Model {i}', 'price_per_day': 5000.0, 'status': 'available'}
+            for i in range(1, cars + 1)
+        ])
+
+    # Rentals of 1-7 days (4 on average) with gaps sized for the target occupancy
+    bookings = []
+    mean_gap = 4 * (1 - occupancy) / occupancy
+    for car in range(1, cars + 1):
+        day = int(rng.integers(0, 7))
+        while day < 365:
+            length = int(rng.integers(1, 8))
+            start = first + timedelta(days=day)
+            bookings.append({'car_id': car, 'user_id': 1, 'start_date': start,
+                             'end_date': start + timedelta(days=length), 'status': 'confirmed'})
+            day += length + int(rng.poisson(mean_gap))
+    with db.engine.begin() as conn:
+        for i in range(0, len(bookings), 50000):
+            conn.execute(Booking.__table__.insert(), bookings[i:i + 50000])
+    return len(bookings)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--cars', type=int, default=1000)
+    parser.add_argument('--occupancy', type=float, default=0.6)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    # Nothing else writes here; keep the sync thread off the shared connection
+    app.config['VERSION_SYNC_INTERVAL'] = 3600
+    db.init_app(app)
+    resource_versions.init_app(app)
+    first = date(2026, 1, 1)
+
+    with app.app_context():
+        metadata.drop_all(db.engine)
+        metadata.create_all(db.engine)
+        count = seed(args.cars, first, args.occupancy, np.random.default_rng(args.seed))
+        car_ids = list(range(1, args.cars + 1))
+        print(f"{count} bookings for {args.cars} cars in {first.year} on {db.engine.dialect.name}\n")
+
+        fleet, cold_ms = timed(fleet_calendar, car_ids, first, 12)
+        _, warm_ms = timed(fleet_calendar, car_ids, first, 12)
+        one, car_ms = timed(car_calendar, 1, first, 12)
+        print(f"fleet year, cold cache: {cold_ms:7.1f}ms")
+        print(f"fleet year, warm cache: {warm_ms:7.1f}ms")
+        print(f"one car year, warm:     {car_ms:7.1f}ms\n")
+
+        raw = args.cars * fleet['bytes_per_car']
+        packed = len(base64.b64decode(fleet['bitmap']))
+        listing, list_ms = timed(lambda: BOOKING.jsonify(BOOKING.project(Booking.query).all()).get_data())
+        print(f"fleet bitmap: {raw} bytes raw, {packed} deflated, {len(fleet['bitmap'])} as base64")
+        print(f"one car:      {len(one['bitmap'])} bytes as base64")
+        print(f"bookings as JSON (what the date picker fetched before): {len(listing)} bytes, {list_ms:.0f}ms")
+        calendar_cache.clear()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Before/after benchmark for the hot-path indexes.
+
+Seeds a throwaway database with the tables only (primary keys and the original
+unique constraints), times the hot queries and prints their plans, then adds
+every index/constraint declared in models.py and runs the same queries again.
+
+    python -m benchmarks.index_benchmark                       # in-memory SQLite
+    python -m benchmarks.index_benchmark --database-url postgresql://localhost/bench
+
+Use an empty scratch database: all tables in models.py are dropped first.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, select, exists, and_, text, MetaData, UniqueConstraint
+from sqlalchemy.schema import CreateIndex, AddConstraint
+
+from models import metadata, User, Car, Booking, Review
+
+users_t = User.__table__
+cars_t = Car.__table__
+bookings_t = Booking.__table__
+reviews_t = Review.__table__
+
+BRANDS = ['Toyota', 'Nissan', 'Subaru', 'Mazda', 'Honda', 'Mercedes', 'BMW', 'Audi',
+          'Volkswagen', 'Ford', 'Isuzu', 'Mitsubishi', 'Suzuki', 'Lexus', 'Land Rover']
+
+
+def bare_metadata():
+    """Copy of the schema without the secondary indexes we want to measure."""
+    bare = MetaData()
+    for table in metadata.sorted_tables:
+        copy = table.to_metadata(bare)
+        copy.indexes.clear()
+        for constraint in list(copy.constraints):
+            if constraint.name in ('uq_cars_brand_model', 'bookings_no_overlap'):
+                copy.constraints.discard(constraint)
+    return bare
+
+
+def seed(engine, users, cars, bookings, reviews, rng):
+    today = date(2026, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(users_t.insert(), [
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+             'password_hash': 'x', 'role': 'admin' if i == users else 'user',
+             'is_admin': i == users}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(cars_t.insert(), [
+            {'id': i, 'brand': BRANDS[i % len(BRANDS)], 'model': f'Model {i}',
+             'price_per_day': rng.randrange(2000, 30000, 500), 'status': 'available'}
+            for i in range(1, cars + 1)
+        ])
+
+        # Back-to-back, non-overlapping bookings per car
+        per_car = max(1, bookings // cars)
+        rows, booking_id = [], 0
+        for car_id in range(1, cars + 1):
+            day = today - timedelta(days=rng.randrange(0, 365 * 3))
+            for _ in range(per_car):
+                day += timedelta(days=rng.randrange(0, 5))
+                length = rng.randrange(1, 8)
+                booking_id += 1
+                rows.append({
+                    'id': booking_id, 'car_id': car_id,
+                    'user_id': rng.randrange(1, users + 1),
+                    'start_date': day, 'end_date': day + timedelta(days=length),
+                    'status': rng.choices(['confirmed', 'cancelled', 'pending'], [85, 10, 5])[0],
+                    'created_at': datetime(2026, 1, 1),
+                })
+                day += timedelta(days=length)
+            if len(rows) >= 10000:
+                conn.execute(bookings_t.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(bookings_t.insert(), rows)
+
+        conn.execute(reviews_t.insert(), [
+            {'id': i, 'car_id': rng.randrange(1, cars + 1), 'user_id': rng.randrange(1, users + 1),
+             'rating': rng.randrange(1, 6), 'comment': 'ok', 'timestamp': datetime(2026, 1, 1)}
+            for i in range(1, reviews + 1)
+        ])
+    return booking_id
+
+
+def hot_queries(users, cars):
+    """(name, statement factory) pairs mirroring the predicates in views/."""
+    def window(rng):
+        start = date(2025, 1, 1) + timedelta(days=rng.randrange(0, 700))
+        return start, start + timedelta(days=rng.randrange(1, 8))
+
+    def overlap_check(rng):
+        start, end = window(rng)
+        return select(bookings_t.c.id).where(
+            bookings_t.c.car_id == rng.randrange(1, cars + 1),
+            bookings_t.c.start_date < end, bookings_t.c.end_date > start,
+            bookings_t.c.status != 'cancelled',
+        ).limit(1)
+
+    def available_cars(rng):
+        start, end = window(rng)
+        booked = exists().where(and_(
+            bookings_t.c.car_id == cars_t.c.id,
+            bookings_t.c.start_date < end, bookings_t.c.end_date > start,
+            bookings_t.c.status != 'cancelled',
+        ))
+        return select(cars_t.c.id).where(~booked, cars_t.c.brand == rng.choice(BRANDS))
+
+    def bookings_by_user(rng):
+        return (select(bookings_t).where(bookings_t.c.user_id == rng.randrange(1, users + 1))
+                .order_by(bookings_t.c.id).limit(100))
+
+    def pending_bookings(rng):
+        return (select(bookings_t).where(bookings_t.c.status == 'pending')
+                .order_by(bookings_t.c.id).limit(100))
+
+    def reviews_by_car(rng):
+        return select(reviews_t).where(reviews_t.c.car_id == rng.randrange(1, cars + 1))
+
+    def duplicate_car(rng):
+        car_id = rng.randrange(1, cars + 1)
+        return select(cars_t.c.id).where(
+            cars_t.c.brand == BRANDS[car_id % len(BRANDS)], cars_t.c.model == f'Model {car_id}'
+        ).limit(1)
+
+    def admin_lookup(rng):
+        return select(users_t.c.id).where(users_t.c.is_admin == True).limit(1)  # noqa: E712
+
+    return [
+        ('booking overlap check', overlap_check),
+        ('available cars (anti-join)', available_cars),
+        ('bookings by user', bookings_by_user),
+        ('pending bookings', pending_bookings),
+        ('reviews by car', reviews_by_car),
+        ('duplicate car check', duplicate_car),
+        ('admin lookup', admin_lookup),
+    ]
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(conn, compile_kwargs={'literal_binds': True})
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = conn.exec_driver_sql(prefix + str(compiled)).fetchall()
+    if conn.dialect.name == 'sqlite':
+        return ' | '.join(row[-1] for row in rows)
+    return ' | '.join(row[0].strip() for row in rows)
+
+
+def measure(engine, queries, iterations, budget, seed_value):
+    results = {}
+    with engine.connect() as conn:
+        for name, factory in queries:
+            rng = random.Random(seed_value)
+            plan = explain(conn, factory(rng))
+            timings = []
+            deadline = time.perf_counter() + budget
+            # Unindexed queries can take seconds each; stop early once over budget
+            while len(timings) < iterations and (len(timings) < 5 or time.perf_counter() < deadline):
+                stmt = factory(rng)
+                started = time.perf_counter()
+                conn.execute(stmt).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = (statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)], plan)
+    return results
+
+
+def add_indexes(engine):
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index))
+            for constraint in table.constraints:
+                if not (isinstance(constraint, UniqueConstraint) and constraint.name):
+                    continue
+                if conn.dialect.name == 'sqlite':
+                    # No ALTER TABLE ADD CONSTRAINT on SQLite; a unique index is equivalent
+                    columns = ', '.join(column.name for column in constraint.columns)
+                    conn.execute(text(f'CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})'))
+                else:
+                    conn.execute(AddConstraint(constraint))
+        conn.execute(text('ANALYZE'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--cars', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=300000)
+    parser.add_argument('--reviews', type=int, default=100000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--budget', type=float, default=5.0, help='Seconds per query and phase')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    bare = bare_metadata()
+    metadata.drop_all(engine)
+    bare.create_all(engine)
+
+    started = time.perf_counter()
+    booking_count = seed(engine, args.users, args.cars, args.bookings, args.reviews, random.Random(args.seed))
+    print(f"Seeded {args.users} users, {args.cars} cars, {booking_count} bookings, "
+          f"{args.reviews} reviews in {time.perf_counter() - started:.1f}s on {engine.dialect.name}\n")
+    with engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+
+    queries = hot_queries(args.users, args.cars)
+    before = measure(engine, queries, args.iterations, args.budget, args.seed)
+    add_indexes(engine)
+    after = measure(engine, queries, args.iterations, args.budget, args.seed)
+
+    print(f"{'query':<28} {'before p50':>11} {'before p95':>11} {'after p50':>10} {'after p95':>10} {'speedup':>8}")
+    for name, _ in queries:
+        b50, b95, _ = before[name]
+        a50, a95, _ = after[name]
+        print(f"{name:<28} {b50:>9.3f}ms {b95:>9.3f}ms {a50:>8.3f}ms {a95:>8.3f}ms {b50 / a50 if a50 else 0:>7.1f}x")
+
+    print("\nQuery plans")
+    for name, _ in queries:
+        print(f"\n{name}\n  before: {before[name][2]}\n  after:  {after[name][2]}")
+
+
+if __name__ == '__main__':
+    main()
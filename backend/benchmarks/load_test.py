@@ -0,0 +1,402 @@
+"""Load test: throughput and tail latency per route under a realistic mix.
+
+Migrates and seeds a scratch database, boots the API against it (gunicorn
+when installed, otherwise Werkzeug's threaded server) and drives it with
+concurrent clients. Each client logs in, then keeps picking a scenario by
+weight:
+
+* browse - list cars, open one with its reviews and calendar, search, and
+  check which cars are free for some dates;
+* book   - POST /bookings for a random car and dates. 409 (dates taken) and
+  400 (car no longer available) are expected answers, not errors;
+* admin  - the dashboard summary and utilization analytics;
+* login  - POST /login.
+
+It prints requests per second and p50/p95/p99 per route, can save the run as
+JSON (--output), and can compare two git revisions: each is checked out in a
+temporary worktree, then migrated, seeded with the same data and driven with
+the same mix as the other.
+
+    python -m benchmarks.load_test                              # scratch SQLite, 20s, 16 clients
+    python -m benchmarks.load_test --database-url postgresql://localhost/bench --workers 4
+    python -m benchmarks.load_test --mix browse=90,book=10 --duration 60 --output after.json
+    python -m benchmarks.load_test --compare main HEAD
+
+Revisions must have create_app (DATABASE_URL support). Everything in the
+target database is dropped first: point --database-url at a scratch one.
+The clients are threads in this process; on a small machine keep an eye on
+its CPU, or the client becomes the bottleneck.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, MetaData, text
+from werkzeug.security import generate_password_hash
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'load-test'
+BRANDS = {
+    'Toyota': ['Corolla', 'Camry', 'Prado', 'Hilux', 'Vitz'], 'Nissan': ['Note', 'X-Trail', 'Navara'],
+    'Subaru': ['Forester', 'Outback', 'Impreza'], 'Mazda': ['Demio', 'CX-5', 'Axela'],
+    'Honda': ['Fit', 'Civic', 'CR-V'], 'Mercedes': ['C200', 'E250', 'GLE'], 'BMW': ['X5', '320i'],
+    'Volkswagen': ['Golf', 'Polo', 'Tiguan'], 'Ford': ['Ranger', 'Everest'], 'Isuzu': ['D-Max'],
+}
+DEFAULT_MIX = 'browse=70,book=15,admin=5,login=10'
+
+SERVE = ("import sys; from werkzeug.serving import run_simple; from app import create_app; "
+         "run_simple('127.0.0.1', int(sys.argv[1]), create_app(), threaded=True)")
+
+
+#=========================database=========================
+def reset_database(url, backend):
+    """Empty the database and run the revision's own migrations on it."""
+    if url.startswith('sqlite:///'):
+        path = url[len('sqlite:///'):]
+        if os.path.exists(path):
+            os.remove(path)
+    else:
+        engine = create_engine(url)
+        with engine.begin() as conn:
+            conn.execute(text('DROP SCHEMA public CASCADE'))
+            conn.execute(text('CREATE SCHEMA public'))
+        engine.dispose()
+    subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade'], cwd=backend, check=True,
+                   env=server_env(url), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def seed(url, cars, users, rng):
+    """Users (user 1 is the admin), cars, past and upcoming bookings, and reviews.
+
+    Inserts through the reflected tables, so it works with any revision's schema.
+    """
+    engine = create_engine(url)
+    tables = MetaData()
+    tables.reflect(engine)
+    password_hash = generate_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    today = date.today()
+
+    def insert(conn, name, rows):
+        columns = set(tables.tables[name].columns.keys())
+        rows = [{key: value for key, value in row.items() if key in columns} for row in rows]
+        for i in range(0, len(rows), 5000):
+            conn.execute(tables.tables[name].insert(), rows[i:i + 5000])
+
+    user_rows = [{'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+                  'password_hash': password_hash, 'role': 'admin' if i == 1 else 'user', 'is_admin': i == 1}
+                 for i in range(1, users + 1)]
+    models = [(brand, model) for brand, names in BRANDS.items() for model in names]
+    car_rows = [{'id': i, 'brand': models[i % len(models)][0], 'model': f'{models[i % len(models)][1]} {i}',
+                 'price_per_day': float(rng.randrange(2000, 30000, 500)), 'status': 'available',
+                 'image1': f'https://img.example.com/{i}/1.jpg', 'image2': f'https://img.example.com/{i}/2.jpg'}
+                for i in range(1, cars + 1)]
+
+    # Back-to-back bookings per car from six months ago to a month ahead
+    booking_rows = []
+    for car in range(1, cars + 1):
+        day = today - timedelta(days=180 + rng.randrange(7))
+        while day < today + timedelta(days=30):
+            length = rng.randrange(1, 8)
+            booking_rows.append({'car_id': car, 'user_id': rng.randrange(2, users + 1), 'start_date': day,
+                                 'end_date': day + timedelta(days=length), 'created_at': now,
+                                 'status': rng.choice(['confirmed'] * 8 + ['pending', 'cancelled'])})
+            day += timedelta(days=length + rng.randrange(0, 6))
+    review_rows = [{'car_id': rng.randrange(1, cars + 1), 'user_id': rng.randrange(2, users + 1),
+                    'rating': rng.randrange(1, 6), 'comment': 'Clean car, easy pickup.', 'timestamp': now}
+                   for _ in range(cars * 3)]
+
+    with engine.begin() as conn:
+        insert(conn, 'users', user_rows)
+        insert(conn, 'cars', car_rows)
+        insert(conn, 'bookings', booking_rows)
+        insert(conn, 'reviews', review_rows)
+        if engine.dialect.name == 'postgresql':
+            for table in ('users', 'cars'):
+                conn.execute(text(f"SELECT setval('{table}_id_seq', (SELECT max(id) FROM {table}))"))
+            conn.execute(text('ANALYZE'))
+    engine.dispose()
+    return car_rows, len(booking_rows), len(review_rows)
+
+
+#=========================server=========================
+def server_env(url):
+    # Every client comes from 127.0.0.1: rate limits would measure the limiter
+    env = {**os.environ, 'APP_PROFILE': 'local', 'DATABASE_URL': url,
+               'JWT_SECRET_KEY': 'benchmark-secret', 'RATE_LIMIT_ENABLED': '0'}
+    env.pop('DATABASE_REPLICA_URLS', None)
+    return env
+
+
+def boot(backend, url, port, workers, log):
+    if shutil.which('gunicorn') and os.path.exists(os.path.join(backend, 'gunicorn.conf.py')):
+        command = ['gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+                   '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null', 'wsgi:app']
+    else:
+        command = [sys.executable, '-c', SERVE, str(port)]
+    server = subprocess.Popen(command, cwd=backend, env=server_env(url), stdout=log, stderr=log)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'Server exited; see {log.name}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/cars/search?q=a')
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'Server did not come up; see {log.name}')
+
+
+#=========================clients=========================
+class Client:
+    def __init__(self, port, results, recording):
+        self.port = port
+        self.results = results
+        self.recording = recording
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.token = None
+
+    def call(self, label, method, path, body=None, token=None, expected=(200,)):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        if token or self.token:
+            headers['Authorization'] = f'Bearer {token or self.token}'
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            payload = response.read()
+            status, response_headers = response.status, response.headers
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            payload, status, response_headers = b'', 0, {}
+        if self.recording.is_set():
+            self.results.append((label, status, time.perf_counter() - started, status in expected))
+        return status, payload, response_headers
+
+    def login(self, user):
+        status, payload, _ = self.call('POST /login', 'POST', '/login',
+                                    {'email': f'user{user}@example.com', 'password_hash': PASSWORD})
+        return json.loads(payload)['access_token'] if status == 200 else None
+
+
+def browse(client, rng, ctx):
+    car = rng.choice(ctx['cars'])
+    # The first few pages of the listing, as the frontend walks it: by X-Next-Cursor
+    path = '/cars'
+    for _ in range(rng.randrange(1, 6)):
+        status, _, headers = client.call('GET /cars', 'GET', path)
+        cursor = headers.get('X-Next-Cursor')
+        if status != 200 or not cursor:
+            break
+        path = f'/cars?cursor={quote(cursor)}'
+    client.call('GET /cars/<id>/', 'GET', f"/cars/{car['id']}/")
+    client.call('GET /reviews/car/<id>/', 'GET', f"/reviews/car/{car['id']}/")
+    client.call('GET /cars/<id>/calendar', 'GET', f"/cars/{car['id']}/calendar?months=3")
+    client.call('GET /cars/search', 'GET', f"/cars/search?q={car['brand'][:rng.randrange(2, 6)].lower()}")
+    start = date.today() + timedelta(days=rng.randrange(1, 90))
+    client.call('GET /cars/available', 'GET',
+                f'/cars/available?start={start}&end={start + timedelta(days=rng.randrange(1, 8))}')
+
+
+def book(client, rng, ctx):
+    start = date.today() + timedelta(days=rng.randrange(1, 120))
+    client.call('POST /bookings', 'POST', '/bookings', {
+        'car_id': rng.choice(ctx['cars'])['id'],
+        'start_date': str(start), 'end_date': str(start + timedelta(days=rng.randrange(1, 8))),
+    }, expected=(201, 400, 409))
+
+
+def admin(client, rng, ctx):
+    client.call('GET /admin/summary', 'GET', '/admin/summary', token=ctx['admin_token'])
+    bucket = rng.choice(['day', 'week', 'month'])
+    client.call('GET /admin/analytics/utilization', 'GET',
+                f'/admin/analytics/utilization?bucket={bucket}', token=ctx['admin_token'])
+
+
+def login(client, rng, ctx):
+    client.login(rng.randrange(2, ctx['users'] + 1))
+
+
+SCENARIOS = {'browse': browse, 'book': book, 'admin': admin, 'login': login}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}; use: {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def drive(port, ctx, mix, clients, duration, warmup, seed):
+    recording = threading.Event()
+    stop = threading.Event()
+    results = []
+    names, weights = list(mix), list(mix.values())
+
+    def run(i):
+        rng = random.Random(seed * 1000 + i)
+        client = Client(port, results, recording)
+        client.token = client.login(rng.randrange(2, ctx['users'] + 1))
+        while not stop.is_set():
+            SCENARIOS[rng.choices(names, weights)[0]](client, rng, ctx)
+
+    threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    recording.set()
+    started = time.perf_counter()
+    time.sleep(duration)
+    recording.clear()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join(60)
+    return summarize(results, elapsed)
+
+
+#=========================reporting=========================
+def percentile(timings, share):
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def summarize(results, elapsed):
+    by_route = defaultdict(list)
+    for row in results:
+        by_route[row[0]].append(row)
+
+    def stats(rows):
+        timings = sorted(latency * 1000 for _, _, latency, _ in rows)
+        statuses = defaultdict(int)
+        for _, status, _, _ in rows:
+            statuses[str(status)] += 1
+        return {
+            'count': len(rows), 'rps': round(len(rows) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.50), 2), 'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2), 'max_ms': round(timings[-1], 2),
+            'errors': sum(1 for *_, ok in rows if not ok), 'statuses': dict(statuses),
+        }
+
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'routes': {route: stats(rows) for route, rows in sorted(by_route.items())},
+        'total': stats(results) if results else None,
+    }
+
+
+def print_report(summary):
+    print(f"{'route':<36} {'count':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for route, row in [*summary['routes'].items(), ('total', summary['total'])]:
+        if row is None:
+            print(f"{route:<36} {0:>7}  no requests completed while recording")
+            continue
+        print(f"{route:<36} {row['count']:>7} {row['rps']:>8.1f} {row['p50_ms']:>7.1f}ms "
+              f"{row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms {row['errors']:>7}")
+
+
+def print_comparison(before, after, names):
+    print(f"{'route':<36} {'req/s':>21} {'p95':>25} {'p99':>25}")
+    print(f"{'':<36} {names[0][:10]:>10} {names[1][:10]:>10} {names[0][:12]:>12} {names[1][:12]:>12} "
+          f"{names[0][:12]:>12} {names[1][:12]:>12}")
+    routes = sorted(set(before['routes']) | set(after['routes']))
+    for route in [*routes, 'total']:
+        a = before['total'] if route == 'total' else before['routes'].get(route)
+        b = after['total'] if route == 'total' else after['routes'].get(route)
+        if not a or not b:
+            print(f"{route:<36} only in {names[0] if a else names[1]}")
+            continue
+        # Flag >10% slower tails or lower throughput
+        flag = ' !' if b['p99_ms'] > a['p99_ms'] * 1.1 or b['rps'] < a['rps'] * 0.9 else ''
+        print(f"{route:<36} {a['rps']:>10.1f} {b['rps']:>10.1f} {a['p95_ms']:>10.1f}ms {b['p95_ms']:>10.1f}ms "
+              f"{a['p99_ms']:>10.1f}ms {b['p99_ms']:>10.1f}ms{flag}")
+
+
+#=========================runs=========================
+def run_once(backend, args, label):
+    rng = random.Random(args.seed)
+    reset_database(args.database_url, backend)
+    cars, bookings, reviews = seed(args.database_url, args.cars, args.users, rng)
+    print(f"[{label}] seeded {args.cars} cars, {args.users} users, {bookings} bookings, {reviews} reviews")
+
+    with tempfile.NamedTemporaryFile('w', prefix='load-test-server-', suffix='.log', delete=False) as log:
+        server = boot(backend, args.database_url, args.port, args.workers, log)
+        try:
+            probe = Client(args.port, [], threading.Event())
+            ctx = {'cars': cars, 'users': args.users, 'admin_token': probe.login(1)}
+            print(f"[{label}] {args.clients} clients, mix {args.mix}, {args.warmup}s warm-up + {args.duration}s")
+            summary = drive(args.port, ctx, parse_mix(args.mix), args.clients, args.duration, args.warmup, args.seed)
+        finally:
+            server.terminate()
+            server.wait(30)
+    os.remove(log.name)
+    summary['label'] = label
+    return summary
+
+
+def run_revision(revision, args):
+    """Check ``revision`` out in a temporary worktree and load test it."""
+    root = subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=BACKEND, check=True,
+                          capture_output=True, text=True).stdout.strip()
+    worktree = tempfile.mkdtemp(prefix='load-test-')
+    subprocess.run(['git', 'worktree', 'add', '--detach', worktree, revision], cwd=root, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        backend = os.path.join(worktree, os.path.relpath(BACKEND, root))
+        return run_once(backend, args, revision)
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=root, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'load_test.db')}")
+    parser.add_argument('--cars', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'scenario weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON here')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='two git revisions')
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    if args.compare:
+        runs = [run_revision(revision, args) for revision in args.compare]
+        for summary in runs:
+            print(f"\n{summary['label']}")
+            print_report(summary)
+        print(f"\n{args.compare[0]} -> {args.compare[1]} (! = p99 up or req/s down by more than 10%)")
+        print_comparison(*runs, args.compare)
+    else:
+        runs = [run_once(BACKEND, args, 'working tree')]
+        print()
+        print_report(runs[0])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(runs if args.compare else runs[0], f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
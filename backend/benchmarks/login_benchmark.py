@@ -0,0 +1,180 @@
+"""Login throughput under concurrency, with password hashing inline or in the pool.
+
+Boots the API (Werkzeug's threaded server, one process, like a gthread worker)
+on a scratch SQLite database once per mode and drives it with concurrent
+clients posting to /login, while a probe client fetches GET /cars every
+``--probe-interval`` seconds to show what a login burst does to everything
+else the process serves:
+
+* inline - PASSWORD_POOL_SIZE=0, hashes checked on the request thread;
+* pool   - PASSWORD_POOL_SIZE=--pool-size processes, at most --queue-limit
+  calls waiting for one; the rest are answered 503 straight away.
+
+    python -m benchmarks.login_benchmark
+    python -m benchmarks.login_benchmark --clients 64 --pool-size 4 --queue-limit 8
+    python -m benchmarks.login_benchmark --stored-method pbkdf2:sha256:600000   # every login rehashes
+
+``--stored-method`` hashes the seeded passwords with other parameters than
+``--method``, so the first login of each user also stores a new hash.
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'login-benchmark'
+
+SERVE = ("import sys; from werkzeug.serving import run_simple; from app import create_app; "
+         "run_simple('127.0.0.1', int(sys.argv[1]), create_app(), threaded=True)")
+
+
+def prepare(url, users, stored_method):
+    from app import create_app
+    from models import db, User, Car
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': url, 'CREATE_TABLES': True})
+    pwhash = generate_password_hash(PASSWORD, stored_method)
+    with app.app_context():
+        db.session.add_all(User(username=f'user{i}', email=f'user{i}@example.com', password_hash=pwhash,
+                                role='user', is_admin=False) for i in range(users))
+        db.session.add_all(Car(brand='Toyota', model=f'Corolla {i}', price_per_day=3000, status='available',
+                               image1='', image2='') for i in range(20))
+        db.session.commit()
+
+
+def boot(url, port, env, log):
+    env = {**os.environ, 'APP_PROFILE': 'local', 'DATABASE_URL': url, 'QUERY_INSPECTOR': '0',
+           'RATE_LIMIT_ENABLED': '0', **env}
+    server = subprocess.Popen([sys.executable, '-c', SERVE, str(port)], cwd=BACKEND, env=env,
+                              stdout=log, stderr=log)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'Server exited; see {log.name}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/cars')
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'Server did not come up; see {log.name}')
+
+
+def request(conn, method, path, body=None):
+    started = time.perf_counter()
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                     headers={'Content-Type': 'application/json'} if body is not None else {})
+        response = conn.getresponse()
+        response.read()
+        status = response.status
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def drive(port, clients, users, duration, probe_interval):
+    stop = threading.Event()
+    logins, probes = [], []
+
+    def login(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        n = i
+        while not stop.is_set():
+            logins.append(request(conn, 'POST', '/login',
+                                  {'email': f'user{n % users}@example.com', 'password_hash': PASSWORD}))
+            n += clients
+
+    def probe():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while not stop.is_set():
+            probes.append(request(conn, 'GET', '/cars'))
+            time.sleep(probe_interval)
+
+    threads = [threading.Thread(target=login, args=(i,)) for i in range(clients)]
+    threads.append(threading.Thread(target=probe))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return logins, probes, time.perf_counter() - started
+
+
+def percentile(timings, share):
+    return timings[min(len(timings) - 1, int(len(timings) * share))] if timings else float('nan')
+
+
+def summarize(logins, probes, elapsed):
+    ok = sorted(seconds * 1000 for status, seconds in logins if status == 200)
+    probe = sorted(seconds * 1000 for status, seconds in probes)
+    return {
+        'logins_per_s': round(len(ok) / elapsed, 1),
+        'login_p50_ms': round(percentile(ok, 0.50), 1),
+        'login_p99_ms': round(percentile(ok, 0.99), 1),
+        'shed_503': sum(1 for status, _ in logins if status == 503),
+        'failed': sum(1 for status, _ in logins if status not in (200, 503)),
+        'probe_p50_ms': round(percentile(probe, 0.50), 1),
+        'probe_p99_ms': round(percentile(probe, 0.99), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds per mode.')
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='PASSWORD_HASH_METHOD of the server.')
+    parser.add_argument('--stored-method', default=None, help='Method of the seeded hashes (default: --method).')
+    parser.add_argument('--pool-size', type=int, default=os.cpu_count())
+    parser.add_argument('--queue-limit', type=int, default=16)
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    parser.add_argument('--modes', default='inline,pool')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args()
+
+    sizes = {'inline': 0, 'pool': args.pool_size}
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='login-benchmark-') as scratch:
+        for mode in args.modes.split(','):
+            # A fresh database per mode: the first mode may have rehashed every password
+            url = f"sqlite:///{os.path.join(scratch, f'{mode}.db')}"
+            prepare(url, args.users, args.stored_method or args.method)
+            env = {'PASSWORD_HASH_METHOD': args.method, 'PASSWORD_POOL_SIZE': str(sizes[mode]),
+                   'PASSWORD_QUEUE_LIMIT': str(args.queue_limit)}
+            with open(os.path.join(scratch, f'{mode}.log'), 'w') as log:
+                server = boot(url, args.port, env, log)
+                try:
+                    results[mode] = summarize(*drive(args.port, args.clients, args.users,
+                                                     args.duration, args.probe_interval))
+                finally:
+                    server.terminate()
+                    server.wait()
+
+    print(f"{args.clients} clients, {args.method}, {os.cpu_count()} CPUs")
+    print(f"{'mode':<8} {'logins/s':>9} {'p50':>9} {'p99':>9} {'503':>6} {'failed':>7} "
+          f"{'GET /cars p50':>14} {'p99':>9}")
+    for mode, row in results.items():
+        print(f"{mode:<8} {row['logins_per_s']:>9.1f} {row['login_p50_ms']:>7.1f}ms {row['login_p99_ms']:>7.1f}ms "
+              f"{row['shed_503']:>6} {row['failed']:>7} {row['probe_p50_ms']:>12.1f}ms {row['probe_p99_ms']:>7.1f}ms")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Latency benchmark for /cars/search (car_search.search_cars).
+
+Seeds a catalog of synthetic cars, then replays autocomplete sessions (every
+prefix of a real brand + model, as typed) and misspelled queries, and prints
+p50/p95/p99 per kind of query. On SQLite this measures the in-process trigram
+index, on PostgreSQL the pg_trgm query (run ``flask db upgrade`` first, or the
+indexes are created here if the database is empty).
+
+    python -m benchmarks.search_benchmark                      # in-memory SQLite
+    python -m benchmarks.search_benchmark --database-url postgresql://localhost/bench
+
+Use an empty scratch database: all tables in models.py are dropped first.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from flask import Flask
+from sqlalchemy import text
+
+from models import db, metadata, Car
+from versions import resource_versions
+from car_search import search_cars
+
+BRANDS = ['Toyota', 'Nissan', 'Subaru', 'Mazda', 'Honda', 'Mercedes', 'BMW', 'Audi',
+          'Volkswagen', 'Ford', 'Isuzu', 'Mitsubishi', 'Suzuki', 'Lexus', 'Land Rover',
+          'Peugeot', 'Hyundai', 'Kia', 'Volvo', 'Jeep', 'Porsche', 'Tesla', 'Renault', 'Chevrolet']
+MODELS = ['Corolla', 'Camry', 'Prado', 'Hilux', 'Vitz', 'Note', 'X-Trail', 'Forester', 'Outback',
+          'Demio', 'CX-5', 'Fit', 'Civic', 'Accord', 'C200', 'E250', 'X5', '320i', 'A4', 'Q7',
+          'Golf', 'Polo', 'Ranger', 'Everest', 'D-Max', 'Pajero', 'Swift', 'RX 450h', 'Defender',
+          'Discovery', '3008', 'Tucson', 'Sportage', 'XC90', 'Wrangler', 'Cayenne', 'Model 3',
+          'Duster', 'Captiva', 'Land Cruiser', 'Harrier', 'Crown', 'Premio', 'Axio', 'Wish']
+TRIMS = ['GX', 'VX', 'ZX', 'Sport', 'Hybrid', 'Limited', 'Premium', 'Base', 'Turbo', 'AWD']
+
+
+def seed(rows, rng):
+    cars = []
+    for i in range(1, rows + 1):
+        cars.append({
+            'id': i, 'brand': rng.choice(BRANDS),
+            'model': f'{rng.choice(MODELS)} {rng.choice(TRIMS)} {2000 + i % 26}-{i}',
+            'price_per_day': rng.randrange(2000, 30000, 500), 'status': 'available',
+        })
+    for start in range(0, len(cars), 10000):
+        db.session.execute(Car.__table__.insert(), cars[start:start + 10000])
+    db.session.commit()
+    return cars
+
+
+def typo(word, rng):
+    """Drop, swap or replace one letter."""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice('aeiouxyz') + word[i + 1:]
+
+
+def workload(cars, sessions, rng):
+    queries = {'autocomplete': [], 'typo': [], 'brand + model': []}
+    for _ in range(sessions):
+        car = rng.choice(cars)
+        base_model = car['model'].rsplit(' ', 2)[0]
+        typed = f"{car['brand']} {base_model}"
+        queries['autocomplete'].extend(typed[:n] for n in range(1, len(typed) + 1))
+        queries['typo'].append(typo(rng.choice([car['brand'], base_model.split()[0]]), rng))
+        queries['brand + model'].append(f"{car['brand']} {typo(base_model, rng)}")
+    return queries
+
+
+def percentile(timings, share):
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--cars', type=int, default=100000)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    # Nothing else writes here; keep the sync thread off the shared connection
+    app.config['VERSION_SYNC_INTERVAL'] = 3600
+    db.init_app(app)
+    resource_versions.init_app(app)
+    rng = random.Random(args.seed)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'postgresql':
+            with db.engine.begin() as conn:
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+        metadata.drop_all(db.engine)
+        metadata.create_all(db.engine)
+        cars = seed(args.cars, rng)
+        if db.engine.dialect.name == 'postgresql':
+            with db.engine.begin() as conn:
+                conn.execute(text('ANALYZE cars'))
+
+        started = time.perf_counter()
+        search_cars('warm up', args.limit)
+        print(f"{args.cars} cars on {db.engine.dialect.name}; first search (builds any "
+              f"in-process index) took {(time.perf_counter() - started) * 1000:.0f}ms\n")
+
+        print(f"{'queries':<16} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for name, queries in workload(cars, args.sessions, rng).items():
+            timings = []
+            for q in queries:
+                started = time.perf_counter()
+                search_cars(q, args.limit)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(f"{name:<16} {len(timings):>6} {statistics.median(timings):>6.2f}ms "
+                  f"{percentile(timings, 0.95):>6.2f}ms {percentile(timings, 0.99):>6.2f}ms "
+                  f"{timings[-1]:>6.2f}ms")
+
+        print("\nSample results")
+        for q in ['toy', 'toyota cor', 'land crusier', 'mercdes', 'cx-5']:
+            names = [f'{row.brand} {row.model}' for row in search_cars(q, 3)]
+            print(f"  {q!r:<16} {names}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark the shared serializers against the old per-view dict loops.
+
+Seeds a throwaway database with bookings, then serializes all of them three
+ways and reports wall time and peak Python memory for each:
+
+  orm + jsonify   Booking.query.all(), a hand-built dict per object, Flask's JSON
+  projected       BOOKING.project(query).all(), BOOKING.dump_many, orjson
+  streamed        BOOKING.iter_json over a yield_per query (what stream() sends)
+
+    python -m benchmarks.serializer_benchmark                  # in-memory SQLite
+    python -m benchmarks.serializer_benchmark --rows 100000 --database-url postgresql://localhost/bench
+
+Use an empty scratch database: all tables in models.py are dropped first.
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from models import metadata, User, Car, Booking
+from serializers import BOOKING, STREAM_CHUNK_SIZE
+
+
+def seed(engine, rows, rng):
+    cars = max(1, rows // 100)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {'id': 1, 'username': 'bench', 'email': 'bench@example.com', 'password_hash': 'x'}
+        ])
+        conn.execute(Car.__table__.insert(), [
+            {'id': i, 'brand': 'Toyota', 'model': f'Model {i}', 'price_per_day': 5000,
+             'status': 'available'}
+            for i in range(1, cars + 1)
+        ])
+        batch = []
+        for i in range(1, rows + 1):
+            start = date(2024, 1, 1) + timedelta(days=i // cars * 3)
+            batch.append({
+                'id': i, 'user_id': 1, 'car_id': i % cars + 1,
+                'start_date': start, 'end_date': start + timedelta(days=2),
+                'status': rng.choice(['pending', 'confirmed', 'cancelled']),
+                'created_at': datetime(2024, 1, 1) + timedelta(seconds=i),
+            })
+            if len(batch) >= 10000:
+                conn.execute(Booking.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(Booking.__table__.insert(), batch)
+
+
+def orm_jsonify(session, json_provider):
+    """The loop every list view used to run."""
+    booking_list = []
+    for booking in session.query(Booking).order_by(Booking.id).all():
+        booking_list.append({
+            'id': booking.id,
+            'user_id': booking.user_id,
+            'car_id': booking.car_id,
+            'start_date': booking.start_date.isoformat(),
+            'end_date': booking.end_date.isoformat(),
+            'status': booking.status,
+            'created_at': booking.created_at.isoformat()
+        })
+    return len(json_provider.dumps(booking_list))
+
+
+def projected(session, json_provider):
+    rows = BOOKING.project(session.query(Booking)).order_by(Booking.id).all()
+    return len(BOOKING.jsonify(rows).get_data())
+
+
+def streamed(session, json_provider):
+    query = BOOKING.project(session.query(Booking)).order_by(Booking.id)
+    rows = query.yield_per(STREAM_CHUNK_SIZE)
+    return sum(len(piece) for piece in BOOKING.iter_json(rows))
+
+
+def measure(engine, fn, repeat, json_provider):
+    timings, peaks, size = [], [], 0
+    for _ in range(repeat):
+        with Session(engine) as session:
+            tracemalloc.start()
+            started = time.perf_counter()
+            size = fn(session, json_provider)
+            timings.append(time.perf_counter() - started)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return statistics.median(timings), max(peaks), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    seed(engine, args.rows, random.Random(args.seed))
+    print(f"Serializing {args.rows} bookings on {engine.dialect.name} "
+          f"(median of {args.repeat}, tracemalloc on)\n")
+
+    app = Flask(__name__)
+    cases = [('orm + jsonify', orm_jsonify), ('projected', projected), ('streamed', streamed)]
+    results = {}
+    with app.app_context():
+        for name, fn in cases:
+            results[name] = measure(engine, fn, args.repeat, app.json)
+
+    base = results['orm + jsonify'][0]
+    print(f"{'method':<16} {'time':>9} {'peak memory':>12} {'body':>10} {'speedup':>8}")
+    for name, _ in cases:
+        seconds, peak, size = results[name]
+        print(f"{name:<16} {seconds * 1000:>7.0f}ms {peak / 2**20:>10.1f}MB "
+              f"{size / 2**20:>8.1f}MB {base / seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
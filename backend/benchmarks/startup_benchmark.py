@@ -0,0 +1,110 @@
+"""Cold-start time of the backend (wsgi.py, gunicorn.conf.py).
+
+Loads ``wsgi`` in fresh interpreters and reports the import and create_app
+times, the slowest imports, and the first request. If gunicorn is installed
+it then boots it with preloading and measures the time to the first response
+and, from the worker logs, how long each worker took from fork to serving.
+
+    python -m benchmarks.startup_benchmark
+    python -m benchmarks.startup_benchmark --runs 10 --workers 8
+
+Runs with APP_PROFILE=test unless APP_PROFILE is set, so no database is needed.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import wsgi
+loaded = time.perf_counter()
+response = wsgi.app.test_client().get('/cars')
+assert response.status_code == 200, response.status_code
+first = time.perf_counter()
+print(json.dumps({**wsgi.STARTUP_TIMINGS, 'first_request_ms': (first - loaded) * 1000,
+                  'total_ms': (first - started) * 1000}))
+"""
+
+
+def probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(env, count):
+    """Modules imported by wsgi/app, by cumulative import time, from -X importtime."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import wsgi'], env=env,
+                            check=True, capture_output=True, text=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)', line)
+        # Indented two spaces per level: wsgi, app, then what app imports
+        if match and len(match.group(2)) in (2, 4) and match.group(3) not in ('app', 'wsgi'):
+            imports.append((int(match.group(1)) / 1000, match.group(3)))
+    return sorted(imports, reverse=True)[:count]
+
+
+def boot_gunicorn(env, workers, port):
+    env = {**env, 'PORT': str(port), 'WEB_CONCURRENCY': str(workers)}
+    started = time.perf_counter()
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/cars', timeout=1):
+                    break
+            except OSError:
+                if server.poll() is not None or time.perf_counter() - started > 30:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.01)
+        first_response = (time.perf_counter() - started) * 1000
+        time.sleep(1)
+    finally:
+        server.terminate()
+        log = server.communicate(timeout=10)[1]
+    after_fork = [float(ms) for ms in re.findall(r'serving ([\d.]+) ms after fork', log)]
+    preload = re.search(r'App preloaded in ([\d.]+) ms', log)
+    return first_response, float(preload.group(1)) if preload else None, after_fork
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    env = {**os.environ, 'APP_PROFILE': os.environ.get('APP_PROFILE', 'test')}
+
+    runs = [probe(env) for _ in range(args.runs)]
+    print(f"Fresh interpreter, {args.runs} runs ({env['APP_PROFILE']} profile), median:")
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+        print(f"  {key:<18} {statistics.median(run[key] for run in runs):8.1f} ms")
+
+    print("\nSlowest imports (cumulative):")
+    for ms, module in slowest_imports(env, 8):
+        print(f"  {module:<24} {ms:8.1f} ms")
+
+    if not shutil.which('gunicorn'):
+        print("\ngunicorn is not installed; skipping the server boot")
+        return
+    first_response, preload_ms, after_fork = boot_gunicorn(env, args.workers, args.port)
+    print(f"\ngunicorn, {args.workers} workers, preloaded:")
+    print(f"  app preload in master {preload_ms:8.1f} ms")
+    print(f"  first response        {first_response:8.1f} ms after launch")
+    if after_fork:
+        print(f"  fork to serving       {statistics.median(after_fork):8.1f} ms median, "
+              f"{max(after_fork):.1f} ms max (a worker without preloading would pay the import)")
+
+
+if __name__ == '__main__':
+    main()
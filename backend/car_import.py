@@ -0,0 +1,151 @@
+"""Bulk car import from CSV or NDJSON.
+
+The upload is read as a stream, one row at a time. Each row goes through the
+same checks as ``POST /cars`` (``validate_car``) and is deduplicated against
+the (brand, model) pairs already in the table, which are loaded with a single
+query up front, and against earlier rows of the same file. Valid rows are
+inserted in multi-row INSERT statements of ``IMPORT_BATCH_SIZE`` rows.
+
+Rows that fail are reported back with their line number instead of aborting
+the import. A car added by someone else while the import runs is caught by
+uq_cars_brand_model (ON CONFLICT DO NOTHING) and reported as a duplicate.
+"""
+import csv
+import io
+import json
+import math
+
+from sqlalchemy import select, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Car, CAR_STATUSES
+
+IMPORT_BATCH_SIZE = 1000
+
+CSV_MIMETYPES = ('text/csv', 'application/csv')
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl',
+                    'application/x-jsonlines')
+
+TEXT_FIELDS = ('brand', 'model', 'image1', 'image2')
+
+
+def _text(data, name):
+    # JSON bodies can carry numbers, lists or objects where a string belongs
+    value = data.get(name)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be a string')
+    return value.strip()
+
+
+def validate_car(data):
+    """Car fields from a request body or import row. Raises ValueError."""
+    try:
+        price_per_day = float(data.get('price_per_day'))
+    except (TypeError, ValueError):
+        raise ValueError('Price per day must be a valid number')
+    if not math.isfinite(price_per_day):
+        raise ValueError('Price per day must be a valid number')
+
+    fields = {name: _text(data, name) for name in TEXT_FIELDS}
+    fields['price_per_day'] = price_per_day
+    fields['status'] = data.get('status', 'available')
+    if not fields['brand'] or not fields['model'] or not fields['image1'] or not fields['image2']:
+        raise ValueError('Missing required fields')
+    for name in TEXT_FIELDS:
+        length = Car.__table__.c[name].type.length
+        if length and len(fields[name]) > length:
+            raise ValueError(f'{name} must be at most {length} characters')
+    if price_per_day <= 0:
+        raise ValueError('Price per day must be greater than 0')
+    if not isinstance(fields['status'], str) or fields['status'] not in CAR_STATUSES:
+        raise ValueError('Invalid status')
+    return fields
+
+
+#=========================readers=========================
+def read_csv(stream):
+    """Yield (line number, row dict) from a CSV upload with a header row."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        # Empty cells count as missing, so a blank status falls back to the default
+        yield reader.line_num, {
+            key.strip(): value.strip()
+            for key, value in row.items()
+            if key and isinstance(value, str) and value.strip()
+        }
+
+
+def read_ndjson(stream):
+    """Yield (line number, decoded object) from newline-delimited JSON.
+
+    Lines that are not valid JSON come back as None.
+    """
+    for number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+#=========================import=========================
+def _insert_statement(dialect):
+    cars = Car.__table__
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(cars).on_conflict_do_nothing(index_elements=['brand', 'model'])
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(cars).on_conflict_do_nothing(index_elements=['brand', 'model'])
+    else:
+        stmt = insert(cars)
+    return stmt.returning(cars.c.brand, cars.c.model)
+
+
+def _flush(batch, report):
+    # executemany with RETURNING: SQLAlchemy packs the rows into multi-row
+    # VALUES statements ("insertmanyvalues") from one cached statement
+    connection = db.session.connection()
+    result = connection.execute(_insert_statement(connection.dialect.name),
+                                [fields for _, fields in batch])
+    inserted = {(brand, model) for brand, model in result}
+    report['created'] += len(inserted)
+    for number, fields in batch:
+        if (fields['brand'], fields['model']) not in inserted:
+            report['errors'].append({'row': number, 'error': 'Car with this brand and model already exists'})
+    batch.clear()
+
+
+def import_cars(rows, batch_size=IMPORT_BATCH_SIZE):
+    """Insert cars from (row number, data) pairs in the current session.
+
+    Returns ``{'created': int, 'errors': [{'row': int, 'error': str}]}``.
+    The caller commits.
+    """
+    existing = {(brand, model) for brand, model in db.session.execute(select(Car.brand, Car.model))}
+    report = {'created': 0, 'errors': []}
+    batch = []
+
+    for number, data in rows:
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('Row is not a JSON object')
+            fields = validate_car(data)
+        except ValueError as e:
+            report['errors'].append({'row': number, 'error': str(e)})
+            continue
+
+        key = (fields['brand'], fields['model'])
+        if key in existing:
+            report['errors'].append({'row': number, 'error': 'Car with this brand and model already exists'})
+            continue
+        existing.add(key)
+
+        batch.append((number, fields))
+        if len(batch) >= batch_size:
+            _flush(batch, report)
+
+    if batch:
+        _flush(batch, report)
+    return report
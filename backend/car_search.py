@@ -0,0 +1,179 @@
+"""Ranked prefix and typo-tolerant search over car brand and model.
+
+The text searched is ``lower(brand || ' ' || model)`` (``Car.search_text()``).
+Both backends rank the same way: cars whose text starts with the query come
+first, then those where a later word does, then the rest by trigram
+similarity; ties go to shorter names, then lower ids.
+
+PostgreSQL answers with pg_trgm: ``q <% text`` (word similarity) through the
+GIN index ix_cars_search_trgm, plus ``LIKE 'q%'`` through ix_cars_search_prefix
+for queries too short to form trigrams.
+
+Other databases (SQLite in development) use ``TrigramIndex``, an inverted
+trigram index kept in process memory. It is rebuilt by the first search after
+the ``cars`` resource version changes (see versions.py); searches that arrive
+during the rebuild are answered from the previous index.
+"""
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from operator import itemgetter
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, or_, literal, func
+
+from models import db, Car
+from serializers import CAR
+from versions import resource_versions
+
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+# Share of the query's trigrams a car must contain to count as a fuzzy match
+# (pg_trgm's default word_similarity_threshold)
+MIN_SIMILARITY = 0.6
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def normalize(q):
+    return ' '.join(q.lower().split())
+
+
+def trigrams(text, partial_last=False):
+    """pg_trgm-style trigrams: each word padded with two spaces before, one after.
+
+    With ``partial_last`` the last word is treated as still being typed, so its
+    end-of-word trigram is left out and "toy" matches "toyota" fully.
+    """
+    words = WORD.findall(text.lower())
+    grams = set()
+    for i, word in enumerate(words):
+        padded = f'  {word} '
+        if partial_last and i == len(words) - 1:
+            padded = padded[:-1]
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class TrigramIndex:
+    """In-process search index over (car id, search text) pairs.
+
+    Prefix and word-start matches come from two sorted lists searched with
+    bisect; fuzzy matches count trigram hits per car with numpy.bincount over
+    the posting arrays. Cars are addressed by their position in id order.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._lock = threading.Lock()
+        self.build([])
+
+    def build(self, rows):
+        """Index (car id, search text) pairs, replacing the current contents."""
+        rows = sorted(rows)
+        postings, starts, word_starts = {}, [], []
+        for position, (_, text) in enumerate(rows):
+            for gram in trigrams(text):
+                postings.setdefault(gram, []).append(position)
+            starts.append((text, len(text), position))
+            word_starts.extend(
+                (text[i + 1:], len(text), position) for i, char in enumerate(text) if char == ' ')
+        starts.sort()
+        word_starts.sort()
+        # Replace everything in one assignment so a concurrent search never mixes old and new
+        self._index = (
+            np.array([car_id for car_id, _ in rows], dtype=np.int64),
+            np.array([len(text) for _, text in rows], dtype=np.int64),
+            {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()},
+            starts,
+            word_starts,
+        )
+
+    def refresh(self):
+        # Keyed on the app as well: each app in a process (one per test) has its own cars
+        version = (current_app._get_current_object(), resource_versions.current('cars')[0])
+        if version == self._version:
+            return
+        # While one request rebuilds, the others keep searching the old index
+        if not self._lock.acquire(blocking=self._version is None):
+            return
+        try:
+            if version != self._version:
+                self.build(db.session.execute(select(Car.id, Car.search_text())).all())
+                self._version = version
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _prefixed(entries, q, limit, taken):
+        """Best ``limit`` positions (shortest text, then id) among entries starting with q."""
+        lo = bisect_left(entries, (q,))
+        hi = bisect_left(entries, (q + '\U0010ffff',))
+        best = heapq.nsmallest(limit + len(taken), entries[lo:hi], key=itemgetter(1, 2))
+        found = []
+        for _, _, position in best:
+            if position not in taken and len(found) < limit:
+                taken.add(position)
+                found.append(position)
+        return found
+
+    def search(self, q, limit):
+        """Ids of the best ``limit`` cars for the normalized query ``q``."""
+        ids, lengths, postings, starts, word_starts = self._index
+        taken = set()
+        found = self._prefixed(starts, q, limit, taken)
+        if len(found) < limit:
+            found += self._prefixed(word_starts, q, limit - len(found), taken)
+
+        grams = trigrams(q, partial_last=True)
+        lists = [postings[gram] for gram in grams if gram in postings]
+        if len(found) < limit and lists:
+            hits = np.bincount(np.concatenate(lists), minlength=len(ids))
+            candidates = np.flatnonzero(hits >= len(grams) * MIN_SIMILARITY)
+            if taken:
+                candidates = candidates[~np.isin(candidates, list(taken))]
+            # Most trigram hits first, then shorter text, then id
+            order = np.lexsort((candidates, lengths[candidates], -hits[candidates]))
+            found += candidates[order[:limit - len(found)]].tolist()
+
+        return ids[found].tolist() if found else []
+
+
+car_search_index = TrigramIndex()
+
+
+def _search_postgres(q, limit):
+    text = Car.search_text()
+    prefix = _escape_like(q) + '%'
+    starts_text = text.like(prefix, escape='\\')
+    starts_word = text.like('% ' + prefix, escape='\\')
+    query = (
+        CAR.project(Car.query)
+        .filter(or_(literal(q).op('<%')(text), starts_text))
+        .order_by(starts_text.desc(), starts_word.desc(), func.word_similarity(q, text).desc(),
+                  func.length(text), Car.id)
+        .limit(limit)
+    )
+    return query.all()
+
+
+def search_cars(q, limit=SEARCH_LIMIT):
+    """CAR rows matching ``q``, best first."""
+    q = normalize(q)
+    if not q:
+        return []
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return _search_postgres(q, limit)
+
+    car_search_index.refresh()
+    ids = car_search_index.search(q, limit)
+    if not ids:
+        return []
+    rows = {row.id: row for row in CAR.project(Car.query.filter(Car.id.in_(ids)))}
+    return [rows[car_id] for car_id in ids if car_id in rows]
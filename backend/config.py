@@ -0,0 +1,260 @@
+"""Settings profiles for ``create_app``.
+
+``load_config`` starts from a profile (``APP_PROFILE``, default ``local``),
+applies overrides from the environment (``DATABASE_URL``, ``JWT_SECRET_KEY``,
+``MAIL_*``, ``DB_*`` ...) and then any passed in by the caller:
+
+* production - DATABASE_URL (PostgreSQL) with a bounded pool and a statement
+  timeout; DATABASE_URL and JWT_SECRET_KEY must be set, and METRICS_TOKEN
+  unless METRICS_ENABLED is off, so /metrics is never public.
+* local      - instance/car_rental.db, or DATABASE_URL for a local PostgreSQL,
+  with development secrets. Run ``flask db upgrade`` once. The built-in JWT
+  secret only signs tokens for a SQLite database; with any other database set
+  JWT_SECRET_KEY, so a deploy that forgets APP_PROFILE=production refuses
+  to start instead of accepting tokens anyone can sign.
+* test       - a private in-memory SQLite database with the tables created
+  on startup, so the whole API runs offline (tests, benchmarks, load tests).
+  Endpoints over their query budget or with an N+1 fail (query_inspector.py).
+
+The DB_* settings become SQLAlchemy engine options: DB_POOL_SIZE,
+DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (seconds to wait for a connection),
+DB_POOL_RECYCLE (seconds before a connection is replaced), DB_POOL_PRE_PING
+and DB_STATEMENT_TIMEOUT_MS (PostgreSQL; 0 is no limit). They apply to the
+read replicas in DATABASE_REPLICA_URLS as well.
+"""
+import os
+from datetime import timedelta
+
+from sqlalchemy.engine import make_url
+
+DEFAULT_PROFILE = 'local'
+
+BASE = {
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 10,
+    'DB_POOL_TIMEOUT': 30.0,
+    'DB_POOL_RECYCLE': 1800,
+    'DB_POOL_PRE_PING': True,
+    'DB_STATEMENT_TIMEOUT_MS': 0,
+
+    # Read replicas: catalog and review reads go there, see replicas.py
+    'SQLALCHEMY_REPLICA_URIS': [],
+    'REPLICA_ENDPOINTS': ['car_bp.fetch_all_cars', 'car_bp.fetch_car',
+                          'review.get_all_reviews', 'review.get_reviews_by_car'],
+    # Replication lag to allow for: a client's reads after its write, and reads
+    # of resources changed within it, use the primary
+    'REPLICA_STICKY_SECONDS': 5.0,
+    'REPLICA_RETRY_SECONDS': 30.0,
+
+    # SQL statements each endpoint may run (query_inspector.py), counted on its
+    # slowest path such as re-activating a booking
+    'QUERY_BUDGETS': {
+        'car_bp.fetch_all_cars': 1,
+        'car_bp.fetch_car': 1,
+        'car_bp.search_car_catalog': 2,
+        'car_bp.fetch_available_cars': 1,
+        'car_bp.fetch_car_calendar': 2,
+        'car_bp.fetch_fleet_calendar': 2,
+        'review.get_all_reviews': 1,
+        'review.get_reviews_by_car': 1,
+        'review.create_review': 2,
+        'booking.create_booking': 8,
+        'booking.update_booking': 7,
+        'booking.bulk_update_bookings': 6,
+        'booking.fetch_all_bookings': 1,
+        'booking.delete_booking': 4,
+        'user.create_user': 5,
+        'user.fetch_all_users': 1,
+        'auth_bp.login_user': 3,
+        'auth_bp.fetch_current_user': 1,
+        'admin.admin_summary': 7,
+    },
+
+    # ASGI mode (asgi.py): async reads from this database, default the primary;
+    # other routes run on ASGI_WSGI_THREADS threads
+    'ASYNC_DATABASE_URI': None,
+    'ASGI_WSGI_THREADS': 10,
+
+    # See metrics.py; gunicorn.conf.py sets METRICS_DIR for its workers
+    'METRICS_ENABLED': True,
+    'METRICS_DIR': None,
+    'METRICS_TOKEN': None,
+
+    # Rate limits per endpoint and key, concurrency caps per process (ratelimit.py)
+    'RATE_LIMIT_ENABLED': True,
+    'RATE_LIMIT_STORAGE': 'memory://',
+    'RATE_LIMITS': {
+        'auth_bp.login_user': {'ip': '30/minute', 'email': '10/minute'},
+        'user.create_user': {'ip': '10/hour'},
+        'booking.create_booking': {'user': '20/minute', 'ip': '60/minute'},
+        'car_bp.fetch_all_cars': {'ip': '300/minute'},
+        'car_bp.fetch_car': {'ip': '300/minute'},
+        'car_bp.search_car_catalog': {'ip': '300/minute'},
+        'car_bp.fetch_available_cars': {'ip': '120/minute'},
+    },
+    'CONCURRENCY_LIMITS': {
+        'auth_bp.login_user': 8,
+        'user.create_user': 4,
+        'booking.create_booking': 8,
+    },
+    'TRUSTED_PROXY_HOPS': 0,
+
+    # Password hashing in a process pool, see passwords.py
+    'PASSWORD_HASH_METHOD': 'scrypt:32768:8:1',
+    'PASSWORD_POOL_SIZE': 2,
+    'PASSWORD_QUEUE_LIMIT': 16,
+
+    'MAIL_SERVER': 'smtp.gmail.com',
+    'MAIL_PORT': 587,
+    'MAIL_USE_TLS': True,
+    'MAIL_USE_SSL': False,
+    'MAIL_USERNAME': None,
+    'MAIL_PASSWORD': None,
+    'MAIL_DEFAULT_SENDER': 'yourrmail@gmail.com',
+
+    'JWT_ACCESS_TOKEN_EXPIRES': timedelta(hours=2),
+    'JWT_VERIFY_SUB': False,
+}
+
+PROFILES = {
+    'production': {
+        'SQLALCHEMY_DATABASE_URI': None,
+        'JWT_SECRET_KEY': None,
+        'DB_POOL_SIZE': 10,
+        'DB_MAX_OVERFLOW': 20,
+        'DB_POOL_TIMEOUT': 10.0,
+        'DB_STATEMENT_TIMEOUT_MS': 30000,
+        # Render's proxy adds the client address to X-Forwarded-For
+        'TRUSTED_PROXY_HOPS': 1,
+    },
+    'local': {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///car_rental.db',
+        'JWT_SECRET_KEY': 'local-development-secret',
+        'QUERY_INSPECTOR': True,
+    },
+    'test': {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'JWT_SECRET_KEY': 'test-secret',
+        'MAIL_SUPPRESS_SEND': True,
+        'CREATE_TABLES': True,
+        'QUERY_INSPECTOR': True,
+        'QUERY_BUDGETS_ENFORCE': True,
+        'RATE_LIMIT_ENABLED': False,
+        # Cheap hashes, checked inline: tests create and log in many users
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'PASSWORD_POOL_SIZE': 0,
+        # Every thread shares the one in-memory connection; nothing else writes to it
+        'VERSION_SYNC_INTERVAL': 3600,
+        'REVOCATION_SYNC_INTERVAL': 3600,
+    },
+}
+
+REQUIRED = ('SQLALCHEMY_DATABASE_URI', 'JWT_SECRET_KEY')
+
+# Public, so only fit for a database on this machine
+DEVELOPMENT_SECRET = PROFILES['local']['JWT_SECRET_KEY']
+
+
+def _flag(value):
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+# Settings read from the environment: config key -> (variable, parser)
+ENVIRONMENT = {
+    'SQLALCHEMY_DATABASE_URI': ('DATABASE_URL', str),
+    'JWT_SECRET_KEY': ('JWT_SECRET_KEY', str),
+    'DB_POOL_SIZE': ('DB_POOL_SIZE', int),
+    'DB_MAX_OVERFLOW': ('DB_MAX_OVERFLOW', int),
+    'DB_POOL_TIMEOUT': ('DB_POOL_TIMEOUT', float),
+    'DB_POOL_RECYCLE': ('DB_POOL_RECYCLE', int),
+    'DB_POOL_PRE_PING': ('DB_POOL_PRE_PING', _flag),
+    'DB_STATEMENT_TIMEOUT_MS': ('DB_STATEMENT_TIMEOUT_MS', int),
+    'SQLALCHEMY_REPLICA_URIS': ('DATABASE_REPLICA_URLS', _list),
+    'REPLICA_ENDPOINTS': ('REPLICA_ENDPOINTS', _list),
+    'REPLICA_STICKY_SECONDS': ('REPLICA_STICKY_SECONDS', float),
+    'ASYNC_DATABASE_URI': ('ASYNC_DATABASE_URL', str),
+    'ASGI_WSGI_THREADS': ('ASGI_WSGI_THREADS', int),
+    'QUERY_INSPECTOR': ('QUERY_INSPECTOR', _flag),
+    'SLOW_QUERY_MS': ('SLOW_QUERY_MS', float),
+    'METRICS_ENABLED': ('METRICS_ENABLED', _flag),
+    'METRICS_DIR': ('METRICS_DIR', str),
+    'METRICS_TOKEN': ('METRICS_TOKEN', str),
+    'RATE_LIMIT_ENABLED': ('RATE_LIMIT_ENABLED', _flag),
+    'RATE_LIMIT_STORAGE': ('RATE_LIMIT_STORAGE', str),
+    'TRUSTED_PROXY_HOPS': ('TRUSTED_PROXY_HOPS', int),
+    'PASSWORD_HASH_METHOD': ('PASSWORD_HASH_METHOD', str),
+    'PASSWORD_POOL_SIZE': ('PASSWORD_POOL_SIZE', int),
+    'PASSWORD_QUEUE_LIMIT': ('PASSWORD_QUEUE_LIMIT', int),
+    'MAIL_SERVER': ('MAIL_SERVER', str),
+    'MAIL_PORT': ('MAIL_PORT', int),
+    'MAIL_USE_TLS': ('MAIL_USE_TLS', _flag),
+    'MAIL_USE_SSL': ('MAIL_USE_SSL', _flag),
+    'MAIL_USERNAME': ('MAIL_USERNAME', str),
+    'MAIL_PASSWORD': ('MAIL_PASSWORD', str),
+    'MAIL_DEFAULT_SENDER': ('MAIL_DEFAULT_SENDER', str),
+}
+
+
+def database_uri(uri):
+    # Render and Heroku hand out postgres:// URLs, which SQLAlchemy 2 rejects
+    if uri and uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(config, uri=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``uri`` (default: the primary) and the DB_* settings."""
+    url = make_url(uri or config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # Flask-SQLAlchemy already shares one connection (StaticPool); there is nothing to size
+        return {}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if url.get_backend_name() == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def load_config(profile=None, overrides=None):
+    """Flask config for ``profile`` (default: $APP_PROFILE), with environment and ``overrides`` applied."""
+    profile = profile or os.environ.get('APP_PROFILE', DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; use one of: {', '.join(PROFILES)}")
+
+    config = {**BASE, **PROFILES[profile], 'APP_PROFILE': profile}
+    for key, (variable, parse) in ENVIRONMENT.items():
+        if os.environ.get(variable):
+            config[key] = parse(os.environ[variable])
+    config.update(overrides or {})
+
+    missing = [key for key in REQUIRED if not config.get(key)]
+    if missing:
+        raise RuntimeError(f"The {profile} profile needs {', '.join(missing)} "
+                           f"(from {', '.join(ENVIRONMENT[key][0] for key in missing)})")
+    if profile == 'production' and config['METRICS_ENABLED'] and not config['METRICS_TOKEN']:
+        raise RuntimeError("The production profile serves /metrics only with a token; "
+                           "set METRICS_TOKEN, or METRICS_ENABLED=0")
+
+    config['SQLALCHEMY_DATABASE_URI'] = database_uri(config['SQLALCHEMY_DATABASE_URI'])
+    if (config['JWT_SECRET_KEY'] == DEVELOPMENT_SECRET
+            and make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'sqlite'):
+        raise RuntimeError(f"The development JWT secret of the {profile} profile only works with SQLite; "
+                           f"set JWT_SECRET_KEY, or APP_PROFILE=production")
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(config))
+    binds = config.setdefault('SQLALCHEMY_BINDS', {})
+    for i, uri in enumerate(config['SQLALCHEMY_REPLICA_URIS']):
+        uri = database_uri(uri)
+        binds.setdefault(f'replica_{i}', {'url': uri, **engine_options(config, uri)})
+    return config
@@ -0,0 +1,58 @@
+"""gunicorn settings: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+The app is loaded once in the master (``preload_app``) and workers fork from
+it, so adding a worker costs a fork rather than a fresh import of Flask,
+SQLAlchemy and numpy. Pools inherited from the master are reset after the
+fork, so each worker opens its own database connections when it first needs
+them. The master logs how long loading the app took and every worker how long
+it took from fork to serving.
+
+PORT, WEB_CONCURRENCY (workers, default 2 x CPUs + 1), GUNICORN_THREADS and
+GUNICORN_TIMEOUT come from the environment, and so does METRICS_DIR (default: a
+new temporary directory).
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+preload_app = True
+accesslog = '-'
+
+# Workers add their metrics up through files here, so /metrics covers all of them
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='metrics-'))
+
+
+def when_ready(server):
+    from wsgi import STARTUP_TIMINGS
+    server.log.info("App preloaded in %.1f ms (imports %.1f ms, create_app %.1f ms)",
+                    STARTUP_TIMINGS['import_ms'] + STARTUP_TIMINGS['create_app_ms'],
+                    STARTUP_TIMINGS['import_ms'], STARTUP_TIMINGS['create_app_ms'])
+
+
+def pre_fork(server, worker):
+    # CLOCK_MONOTONIC is system-wide, so the child can compare against it
+    worker.forked_at = time.perf_counter()
+
+
+def post_fork(server, worker):
+    from wsgi import app
+    from models import db
+
+    # Connections must not be shared with the master or other workers; keep
+    # the parent's (if any) open for the parent and start with empty pools
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+        # An in-memory database (test profile) starts empty in every worker
+        if app.config.get('CREATE_TABLES'):
+            db.create_all(bind_key=None)  # the primary, as in create_app
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s serving %.1f ms after fork",
+                    worker.pid, (time.perf_counter() - worker.forked_at) * 1000)
@@ -0,0 +1,58 @@
+"""Who is making the request, with as little database work as possible.
+
+Access tokens carry ``is_admin`` and ``role`` claims, so permission checks read
+them straight from the JWT. When a handler really needs the user row it uses
+``flask_jwt_extended.current_user``: our ``user_lookup_loader`` hands back a
+``LazyUser`` that loads the row on first use and then keeps it for the rest of
+the request.
+
+Claims are fixed when the token is issued, so a change to a user's admin flag
+takes effect at their next login (at most JWT_ACCESS_TOKEN_EXPIRES later).
+"""
+from flask_jwt_extended import get_jwt, current_user
+
+from models import db, User
+
+
+def role_claims(user):
+    """Additional claims to embed in an access token for ``user``."""
+    return {'is_admin': bool(user.is_admin), 'role': user.role}
+
+
+class LazyUser:
+    """Proxy for the token's user that only queries the database when touched."""
+
+    __slots__ = ('id', '_user', '_loaded')
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self._user = None
+        self._loaded = False
+
+    def get(self):
+        """The real ``User`` instance, or None if it no longer exists."""
+        if not self._loaded:
+            self._user = db.session.get(User, self.id)
+            self._loaded = True
+        return self._user
+
+    def __bool__(self):
+        return self.get() is not None
+
+    def __getattr__(self, name):
+        user = self.get()
+        if user is None:
+            raise AttributeError(f"User {self.id} not found")
+        return getattr(user, name)
+
+
+def load_user(jwt_header, jwt_data):
+    return LazyUser(jwt_data['sub'])
+
+
+def jwt_is_admin():
+    """Admin flag from the token, falling back to the database for older tokens."""
+    claims = get_jwt()
+    if 'is_admin' in claims:
+        return bool(claims['is_admin'])
+    return bool(current_user) and bool(current_user.is_admin)
@@ -0,0 +1,390 @@
+"""Request, SQL and external-call metrics, served at ``GET /metrics``.
+
+Every request is timed from before_request until its response is ready, or
+for a streamed body until it has been sent, and recorded under its route
+template, e.g. ``/cars/<int:car_id>/`` rather than the path, which keeps the
+label values bounded:
+
+* http_requests_total{method, route, status}
+* http_request_duration_seconds{method, route}      histogram
+* http_request_db_statements{route}                 histogram, statements per request
+* http_request_db_seconds_total{route}              time spent in SQL
+* http_requests_in_flight
+
+SQLAlchemy engine events time every statement, in requests or not:
+
+* db_statement_duration_seconds{operation}          SELECT, INSERT, UPDATE, DELETE or OTHER
+
+and ``metrics.timed(name)`` wraps slow calls outside the database (password
+hashing and checks, SMTP sends):
+
+* external_call_duration_seconds{call}
+* external_call_errors_total{call}
+
+Recording is a bisect and a few additions under the series' lock. A metric
+stops adding label combinations at ``METRICS_MAX_SERIES`` and counts any new
+ones under "other".
+
+Each process keeps its own numbers. With ``METRICS_DIR`` set (gunicorn.conf.py
+sets it for its workers), every process also has a thread write them to a
+file there within ``METRICS_FLUSH_INTERVAL`` seconds of a change, and /metrics
+adds up all the files, so any worker answering a scrape reports the whole server - and the
+outbox sender too, when it runs with the same directory. A scrape adds the
+files of exited processes into one, exited.json, so counters never go
+backwards and the directory doesn't grow with every worker restart; only
+live processes count towards the in-flight gauge. If ``METRICS_TOKEN`` is set,
+/metrics wants it as a bearer token (the production profile requires one).
+"""
+import fcntl
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+OPERATIONS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+EXITED_FILE = 'exited.json'
+
+
+#=========================metric types=========================
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.max_series = 500
+        self.values = {}  # label values -> number
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if labels in self.values or len(self.values) < self.max_series:
+            return labels
+        return ('other',) * len(self.labels)
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            key = self._key(labels)
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self.values.items()]
+
+    @staticmethod
+    def merge(total, value):
+        return value if total is None else total + value
+
+    def render(self, series):
+        for key, value in sorted(series.items()):
+            yield f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        # Per bucket (not cumulative) counts, the +Inf bucket, then the sum
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(series)] for key, series in self.values.items()]
+
+    @staticmethod
+    def merge(total, value):
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+    def render(self, series):
+        for key, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(bound)
+                yield f"{self.name}_bucket{_labels((*self.labels, 'le'), (*key, le))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {_number(counts[-1])}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {cumulative}"
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+#=========================registry=========================
+class Metrics:
+    def __init__(self, app=None):
+        self.app = None
+        self.requests = Counter('http_requests_total', 'Requests served.', ('method', 'route', 'status'))
+        self.duration = Histogram('http_request_duration_seconds', 'Time from receiving a request to '
+                                  'closing its response.', ('method', 'route'))
+        self.statements = Histogram('http_request_db_statements', 'SQL statements run per request.',
+                                    ('route',), COUNT_BUCKETS)
+        self.db_time = Counter('http_request_db_seconds_total', 'Time requests spent in SQL statements.',
+                               ('route',))
+        self.in_flight = Gauge('http_requests_in_flight', 'Requests being served.')
+        self.statement_duration = Histogram('db_statement_duration_seconds', 'SQL statement execution time.',
+                                            ('operation',), STATEMENT_BUCKETS)
+        self.external = Histogram('external_call_duration_seconds', 'Slow calls outside the database: '
+                                  'password hashing, SMTP.', ('call',))
+        self.external_errors = Counter('external_call_errors_total', 'External calls that raised.', ('call',))
+        self.families = [self.requests, self.duration, self.statements, self.db_time, self.in_flight,
+                         self.statement_duration, self.external, self.external_errors]
+        self._dirty = False
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_MAX_SERIES', 500)
+        app.extensions['metrics'] = self
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        for family in self.families:
+            family.max_series = app.config['METRICS_MAX_SERIES']
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.expose, methods=['GET'])
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    #=========================recording=========================
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        self.in_flight.inc()
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        method, status = request.method, str(response.status_code)
+        request_globals = g._get_current_object()
+
+        def record():
+            self.record_request(method, route, status, time.perf_counter() - started,
+                                request_globals.get('metrics_statements', 0),
+                                request_globals.get('metrics_db_seconds', 0.0))
+
+        if response.is_streamed and response.content_length is None:
+            # A generated body: done once it is sent; SQL run meanwhile still lands on this g
+            response.call_on_close(record)
+        else:
+            record()
+        return response
+
+    def record_request(self, method, route, status, seconds, statements=0, db_seconds=0.0):
+        """Record a finished request; its start was counted in http_requests_in_flight."""
+        self.requests.inc((method, route, status))
+        self.duration.observe((method, route), seconds)
+        self.statements.observe((route,), statements)
+        self.db_time.inc((route,), db_seconds)
+        self.in_flight.inc(amount=-1)
+        self._changed()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        operation = statement.lstrip()[:6].upper()
+        self.statement_duration.observe((operation if operation in OPERATIONS else 'OTHER',), elapsed)
+        if has_request_context():
+            g.metrics_statements = g.get('metrics_statements', 0) + 1
+            g.metrics_db_seconds = g.get('metrics_db_seconds', 0.0) + elapsed
+
+    @contextmanager
+    def timed(self, call):
+        """Time the block as external call ``call``, e.g. ``with metrics.timed('password_check'):``."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.external_errors.inc((call,))
+            raise
+        finally:
+            self.external.observe((call,), time.perf_counter() - started)
+            self._changed()
+
+    #=========================sharing between processes=========================
+    def _changed(self):
+        if self.app is None or not self.app.config['METRICS_DIR']:
+            return
+        self._dirty = True
+        # Once per process: a forked worker must not rely on its parent's thread
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    threading.Thread(target=self._run, name='metrics-flush', daemon=True).start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.app.config['METRICS_FLUSH_INTERVAL'])
+            if self._dirty:
+                self._dirty = False
+                try:
+                    self.flush()
+                except OSError:
+                    logger.exception("Could not write metrics to %s", self.app.config['METRICS_DIR'])
+
+    def flush(self):
+        """Write this process's numbers to METRICS_DIR/<pid>.json."""
+        directory = self.app.config['METRICS_DIR']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({family.name: family.snapshot() for family in self.families}, f)
+        os.replace(path + '.tmp', path)
+
+    def _snapshots(self):
+        directory = self.app.config['METRICS_DIR']
+        if not directory:
+            yield os.getpid(), {family.name: family.snapshot() for family in self.families}
+            return
+        self.flush()
+        self._fold_exited(directory)
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    snapshot = json.load(f)
+                # None: the exited processes, which have no live gauges
+                yield (None if name == EXITED_FILE else int(name[:-len('.json')])), snapshot
+            except (OSError, ValueError):
+                continue
+
+    def _pid_files(self, directory):
+        for name in os.listdir(directory):
+            pid = name[:-len('.json')]
+            if name.endswith('.json') and pid.isdigit():
+                yield int(pid), os.path.join(directory, name)
+
+    def _fold_exited(self, directory):
+        """Add the counters of exited processes into EXITED_FILE and remove their files."""
+        if all(_alive(pid) for pid, path in self._pid_files(directory)):
+            return
+        # One process at a time, or two scrapes could add the same file twice
+        with open(os.path.join(directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            exited = [(pid, path) for pid, path in self._pid_files(directory) if not _alive(pid)]
+            path = os.path.join(directory, EXITED_FILE)
+            try:
+                with open(path) as f:
+                    snapshots = [(None, json.load(f))]
+            except (OSError, ValueError):
+                snapshots = []
+            for pid, pid_path in exited:
+                try:
+                    with open(pid_path) as f:
+                        snapshots.append((pid, json.load(f)))
+                except (OSError, ValueError):
+                    continue
+            totals = self._add_up(snapshots, gauges=False)
+            with open(path + '.tmp', 'w') as f:
+                json.dump({name: [[list(key), value] for key, value in series.items()]
+                           for name, series in totals.items()}, f)
+            os.replace(path + '.tmp', path)
+            for pid, pid_path in exited:
+                try:
+                    os.remove(pid_path)
+                except OSError:
+                    pass
+
+    #=========================exposition=========================
+    def collect(self):
+        """All processes' numbers added up: {metric name: {label values: value}}."""
+        return self._add_up(self._snapshots())
+
+    def _add_up(self, snapshots, gauges=True):
+        totals = {family.name: {} for family in self.families}
+        for pid, snapshot in snapshots:
+            live = gauges and pid is not None and _alive(pid)
+            for family in self.families:
+                if family.kind == 'gauge' and not live:
+                    continue
+                series = totals[family.name]
+                for key, value in snapshot.get(family.name, ()):
+                    key = tuple(key)
+                    series[key] = family.merge(series.get(key), value)
+        return totals
+
+    def render(self):
+        totals = self.collect()
+        lines = []
+        for family in self.families:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            lines.extend(family.render(totals[family.name]))
+        return '\n'.join(lines) + '\n'
+
+    def expose(self):
+        token = self.app.config['METRICS_TOKEN']
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
@@ -0,0 +1,50 @@
+"""Add keyset pagination indexes
+
+Revision ID: 0c7a52e81f96
+Revises: d41e9a7c0b53
+Create Date: 2026-10-18 11:27:05.638410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c7a52e81f96'
+down_revision = 'd41e9a7c0b53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_role_id', ['role', 'id'], unique=False)
+
+    with op.batch_alter_table('cars', schema=None) as batch_op:
+        batch_op.create_index('ix_cars_price_per_day_id', ['price_per_day', 'id'], unique=False)
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index('ix_bookings_status_id', ['status', 'id'], unique=False)
+        batch_op.create_index('ix_bookings_start_date_id', ['start_date', 'id'], unique=False)
+
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.create_index('ix_reviews_car_id_id', ['car_id', 'id'], unique=False)
+        batch_op.create_index('ix_reviews_rating_id', ['rating', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_reviews_rating_id')
+        batch_op.drop_index('ix_reviews_car_id_id')
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_start_date_id')
+        batch_op.drop_index('ix_bookings_status_id')
+        batch_op.drop_index('ix_bookings_user_id_id')
+
+    with op.batch_alter_table('cars', schema=None) as batch_op:
+        batch_op.drop_index('ix_cars_price_per_day_id')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_role_id')
@@ -0,0 +1,26 @@
+"""Add token blocklist created_at index
+
+Revision ID: 3c81d5e07a4f
+Revises: f2a9c4b7e150
+Create Date: 2026-10-18 15:21:44.901236
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c81d5e07a4f'
+down_revision = 'f2a9c4b7e150'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('token_blocklist', schema=None) as batch_op:
+        batch_op.create_index('ix_token_blocklist_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('token_blocklist', schema=None) as batch_op:
+        batch_op.drop_index('ix_token_blocklist_created_at')
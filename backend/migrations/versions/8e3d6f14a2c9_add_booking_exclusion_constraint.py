@@ -0,0 +1,38 @@
+"""Add booking exclusion constraint
+
+Revision ID: 8e3d6f14a2c9
+Revises: 0c7a52e81f96
+Create Date: 2026-10-18 12:40:19.774105
+
+PostgreSQL only: rejects two non-cancelled bookings of the same car whose
+[start_date, end_date) ranges overlap. Existing overlapping rows must be
+resolved before upgrading, otherwise the ALTER TABLE fails.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3d6f14a2c9'
+down_revision = '0c7a52e81f96'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap "
+        "EXCLUDE USING gist (car_id WITH =, daterange(start_date, end_date) WITH &&) "
+        "WHERE (status IS DISTINCT FROM 'cancelled')"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap')
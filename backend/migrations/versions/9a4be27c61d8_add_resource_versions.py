@@ -0,0 +1,36 @@
+"""Add resource versions
+
+Revision ID: 9a4be27c61d8
+Revises: 3c81d5e07a4f
+Create Date: 2026-10-18 16:48:10.227583
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4be27c61d8'
+down_revision = '3c81d5e07a4f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    resource_versions = op.create_table('resource_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(resource_versions, [
+        {'name': 'cars', 'version': 1, 'updated_at': now},
+        {'name': 'reviews', 'version': 1, 'updated_at': now},
+    ])
+
+
+def downgrade():
+    op.drop_table('resource_versions')
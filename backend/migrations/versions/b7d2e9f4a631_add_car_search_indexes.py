@@ -0,0 +1,42 @@
+"""Add car search indexes
+
+Revision ID: b7d2e9f4a631
+Revises: 9a4be27c61d8
+Create Date: 2026-10-18 17:32:41.506914
+
+PostgreSQL only: a pg_trgm GIN index and a text_pattern_ops index on
+lower(brand || ' ' || model) for /cars/search. SQLite searches an in-process
+index instead.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e9f4a631'
+down_revision = '9a4be27c61d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        "CREATE INDEX ix_cars_search_trgm ON cars "
+        "USING gin (lower(brand || ' ' || model) gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX ix_cars_search_prefix ON cars "
+        "(lower(brand || ' ' || model) text_pattern_ops)"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_cars_search_prefix')
+    op.execute('DROP INDEX IF EXISTS ix_cars_search_trgm')
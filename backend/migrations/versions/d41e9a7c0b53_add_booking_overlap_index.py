@@ -0,0 +1,26 @@
+"""Add booking overlap index
+
+Revision ID: d41e9a7c0b53
+Revises: 6b1f0c2d9e47
+Create Date: 2026-10-18 10:03:47.215934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41e9a7c0b53'
+down_revision = '6b1f0c2d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_car_id_start_date_end_date', ['car_id', 'start_date', 'end_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_car_id_start_date_end_date')
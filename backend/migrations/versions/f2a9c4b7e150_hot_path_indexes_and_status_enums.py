@@ -0,0 +1,119 @@
+"""Hot path indexes, unique car brand/model and status enums
+
+Revision ID: f2a9c4b7e150
+Revises: 8e3d6f14a2c9
+Create Date: 2026-10-18 14:05:52.318207
+
+Unknown or NULL statuses are normalised to the column default before the enum
+conversion. Duplicate (brand, model) cars must be resolved by hand first,
+otherwise creating uq_cars_brand_model fails.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9c4b7e150'
+down_revision = '8e3d6f14a2c9'
+branch_labels = None
+depends_on = None
+
+CAR_STATUSES = ('available', 'booked', 'maintenance', 'under_maintenance')
+BOOKING_STATUSES = ('pending', 'confirmed', 'cancelled')
+
+car_status = sa.Enum(*CAR_STATUSES, name='car_status', create_constraint=True)
+booking_status = sa.Enum(*BOOKING_STATUSES, name='booking_status', create_constraint=True)
+
+
+def _in_list(values):
+    return ', '.join(f"'{value}'" for value in values)
+
+
+def upgrade():
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+
+    op.execute(
+        f"UPDATE cars SET status = 'available' "
+        f"WHERE status IS NULL OR status NOT IN ({_in_list(CAR_STATUSES)})"
+    )
+    op.execute(
+        f"UPDATE bookings SET status = 'pending' "
+        f"WHERE status IS NULL OR status NOT IN ({_in_list(BOOKING_STATUSES)})"
+    )
+
+    if is_postgres:
+        # Re-created below against the enum column
+        op.execute('ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap')
+        car_status.create(bind, checkfirst=True)
+        booking_status.create(bind, checkfirst=True)
+
+    with op.batch_alter_table('cars', schema=None) as batch_op:
+        batch_op.alter_column('status',
+               existing_type=sa.String(length=20),
+               type_=car_status,
+               existing_nullable=True,
+               nullable=False,
+               postgresql_using='status::car_status')
+        batch_op.create_unique_constraint('uq_cars_brand_model', ['brand', 'model'])
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.alter_column('status',
+               existing_type=sa.String(length=20),
+               type_=booking_status,
+               existing_nullable=True,
+               nullable=False,
+               postgresql_using='status::booking_status')
+        batch_op.create_index('ix_bookings_pending_created_at', ['created_at'], unique=False,
+               postgresql_where=sa.text("status = 'pending'"),
+               sqlite_where=sa.text("status = 'pending'"))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_is_admin', ['id'], unique=False,
+               postgresql_where=sa.text('is_admin'),
+               sqlite_where=sa.text('is_admin = 1'))
+
+    if is_postgres:
+        op.execute(
+            "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap "
+            "EXCLUDE USING gist (car_id WITH =, daterange(start_date, end_date) WITH &&) "
+            "WHERE (status <> 'cancelled')"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+
+    if is_postgres:
+        op.execute('ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_is_admin')
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_pending_created_at')
+        batch_op.alter_column('status',
+               existing_type=booking_status,
+               type_=sa.String(length=20),
+               existing_nullable=False,
+               nullable=True,
+               postgresql_using='status::text')
+
+    with op.batch_alter_table('cars', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_cars_brand_model', type_='unique')
+        batch_op.alter_column('status',
+               existing_type=car_status,
+               type_=sa.String(length=20),
+               existing_nullable=False,
+               nullable=True,
+               postgresql_using='status::text')
+
+    if is_postgres:
+        booking_status.drop(bind, checkfirst=True)
+        car_status.drop(bind, checkfirst=True)
+        op.execute(
+            "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap "
+            "EXCLUDE USING gist (car_id WITH =, daterange(start_date, end_date) WITH &&) "
+            "WHERE (status IS DISTINCT FROM 'cancelled')"
+        )
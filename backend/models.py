@@ -1,10 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, and_, func, literal_column
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import relationship
+from replicas import RoutingSession
 
 metadata = MetaData()
-db = SQLAlchemy(metadata=metadata)
+# Reads in replica-routed requests go to a replica (see replicas.py)
+db = SQLAlchemy(metadata=metadata, session_options={'class_': RoutingSession})
+
+# Both 'maintenance' (car forms) and 'under_maintenance' (status endpoint) are in use
+CAR_STATUSES = ('available', 'booked', 'maintenance', 'under_maintenance')
+BOOKING_STATUSES = ('pending', 'confirmed', 'cancelled')
 
 class User(db.Model):
     __tablename__ = "users"
@@ -19,6 +26,13 @@ class User(db.Model):
     bookings = relationship('Booking', backref='user', cascade="all, delete-orphan")
     reviews = relationship('Review', backref='user', cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_users_role_id', 'role', 'id'),
+        # Tiny partial index for "find an admin" lookups
+        db.Index('ix_users_is_admin', 'id',
+                 postgresql_where=db.text('is_admin'), sqlite_where=db.text('is_admin = 1')),
+    )
+
 
 class TokenBlocklist(db.Model):
     __tablename__ = 'token_blocklist'
@@ -27,6 +41,11 @@ class TokenBlocklist(db.Model):
     jti = db.Column(db.String(36), nullable=False, unique=True)  # JWT ID
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Revocation cache sync and pruning both range-scan on created_at
+        db.Index('ix_token_blocklist_created_at', 'created_at'),
+    )
+
     def __repr__(self):
         return f"<TokenBlocklist {self.jti}>"
 
@@ -40,11 +59,32 @@ class Car(db.Model):
     price_per_day = db.Column(db.Float, nullable=False, default=0.0)
     image1 = db.Column(db.String, nullable=True)
     image2 = db.Column(db.String, nullable=True)
-    status = db.Column(db.String(20), default='available')
+    status = db.Column(db.Enum(*CAR_STATUSES, name='car_status', create_constraint=True),
+                       nullable=False, default='available')
 
     bookings = relationship('Booking', backref='car', cascade="all, delete-orphan")
     reviews = relationship('Review', backref='car', cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Also serves brand filters and the duplicate check in create_car
+        db.UniqueConstraint('brand', 'model', name='uq_cars_brand_model'),
+        db.Index('ix_cars_price_per_day_id', 'price_per_day', 'id'),
+        # /cars/search on PostgreSQL: pg_trgm matching plus LIKE 'q%' for one-letter
+        # queries. SQLite searches an in-process trigram index instead (car_search.py).
+        db.Index('ix_cars_search_trgm',
+                 func.lower(brand + literal_column("' '") + model).label('search_text'),
+                 postgresql_using='gin',
+                 postgresql_ops={'search_text': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('ix_cars_search_prefix',
+                 func.lower(brand + literal_column("' '") + model).label('search_text'),
+                 postgresql_ops={'search_text': 'text_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
+
+    @classmethod
+    def search_text(cls):
+        """lower(brand || ' ' || model), the expression behind the search indexes."""
+        return func.lower(cls.brand + literal_column("' '") + cls.model)
+
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
@@ -52,13 +92,45 @@ class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=False)
-    status = db.Column(db.String(20), default='pending')
+    status = db.Column(db.Enum(*BOOKING_STATUSES, name='booking_status', create_constraint=True),
+                       nullable=False, default='pending')
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     car_id = db.Column(db.Integer, db.ForeignKey('cars.id'), nullable=False)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Serves the per-car date-range overlap check and availability search
+        db.Index('ix_bookings_car_id_start_date_end_date', 'car_id', 'start_date', 'end_date'),
+        # Last line of defence against double booking on PostgreSQL; the views
+        # also lock the car row, and SQLite simply skips this constraint.
+        ExcludeConstraint(
+            ('car_id', '='),
+            (func.daterange(start_date, end_date), '&&'),
+            name='bookings_no_overlap',
+            using='gist',
+            where="status <> 'cancelled'",
+        ).ddl_if(dialect='postgresql'),
+        # Keyset pagination: filter/sort column followed by the primary key
+        db.Index('ix_bookings_user_id_id', 'user_id', 'id'),
+        db.Index('ix_bookings_status_id', 'status', 'id'),
+        db.Index('ix_bookings_start_date_id', 'start_date', 'id'),
+        # Admin moderation queue: only the (few) pending rows are indexed
+        db.Index('ix_bookings_pending_created_at', 'created_at',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+    )
+
+    @classmethod
+    def overlapping(cls, start_date, end_date):
+        """Filter for non-cancelled bookings that intersect [start_date, end_date)."""
+        return and_(
+            cls.start_date < end_date,
+            cls.end_date > start_date,
+            cls.status != 'cancelled',
+        )
+
 
 class Review(db.Model):
     __tablename__ = 'reviews'
@@ -70,3 +142,48 @@ class Review(db.Model):
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     car_id = db.Column(db.Integer, db.ForeignKey('cars.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_reviews_car_id_id', 'car_id', 'id'),
+        db.Index('ix_reviews_rating_id', 'rating', 'id'),
+    )
+
+
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    sender = db.Column(db.String(120), nullable=True)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    # pending -> sending -> sent, or back to pending with a later next_attempt_at
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} {self.status}>"
+
+
+class ResourceVersion(db.Model):
+    __tablename__ = 'resource_versions'
+
+    # e.g. 'cars', 'reviews'; bumped on every write that changes the resource
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ResourceVersion {self.name} {self.version}>"
@@ -0,0 +1,271 @@
+"""Transactional email outbox.
+
+Views call ``enqueue_email`` inside the same session as the booking/user change,
+so the email row is committed (or rolled back) together with it. A background
+sender drains the table in batches, reusing one SMTP connection per batch and
+retrying failed messages with exponential backoff.
+
+Run the sender next to the API with ``flask outbox run``. To try it against a
+local SMTP stand-in instead of Gmail:
+
+    python -m aiosmtpd -n -l localhost:1025
+    flask outbox run --server localhost --port 1025 --no-tls
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup, with_appcontext
+from flask import current_app
+from flask_mail import Mail, Message
+from sqlalchemy import select, update, insert, or_, and_
+
+from models import db, EmailOutbox
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+# A claimed batch that is not finished within this window is assumed to belong
+# to a crashed sender and becomes claimable again.
+CLAIM_LEASE_SECONDS = 10 * 60
+
+
+#=========================enqueue=========================
+def enqueue_email(subject, recipient, body, sender=None):
+    """Add an email to the outbox in the current session. The caller commits."""
+    entry = EmailOutbox(
+        recipient=recipient,
+        sender=sender,
+        subject=subject,
+        body=body,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(entry)
+    return entry
+
+
+def enqueue_emails(messages):
+    """Add many ``(subject, recipient, body, sender)`` emails in one INSERT.
+
+    Unlike ``enqueue_email`` no ORM objects are created, so the rows go out as
+    a single executemany. The caller commits.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {'recipient': recipient, 'sender': sender, 'subject': subject, 'body': body,
+         'status': 'pending', 'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+        for subject, recipient, body, sender in messages
+    ]
+    if rows:
+        db.session.execute(insert(EmailOutbox.__table__), rows)
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number ``attempts`` (1-based), with jitter."""
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+#=========================claim and send=========================
+def claim_batch(batch_size=BATCH_SIZE):
+    """Atomically mark up to ``batch_size`` due messages as ours and return them.
+
+    The claim is a single conditional UPDATE, so concurrent senders (threads or
+    processes) never pick up the same row.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    stale = now - timedelta(seconds=CLAIM_LEASE_SECONDS)
+
+    claimable = or_(
+        and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == 'sending', EmailOutbox.claimed_at < stale),
+    )
+    due_ids = (
+        select(EmailOutbox.id)
+        .where(claimable)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due_ids), claimable)
+        .values(status='sending', claimed_by=token, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return db.session.scalars(
+        select(EmailOutbox)
+        .where(EmailOutbox.claimed_by == token, EmailOutbox.status == 'sending')
+        .order_by(EmailOutbox.id)
+    ).all()
+
+
+def _mark_failed(entry, error):
+    entry.attempts += 1
+    entry.last_error = str(error)
+    entry.claimed_by = None
+    entry.claimed_at = None
+    if entry.attempts >= MAX_ATTEMPTS:
+        entry.status = 'failed'
+        logger.error("Giving up on outbox email %s after %s attempts: %s",
+                     entry.id, entry.attempts, error)
+    else:
+        entry.status = 'pending'
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_delay(entry.attempts))
+
+
+def send_batch(mail, batch_size=BATCH_SIZE):
+    """Claim one batch and send it over a single SMTP connection.
+
+    Returns the number of messages that were claimed.
+    """
+    entries = claim_batch(batch_size)
+    if not entries:
+        return 0
+
+    try:
+        with mail.connect() as conn:
+            for entry in entries:
+                msg = Message(
+                    subject=entry.subject,
+                    recipients=[entry.recipient],
+                    body=entry.body,
+                    sender=entry.sender,
+                )
+                try:
+                    with metrics.timed('smtp_send'):
+                        conn.send(msg)
+                except Exception as e:
+                    _mark_failed(entry, e)
+                else:
+                    entry.status = 'sent'
+                    entry.attempts += 1
+                    entry.sent_at = datetime.utcnow()
+                    entry.last_error = None
+    except Exception as e:
+        # Connecting (or closing) the SMTP session failed: everything we did
+        # not already deliver goes back to the queue.
+        for entry in entries:
+            if entry.status == 'sending':
+                _mark_failed(entry, e)
+
+    db.session.commit()
+    return len(entries)
+
+
+def drain_outbox(mail, batch_size=BATCH_SIZE):
+    """Send batches until nothing is due. Returns the number of messages processed."""
+    total = 0
+    while True:
+        processed = send_batch(mail, batch_size)
+        total += processed
+        if processed < batch_size:
+            return total
+
+
+#=========================worker pool=========================
+class OutboxWorkerPool:
+    """A small pool of threads that keep draining the outbox until stopped."""
+
+    def __init__(self, app, mail, workers=2, batch_size=BATCH_SIZE, poll_interval=2.0):
+        self.app = app
+        self.mail = mail
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    processed = send_batch(self.mail, self.batch_size)
+                except Exception:
+                    logger.exception("Outbox sender crashed, retrying")
+                    db.session.rollback()
+                    processed = 0
+                finally:
+                    db.session.remove()
+            if processed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-sender-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+#=========================cli=========================
+outbox_cli = AppGroup('outbox', help='Send queued transactional email.')
+
+
+def _configure_smtp(server, port, tls):
+    app = current_app._get_current_object()
+    if server is not None:
+        app.config['MAIL_SERVER'] = server
+        app.config['MAIL_USERNAME'] = None
+        app.config['MAIL_PASSWORD'] = None
+    if port is not None:
+        app.config['MAIL_PORT'] = port
+    if tls is not None:
+        app.config['MAIL_USE_TLS'] = tls
+    # Rebuild the mail state from the (possibly overridden) config.
+    mail = Mail()
+    mail.init_app(app)
+    return mail
+
+
+@outbox_cli.command('drain')
+@click.option('--server', default=None, help='Override MAIL_SERVER, e.g. a local SMTP stand-in.')
+@click.option('--port', type=int, default=None, help='Override MAIL_PORT.')
+@click.option('--tls/--no-tls', default=None, help='Override MAIL_USE_TLS.')
+@click.option('--batch-size', type=int, default=BATCH_SIZE, show_default=True)
+@with_appcontext
+def drain_command(server, port, tls, batch_size):
+    """Send everything that is due once, then exit."""
+    mail = _configure_smtp(server, port, tls)
+    processed = drain_outbox(mail, batch_size)
+    click.echo(f"Processed {processed} outbox email(s)")
+
+
+@outbox_cli.command('run')
+@click.option('--server', default=None, help='Override MAIL_SERVER, e.g. a local SMTP stand-in.')
+@click.option('--port', type=int, default=None, help='Override MAIL_PORT.')
+@click.option('--tls/--no-tls', default=None, help='Override MAIL_USE_TLS.')
+@click.option('--workers', type=int, default=2, show_default=True)
+@click.option('--batch-size', type=int, default=BATCH_SIZE, show_default=True)
+@click.option('--poll-interval', type=float, default=2.0, show_default=True)
+@with_appcontext
+def run_command(server, port, tls, workers, batch_size, poll_interval):
+    """Keep draining the outbox with a pool of sender threads."""
+    mail = _configure_smtp(server, port, tls)
+    pool = OutboxWorkerPool(current_app._get_current_object(), mail, workers,
+                            batch_size, poll_interval).start()
+    click.echo(f"Outbox sender running with {workers} worker(s), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
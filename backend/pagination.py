@@ -0,0 +1,139 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+Every page is ordered by one sort column plus the primary key as a tie-breaker,
+and the next page starts strictly after the last row of the previous one, so
+the database walks an index instead of counting OFFSET rows. The body stays a
+plain JSON list; paging metadata travels in headers:
+
+    X-Next-Cursor: <opaque cursor>      (absent on the last page)
+    Link: <...?cursor=...>; rel="next"
+"""
+import base64
+import json
+from datetime import date, datetime
+from urllib.parse import urlencode
+
+from flask import request
+from sqlalchemy import tuple_
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(sort, values):
+    payload = json.dumps([sort] + [_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(payload, list) or len(payload) != 3:
+        raise ValueError('Invalid cursor')
+    return payload[0], payload[1:]
+
+
+def parse_limit(args):
+    limit = args.get('limit', DEFAULT_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return min(limit, MAX_LIMIT)
+
+
+class Page:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def headers(self, base_url, args):
+        """X-Next-Cursor / Link headers for the page after this one, if any."""
+        if not self.next_cursor:
+            return {}
+        args = {**args, 'cursor': self.next_cursor}
+        return {'X-Next-Cursor': self.next_cursor, 'Link': f'<{base_url}?{urlencode(args)}>; rel="next"'}
+
+    def apply_headers(self, response):
+        """Attach X-Next-Cursor / Link headers to a (body, status) response."""
+        response.headers.update(self.headers(request.base_url, request.args.to_dict()))
+        return response
+
+
+def paginate(query, model, sortable, default_sort='id'):
+    """Run one keyset page of ``query``.
+
+    ``sortable`` maps the public sort names accepted in ``?sort=`` to columns of
+    ``model``; a leading ``-`` sorts descending. Raises ValueError on bad input.
+    """
+    query, page = page_query(query, model, sortable, request.args, default_sort)
+    return page(query.all())
+
+
+def page_query(query, model, sortable, args, default_sort='id'):
+    """``query`` (an ORM query or a select()) cut down to the page ``args`` asks for.
+
+    Returns the query and a function that turns its rows into the Page, for
+    callers that run the query themselves, e.g. on the async engine.
+    """
+    sort = args.get('sort', default_sort)
+    descending = sort.startswith('-')
+    name = sort.lstrip('-')
+    if name not in sortable:
+        raise ValueError(f"Invalid sort field. Use one of: {', '.join(sorted(sortable))}")
+    column = sortable[name]
+    pk = model.id
+    limit = parse_limit(args)
+
+    cursor = args.get('cursor')
+    if cursor:
+        cursor_sort, (last_value, last_id) = decode_cursor(cursor)
+        if cursor_sort != sort:
+            raise ValueError('Cursor does not match the requested sort order')
+        try:
+            key = (_decode_value(column, last_value), int(last_id))
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        if column is pk:
+            query = query.filter(pk < key[1] if descending else pk > key[1])
+        elif descending:
+            query = query.filter(tuple_(column, pk) < key)
+        else:
+            query = query.filter(tuple_(column, pk) > key)
+
+    if column is pk:
+        order = [pk.desc() if descending else pk.asc()]
+    else:
+        order = [column.desc(), pk.desc()] if descending else [column.asc(), pk.asc()]
+
+    def page(rows):
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(sort, [getattr(last, column.key), last.id])
+        return Page(rows, next_cursor)
+
+    return query.order_by(*order).limit(limit + 1), page
@@ -0,0 +1,135 @@
+"""Password hashing and checks, run in a bounded process pool.
+
+Hashing a password is slow on purpose (scrypt by default), and a request that
+does it inline keeps a CPU busy inside the worker that should be serving other
+requests. ``passwords.hash`` and ``passwords.check`` hand the work to a small
+pool of processes instead - ``PASSWORD_POOL_SIZE`` per server process, started
+on first use - and the request thread just waits for the answer.
+
+At most ``PASSWORD_QUEUE_LIMIT`` calls wait for a free process. Beyond that
+they raise PasswordPoolBusy at once, answered with 503 and Retry-After, so a
+login burst is shed instead of piling up until the worker timeout. So does a
+call still waiting after ``PASSWORD_TIMEOUT`` seconds; its work keeps its
+place in the queue until a process has run it (or it is cancelled before).
+
+``PASSWORD_HASH_METHOD`` is Werkzeug's method string, e.g. ``scrypt:32768:8:1``
+or ``pbkdf2:sha256:600000``, set per profile (the test profile uses a cheap
+one). Hashes made with other parameters keep working, and login stores a new
+hash once ``passwords.needs_rehash`` says the stored one is out of date. With
+``PASSWORD_POOL_SIZE`` 0 the work runs on the calling thread.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import jsonify
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Parameters Werkzeug fills in when a method string leaves them out
+METHOD_DEFAULTS = {
+    'scrypt': ('32768', '8', '1'),
+    'pbkdf2': ('sha256', str(DEFAULT_PBKDF2_ITERATIONS)),
+}
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def canonical_method(method):
+    """``method`` with Werkzeug's defaults spelled out, as it appears in the hashes it makes."""
+    name, *args = method.split(':')
+    if name not in METHOD_DEFAULTS:
+        raise ValueError(f"Unsupported PASSWORD_HASH_METHOD {method!r}; use scrypt or pbkdf2")
+    return ':'.join([name, *args, *METHOD_DEFAULTS[name][len(args):]])
+
+
+class Passwords:
+    def __init__(self, app=None):
+        self.app = None
+        self.method = None
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_POOL_SIZE', 2)
+        app.config.setdefault('PASSWORD_QUEUE_LIMIT', 16)
+        app.config.setdefault('PASSWORD_TIMEOUT', 10.0)
+        app.extensions['passwords'] = self
+        self.method = canonical_method(app.config['PASSWORD_HASH_METHOD'])
+        app.register_error_handler(PasswordPoolBusy, self._busy)
+
+    def hash(self, password):
+        with metrics.timed('password_hash'):
+            return self._run(generate_password_hash, password, self.method)
+
+    def check(self, pwhash, password):
+        with metrics.timed('password_check'):
+            return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method
+
+    #=========================pool=========================
+    def _run(self, function, *args):
+        if not self.app.config['PASSWORD_POOL_SIZE']:
+            return function(*args)
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            raise PasswordPoolBusy()
+        try:
+            future = executor.submit(function, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot stays taken until the work is done, not just until this call
+        # gives up on it: a timed out hash still occupies a pool process
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.app.config['PASSWORD_TIMEOUT'])
+        except TimeoutError:
+            future.cancel()
+            raise PasswordPoolBusy()
+        except BrokenProcessPool:
+            # A pool process died (e.g. OOM killed): start a new pool on the next call
+            with self._lock:
+                if self._executor is executor:
+                    self._pid = None
+            executor.shutdown(wait=False)
+            raise
+
+    def _pool(self):
+        # Once per process: a forked gunicorn worker must not use its parent's pool
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    size = self.app.config['PASSWORD_POOL_SIZE']
+                    # forkserver: pool processes start from a clean interpreter, not
+                    # a fork of this threaded one, and only need werkzeug.security
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload(['werkzeug.security'])
+                    self._executor = ProcessPoolExecutor(size, mp_context=context)
+                    self._slots = threading.BoundedSemaphore(size + self.app.config['PASSWORD_QUEUE_LIMIT'])
+                    self._pid = os.getpid()
+        return self._executor, self._slots
+
+    def _busy(self, error):
+        logger.warning("Password pool busy: %s calls in progress or queued",
+                       self.app.config['PASSWORD_POOL_SIZE'] + self.app.config['PASSWORD_QUEUE_LIMIT'])
+        return jsonify({'error': 'Server busy, please try again shortly'}), 503, {'Retry-After': '1'}
+
+
+passwords = Passwords()
@@ -0,0 +1,229 @@
+"""SQL statement counting, N+1 detection and query budgets.
+
+With ``QUERY_INSPECTOR`` on (the local and test profiles), every request
+records the statements it runs, including those run while a streamed body is
+sent, and when it ends:
+
+* a relationship lazily loaded ``N_PLUS_ONE_THRESHOLD`` times or more (e.g.
+  ``Review.user`` once per review) is logged as an N+1, with the statements;
+* statements slower than ``SLOW_QUERY_MS`` are logged with their parameters
+  as they happen;
+* a request over its endpoint's budget in ``QUERY_BUDGETS`` is logged.
+
+With ``QUERY_BUDGETS_ENFORCE`` (test profile) an N+1 or a request over budget
+raises QueryBudgetExceeded instead, which fails the test that made the request.
+
+Tests can also put a budget on any block:
+
+    from query_inspector import query_budget
+
+    with query_budget(2):
+        client.get(f'/reviews/car/{car_id}/')
+
+QueryBudgetExceeded is an AssertionError, so pytest reports it as a failed
+assertion listing the statements. Production leaves the inspector off and
+pays nothing for it.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryLog:
+    """Statements and lazy loads seen while the log is active."""
+
+    def __init__(self, label='block'):
+        self.label = label
+        self.statements = []  # (sql, parameters, seconds)
+        self.lazy_loads = Counter()  # 'Review.user' -> times lazily loaded
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def n_plus_one(self, threshold):
+        return {relationship: times for relationship, times in self.lazy_loads.items() if times >= threshold}
+
+    def describe(self, limit=20):
+        lines = [f"  {seconds * 1000:7.1f} ms  {' '.join(sql.split())[:200]}"
+                 for sql, _, seconds in self.statements[:limit]]
+        if self.count > limit:
+            lines.append(f"  ... and {self.count - limit} more")
+        return '\n'.join(lines)
+
+    def check(self, budget, n_plus_one_threshold=None):
+        """Raise QueryBudgetExceeded if over ``budget`` statements or with an N+1."""
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f"{self.count} SQL statements, budget {budget}")
+        if n_plus_one_threshold:
+            for relationship, times in self.n_plus_one(n_plus_one_threshold).items():
+                problems.append(f"{relationship} lazily loaded {times} times (N+1)")
+        if problems:
+            raise QueryBudgetExceeded(f"{self.label}: {'; '.join(problems)}\n{self.describe()}")
+
+
+def _active_logs():
+    logs = getattr(_local, 'logs', None)
+    if logs is None:
+        logs = _local.logs = []
+    return logs
+
+
+@contextmanager
+def recording(label='block'):
+    """Record the statements run in this thread during the block into a QueryLog."""
+    _install()
+    log = QueryLog(label)
+    logs = _active_logs()
+    logs.append(log)
+    try:
+        yield log
+    finally:
+        logs.remove(log)
+
+
+@contextmanager
+def query_budget(budget, n_plus_one_threshold=2, label='block'):
+    """Fail the block if it runs more than ``budget`` statements or repeats a lazy load.
+
+    Pass ``n_plus_one_threshold=None`` to only count statements.
+    """
+    with recording(label) as log:
+        yield log
+    log.check(budget, n_plus_one_threshold)
+
+
+@contextmanager
+def paused():
+    """Leave the block's statements out of every log: per-process bookkeeping, not the request's work."""
+    logs = getattr(_local, 'logs', None)
+    _local.logs = []
+    try:
+        yield
+    finally:
+        _local.logs = logs
+
+
+#=========================events=========================
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'logs', None) and context is not None:
+        context._inspector_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_inspector_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    for log in _local.logs:
+        log.statements.append((statement, parameters, elapsed))
+    slow_ms = getattr(_local, 'slow_query_ms', None)
+    if slow_ms is not None and elapsed * 1000 >= slow_ms:
+        logger.warning("Slow query (%.1f ms): %s\nParameters: %.500r",
+                       elapsed * 1000, ' '.join(statement.split()), parameters)
+
+
+def _do_orm_execute(state):
+    if getattr(_local, 'logs', None) and state.is_select and state.lazy_loaded_from is not None:
+        relationship = str(state.loader_strategy_path[-1])
+        for log in _local.logs:
+            log.lazy_loads[relationship] += 1
+
+
+def _install():
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Session, 'do_orm_execute', _do_orm_execute)
+
+
+#=========================requests=========================
+class QueryInspector:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('QUERY_INSPECTOR', False)
+        app.config.setdefault('QUERY_BUDGETS', {})
+        app.config.setdefault('QUERY_BUDGETS_ENFORCE', False)
+        app.config.setdefault('N_PLUS_ONE_THRESHOLD', 3)
+        app.config.setdefault('SLOW_QUERY_MS', 100)
+        app.extensions['query_inspector'] = self
+        if not app.config['QUERY_INSPECTOR']:
+            return
+        _install()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        log = QueryLog(f"{request.method} {request.path} ({request.endpoint})")
+        log.endpoint = request.endpoint
+        _active_logs().append(log)
+        _local.slow_query_ms = self.app.config['SLOW_QUERY_MS']
+        g.query_log = log
+
+    def _after_request(self, response):
+        log = g.get('query_log')
+        if log is not None and response.is_streamed and response.content_length is None:
+            # A generated body runs its queries after teardown: finish when the
+            # response is closed, which also happens when the body is never sent
+            # (HEAD, 304); a generator's finally wouldn't run then
+            g.query_log = None
+            outcome = {'failed': False}
+            response.response = self._stream(response.response, outcome)
+            response.call_on_close(lambda: self._finish(log, check=not outcome['failed']))
+        return response
+
+    def _stream(self, body, outcome):
+        try:
+            yield from body
+        except BaseException:
+            # An error or a client gone mid-body: its count is incomplete
+            outcome['failed'] = True
+            raise
+
+    def _teardown_request(self, error=None):
+        log = g.pop('query_log', None)
+        if log is not None:
+            self._finish(log, check=error is None)
+
+    def _finish(self, log, check=True):
+        _active_logs().remove(log)
+        _local.slow_query_ms = None
+        if not check:
+            return
+
+        config = self.app.config
+        threshold = config['N_PLUS_ONE_THRESHOLD']
+        budget = config['QUERY_BUDGETS'].get(log.endpoint)
+        if config['QUERY_BUDGETS_ENFORCE']:
+            log.check(budget, threshold)
+        for relationship, times in log.n_plus_one(threshold).items():
+            logger.warning("N+1 in %s: %s lazily loaded %s times\n%s",
+                           log.label, relationship, times, log.describe())
+        if budget is not None and log.count > budget:
+            logger.warning("%s ran %s SQL statements, over its budget of %s\n%s",
+                           log.label, log.count, budget, log.describe())
+
+
+query_inspector = QueryInspector()
@@ -0,0 +1,223 @@
+"""Rate limits and concurrency caps for the expensive and scrapeable routes.
+
+``RATE_LIMITS`` maps an endpoint to token buckets, each keyed by one of:
+
+* ip    - the client address (``TRUSTED_PROXY_HOPS`` proxies in front of the
+          app are skipped in X-Forwarded-For);
+* user  - the JWT identity, for requests that carry a valid token;
+* email - the ``email`` in the JSON body, e.g. the account being logged into,
+          together with the client address: guessing one account's password
+          is slowed down without letting anyone else lock its owner out;
+* route - one bucket for everyone.
+
+    'auth_bp.login_user': {'ip': '30/minute', 'email': '10/minute'}
+
+``'10/minute'`` is a bucket of 10 tokens refilled at 10 a minute, so a client
+can burst to 10 and then keeps to the rate. A request that finds any of its
+buckets empty gets 429 with Retry-After.
+
+``CONCURRENCY_LIMITS`` caps how many requests to an endpoint a process serves
+at once; the next one gets 503 with Retry-After rather than queueing behind them.
+
+Buckets live in ``RATE_LIMIT_STORAGE``: ``memory://`` keeps them in the
+process, which is the local stand-in and right for a single process. Under
+gunicorn each worker then counts on its own; ``redis://host:6379/0`` shares
+them between workers and instances (needs the ``redis`` package). Any object
+with ``take(key, rate, capacity)`` can be set as ``rate_limiter.backend``.
+"""
+import logging
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(spec):
+    """``'10/minute'`` -> (tokens per second, bucket capacity)."""
+    count, _, period = spec.partition('/')
+    if not count.strip().isdigit() or period.strip() not in PERIODS:
+        raise ValueError(f"Bad rate limit {spec!r}; use e.g. '10/minute' ({', '.join(PERIODS)})")
+    count = int(count)
+    return count / PERIODS[period.strip()], count
+
+
+#=========================backends=========================
+class MemoryBackend:
+    """Token buckets in this process."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.buckets = {}  # key -> [tokens, updated, full again at]
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity):
+        """Take a token from ``key``'s bucket: 0 if there was one, else seconds until there is."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self.buckets[key] = [capacity, now, now]
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            bucket[:] = [tokens, now, now + (capacity - tokens) / rate]
+            return wait
+
+    def _prune(self, now):
+        # A bucket that has refilled is no different from a new one
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+        if len(self.buckets) >= self.max_keys:
+            # Still full (many clients at once): forget the ones closest to refilled
+            keep = sorted(self.buckets.items(), key=lambda item: item[1][2])[len(self.buckets) // 2:]
+            self.buckets = dict(keep)
+
+
+class RedisBackend:
+    """Token buckets in Redis, shared by every process using the same server."""
+
+    # Refill and take in one step, on the Redis clock so every host agrees
+    TAKE = """
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(f"RATE_LIMIT_STORAGE={url} needs the redis package (pip install redis)")
+        self.errors = redis.RedisError
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.script = self.client.register_script(self.TAKE)
+        self.prefix = prefix
+
+    def take(self, key, rate, capacity):
+        try:
+            return float(self.script(keys=[self.prefix + key], args=[rate, capacity]))
+        except self.errors:
+            # Better to serve without limits than to fail every limited route
+            logger.warning("Rate limit storage unavailable; letting %s through", key, exc_info=True)
+            return 0.0
+
+
+def backend_for(storage):
+    if storage.startswith('memory://'):
+        return MemoryBackend()
+    if storage.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(storage)
+    raise ValueError(f"Unknown RATE_LIMIT_STORAGE {storage!r}; use memory:// or redis://")
+
+
+#=========================keys=========================
+def client_ip(hops, access_route, remote_addr):
+    if hops and len(access_route) >= hops:
+        # Each of our proxies appends the address it got the request from: the
+        # first of their ``hops`` entries is the client, anything before it is hearsay
+        return access_route[-hops]
+    return remote_addr
+
+
+def token_identity():
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None  # the view answers for a bad token
+    return get_jwt_identity()
+
+
+def body_email():
+    email = (request.get_json(silent=True) or {}).get('email')
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+#=========================limiter=========================
+class RateLimiter:
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = None
+        self.rules = {}
+        self.slots = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMITS', {})
+        app.config.setdefault('RATE_LIMIT_STORAGE', 'memory://')
+        app.config.setdefault('CONCURRENCY_LIMITS', {})
+        app.config.setdefault('TRUSTED_PROXY_HOPS', 0)
+        app.extensions['rate_limiter'] = self
+        if not app.config['RATE_LIMIT_ENABLED']:
+            return
+
+        self.rules = {}
+        for endpoint, limits in app.config['RATE_LIMITS'].items():
+            for kind, spec in limits.items():
+                if kind not in ('ip', 'user', 'email', 'route'):
+                    raise ValueError(f"Rate limit for {endpoint} by {kind!r}; use ip, user, email or route")
+                self.rules.setdefault(endpoint, []).append((kind, *parse_limit(spec)))
+        self.slots = {endpoint: threading.BoundedSemaphore(limit)
+                      for endpoint, limit in app.config['CONCURRENCY_LIMITS'].items()}
+        self.backend = backend_for(app.config['RATE_LIMIT_STORAGE'])
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def _key(self, kind):
+        if kind == 'ip':
+            return self._client_ip()
+        if kind == 'user':
+            return token_identity()
+        if kind == 'email':
+            email = body_email()
+            return None if email is None else f'{email}:{self._client_ip()}'
+        return 'all'
+
+    def _client_ip(self):
+        return client_ip(self.app.config['TRUSTED_PROXY_HOPS'], request.access_route, request.remote_addr)
+
+    def _before_request(self):
+        endpoint = request.endpoint
+        wait = 0.0
+        for kind, rate, capacity in self.rules.get(endpoint, ()):
+            key = self._key(kind)
+            if key is not None:
+                wait = max(wait, self.backend.take(f'{endpoint}:{kind}:{key}', rate, capacity))
+        if wait:
+            return jsonify({'error': 'Too many requests, please try again later'}), 429, \
+                {'Retry-After': str(math.ceil(wait))}
+
+        slots = self.slots.get(endpoint)
+        if slots is not None:
+            if not slots.acquire(blocking=False):
+                return jsonify({'error': 'Server busy, please try again shortly'}), 503, {'Retry-After': '1'}
+            g.concurrency_slots = slots
+
+    def _teardown_request(self, error=None):
+        slots = g.pop('concurrency_slots', None)
+        if slots is not None:
+            slots.release()
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,159 @@
+"""Read-replica routing for read-only endpoints.
+
+With ``DATABASE_REPLICA_URLS`` set (comma-separated), GET/HEAD requests to the
+endpoints in ``REPLICA_ENDPOINTS`` - endpoint names such as
+``car_bp.fetch_car`` or whole blueprints such as ``review`` - read from a
+replica:
+
+* ``db.session`` is a RoutingSession. While a request is routed, plain
+  SELECTs go to its replica; flushes, INSERT/UPDATE/DELETE and SELECT ... FOR
+  UPDATE go to the primary, and so does the rest of that request.
+* Replicas are used round-robin. One that fails is skipped for
+  ``REPLICA_RETRY_SECONDS`` and the request is run again on the primary.
+* Read-your-writes: a request that writes through the session and succeeds
+  answers with the time of the write, in the ``db_write`` cookie and the
+  X-Last-Write header. A client that sends either back (clients without a
+  cookie jar echo the header) reads from the primary for
+  ``REPLICA_STICKY_SECONDS``, which should cover replication lag, whichever
+  worker serves it.
+* Fresh ETags: a view wrapped in ``@conditional(...)`` reads from the primary
+  while any of its resources changed less than ``REPLICA_STICKY_SECONDS``
+  ago. A lagging replica would otherwise send the old body under the new
+  ETag, and the client would keep it (304s) until the next write.
+
+Replicas are ordinary Flask-SQLAlchemy binds named ``replica_0``,
+``replica_1``... (see config.py). Without any, nothing is wrapped.
+"""
+import itertools
+import logging
+import math
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD')
+WRITE_COOKIE = 'db_write'
+WRITE_HEADER = 'X-Last-Write'
+
+
+class RoutingSession(Session):
+    """``db.session``: reads in a routed request go to its replica, everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            writing = self._flushing or isinstance(clause, UpdateBase)
+            if writing:
+                g.db_wrote = True
+            replica = g.get('db_replica')
+            if replica and not self.info.get('used_primary'):
+                if writing or getattr(clause, '_for_update_arg', None) is not None:
+                    # Keep the rest of the request on the primary with its write
+                    self.info['used_primary'] = True
+                else:
+                    self.info['used_replica'] = replica
+                    return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    def __init__(self, app=None):
+        self.app = None
+        self.replicas = []
+        self._next = itertools.count()
+        self._down_until = {}  # replica -> when to try it again
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Call after the blueprints are registered: it wraps their view functions."""
+        self.app = app
+        app.config.setdefault('REPLICA_ENDPOINTS', ())
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5.0)
+        app.config.setdefault('REPLICA_RETRY_SECONDS', 30.0)
+        app.extensions['replica_router'] = self
+        self._down_until = {}
+        self.replicas = sorted(key for key in app.config.get('SQLALCHEMY_BINDS', {})
+                               if key.startswith('replica_'))
+        if not self.replicas:
+            return
+
+        routed = set(app.config['REPLICA_ENDPOINTS'])
+        for endpoint, view in list(app.view_functions.items()):
+            if endpoint in routed or endpoint.partition('.')[0] in routed:
+                app.view_functions[endpoint] = self.route(view)
+        app.after_request(self._after_request)
+
+    #=========================choosing a database=========================
+    def _wrote_recently(self):
+        """Whether the client says it wrote less than REPLICA_STICKY_SECONDS ago."""
+        wrote = request.cookies.get(WRITE_COOKIE) or request.headers.get(WRITE_HEADER)
+        try:
+            age = time.time() - float(wrote)
+        except (TypeError, ValueError):
+            return False
+        # Allowing a second of clock skew between the hosts that set and read it
+        return -1 < age < self.app.config['REPLICA_STICKY_SECONDS']
+
+    def choose(self, resources=()):
+        """Replica bind key for this request, or None for the primary.
+
+        ``resources`` are the names behind the view's ETag, if it sends one.
+        """
+        if self._wrote_recently():
+            return None
+        lag = self.app.config['REPLICA_STICKY_SECONDS']
+        versions = self.app.extensions.get('resource_versions')
+        if resources and versions and versions.changed_within(resources, lag):
+            return None
+        now = time.monotonic()
+        healthy = [key for key in self.replicas if self._down_until.get(key, 0) <= now]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def mark_down(self, replica):
+        logger.warning("Replica %s failed; using the primary for %ss",
+                       replica, self.app.config['REPLICA_RETRY_SECONDS'])
+        self._down_until[replica] = time.monotonic() + self.app.config['REPLICA_RETRY_SECONDS']
+
+    def _after_request(self, response):
+        if g.get('db_wrote') and response.status_code < 400:
+            wrote = f'{time.time():.3f}'
+            response.headers[WRITE_HEADER] = wrote
+            response.set_cookie(WRITE_COOKIE, wrote, max_age=math.ceil(self.app.config['REPLICA_STICKY_SECONDS']),
+                                httponly=True, samesite='Lax', secure=request.is_secure)
+        return response
+
+    #=========================routing views=========================
+    def route(self, view):
+        """Run ``view`` against a replica on GET/HEAD, falling back to the primary."""
+        resources = getattr(view, 'resource_names', ())
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            replica = self.choose(resources) if request.method in READ_METHODS else None
+            g.db_replica = replica
+            if replica is None:
+                return view(*args, **kwargs)
+
+            session = current_app.extensions['sqlalchemy'].session
+            try:
+                return view(*args, **kwargs)
+            except OperationalError:
+                if session.info.get('used_replica') != replica:
+                    raise
+                self.mark_down(replica)
+                session.rollback()
+                session.info.pop('used_replica', None)
+                g.db_replica = None
+                return view(*args, **kwargs)
+        return wrapper
+
+
+replica_router = ReplicaRouter()
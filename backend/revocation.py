@@ -0,0 +1,140 @@
+"""In-process cache of revoked JWT ids.
+
+``check_if_token_revoked`` answers from a per-worker dict instead of querying
+``token_blocklist`` on every authenticated request. Each worker process keeps
+its copy current with a background thread that polls for newly revoked tokens
+every ``REVOCATION_SYNC_INTERVAL`` seconds; a logout is visible immediately in
+the worker that handled it and within one interval everywhere else.
+
+Entries are dropped once the token they revoke has expired, and the same thread
+deletes blocklist rows older than ``JWT_ACCESS_TOKEN_EXPIRES`` from the table
+(also available as ``flask blocklist prune``).
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from models import db, TokenBlocklist
+from query_inspector import paused
+
+logger = logging.getLogger(__name__)
+
+# Re-read this far behind the newest row seen, to catch logouts whose
+# transaction committed slightly out of order.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def prune_blocklist(max_age):
+    """Delete blocklist rows whose tokens have expired anyway. Returns the count."""
+    cutoff = datetime.utcnow() - max_age
+    deleted = TokenBlocklist.query.filter(TokenBlocklist.created_at < cutoff).delete(
+        synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+class RevocationCache:
+    def __init__(self, app=None):
+        self.app = None
+        self._revoked = {}  # jti -> when the revoked token expires
+        self._watermark = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._last_prune = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('REVOCATION_SYNC_INTERVAL', 2.0)
+        app.config.setdefault('REVOCATION_PRUNE_INTERVAL', 15 * 60)
+        app.extensions['revocation_cache'] = self
+
+    @property
+    def ttl(self):
+        return self.app.config['JWT_ACCESS_TOKEN_EXPIRES']
+
+    #=========================lookups=========================
+    def is_revoked(self, jti):
+        self._ensure_started()
+        return jti in self._revoked
+
+    def revoke(self, jti, expires_at=None):
+        """Record a revocation made by this worker without waiting for the next sync."""
+        with self._update_lock:
+            self._revoked[jti] = expires_at or datetime.utcnow() + self.ttl
+
+    #=========================sync=========================
+    def _ensure_started(self):
+        # Once per process: a forked worker must not reuse its parent's thread.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._revoked = {}
+            self._watermark = None
+            with self.app.app_context(), paused():
+                self.sync()
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self._run, name='revocation-sync', daemon=True)
+            thread.start()
+
+    def sync(self):
+        """Pull revocations newer than the last sync and evict expired entries."""
+        now = datetime.utcnow()
+        since = now - self.ttl if self._watermark is None else self._watermark - SYNC_OVERLAP
+        rows = db.session.query(TokenBlocklist.jti, TokenBlocklist.created_at).filter(
+            TokenBlocklist.created_at >= since).all()
+        db.session.rollback()
+
+        with self._update_lock:
+            revoked = dict(self._revoked)
+            for jti, created_at in rows:
+                revoked[jti] = created_at + self.ttl
+                if self._watermark is None or created_at > self._watermark:
+                    self._watermark = created_at
+            if self._watermark is None:
+                self._watermark = since
+            # Swap in a new dict so readers never see it half-updated
+            self._revoked = {jti: expires for jti, expires in revoked.items() if expires > now}
+
+    def _run(self):
+        interval = self.app.config['REVOCATION_SYNC_INTERVAL']
+        prune_interval = self.app.config['REVOCATION_PRUNE_INTERVAL']
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(interval)
+            with self.app.app_context():
+                try:
+                    self.sync()
+                    if time.monotonic() - self._last_prune > prune_interval:
+                        self._last_prune = time.monotonic()
+                        prune_blocklist(self.ttl)
+                except Exception:
+                    logger.exception("Token revocation sync failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+revocation_cache = RevocationCache()
+
+
+#=========================cli=========================
+blocklist_cli = AppGroup('blocklist', help='Maintain the JWT blocklist.')
+
+
+@blocklist_cli.command('prune')
+@with_appcontext
+def prune_command():
+    """Delete blocklist entries older than JWT_ACCESS_TOKEN_EXPIRES."""
+    deleted = prune_blocklist(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+    click.echo(f"Deleted {deleted} expired blocklist entr{'y' if deleted == 1 else 'ies'}")
@@ -1,34 +1,388 @@
-from models import User, db
-from app import app
-from werkzeug.security import generate_password_hash
-
-def seed():
-    with app.app_context():
-        username = "admin"
-        email = "admin11@gmail.com"
-        raw_password = "admin"  
-        password_hash = generate_password_hash(raw_password)  # hash it
-
-        # Check if username already exists
-        if User.query.filter_by(username=username).first():
-            print("Username already exists.")
-            return
-
-        # Check if email already exists
-        if User.query.filter_by(email=email).first():
-            print("Email already exists.")
-            return
-
-        # Create and add admin user
-        new_admin = User(
-            username=username,
-            email=email,
-            password_hash=password_hash,
-            is_admin=True,
-            role='admin'  
-        )
-        db.session.add(new_admin)
-        db.session.commit()
-        print("Admin added successfully.")
-
-seed()
+"""Seed data: the admin account, and synthetic data at production scale.
+
+    flask seed admin --username admin --email admin@example.com
+    flask seed data --users 200000 --cars 20000 --bookings 5000000 --reviews 1000000
+
+(``python seed.py ...`` works too.) ``seed data`` appends generated rows after
+whatever is in the database:
+
+* users share one password (``--password``), hashed once - hashing millions of
+  passwords would take hours;
+* cars get a brand, a unique model name, a price by brand tier and a status;
+* bookings go to the generated cars (or, with ``--cars 0``, the existing ones
+  after their last booking), laid out per car as back-to-back stays and gaps
+  across the window (``--start`` to ``--end``), so they never overlap. Some
+  cars and users are much busier than others, most stays are a few days
+  long, and the status depends on whether the stay is past, ongoing or
+  upcoming;
+* reviews are left by the guests of past stays a few days after the return.
+
+The rows are generated with numpy, in chunks, and loaded with COPY on
+PostgreSQL and executemany on SQLite, then the tables are analyzed. With the
+same ``--seed``, ``--as-of`` date and starting database the output is the same.
+"""
+import csv
+import io
+import time
+from datetime import date, timedelta
+
+import click
+import numpy as np
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import select, func, text
+
+from models import db, User, Car, Booking, Review
+from versions import resource_versions
+from passwords import passwords
+
+CHUNK_SIZE = 50000
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+# (brand, price tier, models)
+CATALOG = [
+    ('Toyota', 1.0, ['Corolla', 'Camry', 'Land Cruiser Prado', 'Hilux', 'Vitz', 'RAV4', 'Noah']),
+    ('Nissan', 0.9, ['Note', 'X-Trail', 'Navara', 'Sylphy', 'Juke']),
+    ('Honda', 0.9, ['Fit', 'Civic', 'CR-V', 'Vezel']),
+    ('Mazda', 0.9, ['Demio', 'CX-5', 'Axela', 'Atenza']),
+    ('Subaru', 1.1, ['Forester', 'Outback', 'Impreza', 'XV']),
+    ('Mitsubishi', 0.9, ['Outlander', 'Pajero', 'L200']),
+    ('Volkswagen', 1.2, ['Golf', 'Polo', 'Tiguan', 'Touareg']),
+    ('Ford', 1.2, ['Ranger', 'Everest', 'Focus']),
+    ('Isuzu', 1.0, ['D-Max', 'MU-X']),
+    ('Mercedes', 2.5, ['C200', 'E250', 'GLE', 'GLC']),
+    ('BMW', 2.4, ['320i', 'X3', 'X5', '520d']),
+    ('Audi', 2.3, ['A4', 'Q5', 'Q7']),
+    ('Land Rover', 3.0, ['Discovery', 'Range Rover Sport', 'Defender']),
+    ('Lexus', 2.6, ['RX 350', 'LX 570', 'NX 300']),
+]
+COMMENTS = [
+    'Clean car and easy pickup.', 'Smooth drive, would book again.', 'Great value for the price.',
+    'The car was late to the pickup point.', 'Comfortable for a long road trip.',
+    'Fuel economy was better than expected.', 'A few scratches, but it ran fine.',
+    'Perfect for a weekend away.', 'AC was not working well.', 'Friendly staff and a spotless car.',
+]
+
+
+#=========================generation=========================
+def _days(column):
+    """Day numbers since 1970-01-01 as 'YYYY-MM-DD' strings."""
+    return np.datetime_as_string(EPOCH + column, unit='D').tolist()
+
+
+def _timestamps(seconds):
+    """Seconds since 1970-01-01 as 'YYYY-MM-DD HH:MM:SS' strings."""
+    stamps = np.datetime_as_string(seconds.astype('datetime64[s]'), unit='s')
+    return np.char.replace(stamps, 'T', ' ').tolist()
+
+
+def _skewed_weights(rng, count, sigma):
+    """Lognormal popularity: a minority of items get most of the activity."""
+    weights = rng.lognormal(0.0, sigma, count)
+    return weights / weights.sum()
+
+
+def user_chunks(first_id, count, password_hash):
+    for offset in range(0, count, CHUNK_SIZE):
+        ids = range(first_id + offset, first_id + min(count, offset + CHUNK_SIZE))
+        yield [(i, f'user{i}', f'user{i}@example.com', password_hash, 'user', False) for i in ids]
+
+
+def car_chunks(rng, first_id, count):
+    brand_index = rng.integers(0, len(CATALOG), count)
+    model_index = rng.integers(0, 1000, count)
+    price = rng.lognormal(np.log(4500), 0.35, count)
+    status = rng.choice(['available', 'booked', 'maintenance'], count, p=[0.92, 0.05, 0.03])
+    for offset in range(0, count, CHUNK_SIZE):
+        rows = []
+        for i in range(offset, min(count, offset + CHUNK_SIZE)):
+            car_id = first_id + i
+            brand, tier, models = CATALOG[brand_index[i]]
+            rows.append((car_id, brand, f'{models[model_index[i] % len(models)]} #{car_id}',
+                         round(float(price[i] * tier), -1), str(status[i]),
+                         f'https://images.example.com/cars/{car_id}/1.jpg',
+                         f'https://images.example.com/cars/{car_id}/2.jpg'))
+        yield rows
+
+
+def generate_bookings(rng, count, car_ids, car_starts, user_ids, end, today, now):
+    """Non-overlapping bookings as int arrays, in created_at order.
+
+    ``car_starts`` is the first free day of each car. Returns
+    (car_id, user_id, start_day, end_day, status_code, created_at_seconds)
+    where status_code indexes ``('pending', 'confirmed', 'cancelled')``.
+    """
+    # Stays are 1 + geometric days (mean 3.5); each car takes at most what
+    # fills 90% of its part of the window
+    span = np.maximum(end - car_starts, 1)
+    capacity = (span * 0.9 / 3.5).astype(np.int64)
+    if capacity.sum() < count:
+        raise click.UsageError(f'{count:,} bookings do not fit {len(car_ids):,} cars between --start and --end; '
+                               f'widen the window or add cars.')
+    weights = _skewed_weights(rng, len(car_ids), 0.7)
+    per_car = rng.multinomial(count, weights)
+    # Busy cars are full: hand what does not fit to the cars with room
+    while (per_car > capacity).any():
+        excess = int(np.maximum(per_car - capacity, 0).sum())
+        per_car = np.minimum(per_car, capacity)
+        room = weights * (per_car < capacity)
+        per_car += rng.multinomial(excess, room / room.sum())
+    car = np.repeat(car_ids, per_car)
+    car_index = np.repeat(np.arange(len(car_ids)), per_car)
+
+    # The days a car is not booked are split between the gaps before its
+    # stays and the slack after the last one, in random proportions
+    length = np.minimum(rng.geometric(0.4, count), 30)
+    free = np.maximum(span - np.bincount(car_index, weights=length, minlength=len(car_ids)), 0)
+    share = rng.exponential(1.0, count)
+    shares = np.bincount(car_index, weights=share, minlength=len(car_ids)) + rng.exponential(1.0, len(car_ids))
+    gap = np.floor(free[car_index] * share / shares[car_index]).astype(np.int64)
+    step = gap + length
+    # Running total of days within each car: subtract the cars before it
+    car_days = np.bincount(car_index, weights=step, minlength=len(car_ids)).astype(np.int64)
+    ends = np.cumsum(step) - (np.cumsum(car_days) - car_days)[car_index]
+    start_day = car_starts[car_index] + ends - length
+    end_day = start_day + length
+
+    past, upcoming = end_day <= today, start_day > today
+    status = np.full(count, 1)
+    draw = rng.random(count)
+    status[past & (draw < 0.12)] = 2
+    status[upcoming & (draw < 0.30)] = 0
+    status[upcoming & (draw >= 0.30) & (draw < 0.40)] = 2
+
+    lead_days = rng.geometric(1 / 14, count)
+    created = (start_day - lead_days) * 86400 + rng.integers(7 * 3600, 23 * 3600, count)
+    created = np.minimum(created, now)
+
+    user = rng.choice(user_ids, count, p=_skewed_weights(rng, len(user_ids), 1.0))
+    order = np.argsort(created, kind='stable')
+    return car[order], user[order], start_day[order], end_day[order], status[order], created[order]
+
+
+def booking_chunks(first_id, bookings):
+    car, user, start_day, end_day, status, created = bookings
+    names = ('pending', 'confirmed', 'cancelled')
+    for offset in range(0, len(car), CHUNK_SIZE):
+        part = slice(offset, offset + CHUNK_SIZE)
+        ids = range(first_id + offset, first_id + offset + len(car[part]))
+        yield list(zip(ids, _days(start_day[part]), _days(end_day[part]),
+                       [names[s] for s in status[part].tolist()],
+                       user[part].tolist(), car[part].tolist(), _timestamps(created[part])))
+
+
+def generate_reviews(rng, count, bookings, today, now):
+    """(car_id, user_id, rating, comment_index, timestamp_seconds) for past, non-cancelled stays."""
+    car, user, _, end_day, status, _ = bookings
+    stays = np.flatnonzero((end_day <= today) & (status != 2))
+    if not len(stays):
+        return None
+    chosen = np.sort(rng.choice(stays, count, replace=count > len(stays)))
+    rating = rng.choice([1, 2, 3, 4, 5], count, p=[0.03, 0.05, 0.12, 0.35, 0.45])
+    # About a third leave the comment empty
+    comment = np.where(rng.random(count) < 0.35, -1, rng.integers(0, len(COMMENTS), count))
+    written = (end_day[chosen] + rng.geometric(0.4, count) - 1) * 86400 + rng.integers(8 * 3600, 22 * 3600, count)
+    written = np.minimum(written, now)
+    order = np.argsort(written, kind='stable')
+    return car[chosen][order], user[chosen][order], rating[order], comment[order], written[order]
+
+
+def review_chunks(first_id, reviews):
+    car, user, rating, comment, written = reviews
+    for offset in range(0, len(car), CHUNK_SIZE):
+        part = slice(offset, offset + CHUNK_SIZE)
+        ids = range(first_id + offset, first_id + offset + len(car[part]))
+        comments = [COMMENTS[c] if c >= 0 else None for c in comment[part].tolist()]
+        yield list(zip(ids, rating[part].tolist(), comments, _timestamps(written[part]),
+                       user[part].tolist(), car[part].tolist()))
+
+
+#=========================loading=========================
+def bulk_load(connection, model, columns, chunks, rebuild_indexes=False):
+    """Insert row tuples chunk by chunk: COPY on PostgreSQL, executemany elsewhere.
+
+    With ``rebuild_indexes`` the table's secondary indexes are dropped first
+    and built again at the end, which beats updating them row by row when
+    the load is as big as the table.
+    """
+    table = model.__table__
+    cursor = connection.cursor()
+    postgres = db.engine.dialect.name == 'postgresql'
+    names = ', '.join(columns)
+    if postgres:
+        statement = f"COPY {table.name} ({names}) FROM STDIN WITH (FORMAT csv)"
+    else:
+        statement = f"INSERT INTO {table.name} ({names}) VALUES ({', '.join('?' * len(columns))})"
+
+    started, total = time.perf_counter(), 0
+    if rebuild_indexes:
+        with db.engine.begin() as conn:
+            for index in table.indexes:
+                index.drop(conn, checkfirst=True)
+    try:
+        for rows in chunks:
+            if postgres:
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator='\n').writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(statement, buffer)
+            else:
+                cursor.executemany(statement, rows)
+            total += len(rows)
+        connection.commit()
+    finally:
+        if rebuild_indexes:
+            with db.engine.begin() as conn:
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+    elapsed = time.perf_counter() - started
+    if total:
+        click.echo(f"{table.name:<10} {total:>10,} rows in {elapsed:6.1f}s  "
+                   f"{total / max(elapsed, 1e-9):>10,.0f} rows/s{' (indexes rebuilt)' if rebuild_indexes else ''}")
+    return total, elapsed
+
+
+def next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def seed_data(users, cars, bookings, reviews, seed=42, start=None, end=None, as_of=None, password='password'):
+    """Generate and load the rows; returns {table: (rows, seconds)}."""
+    as_of = as_of or date.today()
+    start = start or as_of - timedelta(days=730)
+    end = end or as_of + timedelta(days=90)
+    today = (as_of - date(1970, 1, 1)).days
+    now = today * 86400 + 12 * 3600
+    window_start, window_end = (start - date(1970, 1, 1)).days, (end - date(1970, 1, 1)).days
+    rng = np.random.default_rng(seed)
+    first = {model: next_id(model) for model in (User, Car, Booking, Review)}
+
+    user_ids = np.arange(first[User], first[User] + users)
+    car_ids = np.arange(first[Car], first[Car] + cars)
+    if bookings and not len(user_ids):
+        user_ids = np.array(db.session.scalars(select(User.id).order_by(User.id)).all())
+    if bookings and not len(car_ids):
+        car_ids = np.array(db.session.scalars(select(Car.id).order_by(Car.id)).all())
+    if bookings and not (len(user_ids) and len(car_ids)):
+        raise click.UsageError('Bookings need users and cars: generate some or seed an existing database.')
+
+    # New bookings for existing cars start after their last one
+    car_starts = np.full(len(car_ids), window_start)
+    if bookings and not cars:
+        booked_until = dict(db.session.execute(
+            select(Booking.car_id, func.max(Booking.end_date))
+            .where(Booking.status != 'cancelled')
+            .group_by(Booking.car_id)).all())
+        for i, car_id in enumerate(car_ids.tolist()):
+            if car_id in booked_until:
+                car_starts[i] = max(window_start, (booked_until[car_id] - date(1970, 1, 1)).days)
+    db.session.commit()
+
+    generated = generate_bookings(rng, bookings, car_ids, car_starts, user_ids, window_end, today, now) \
+        if bookings else None
+    written = generate_reviews(rng, reviews, generated, today, now) if reviews and generated else None
+    if reviews and written is None:
+        raise click.UsageError('Reviews are written for past bookings: generate bookings that end before --as-of.')
+
+    report = {}
+    connection = db.engine.raw_connection()
+    try:
+        if db.engine.dialect.name == 'sqlite':
+            # A crash halfway leaves a scratch database to regenerate anyway
+            connection.cursor().execute('PRAGMA synchronous = OFF')
+        if users:
+            report['users'] = bulk_load(connection, User,
+                                        ('id', 'username', 'email', 'password_hash', 'role', 'is_admin'),
+                                        user_chunks(first[User], users, passwords.hash(password)),
+                                        rebuild_indexes=users >= first[User] - 1)
+        if cars:
+            report['cars'] = bulk_load(connection, Car,
+                                       ('id', 'brand', 'model', 'price_per_day', 'status', 'image1', 'image2'),
+                                       car_chunks(rng, first[Car], cars),
+                                       rebuild_indexes=cars >= first[Car] - 1)
+        if generated is not None:
+            report['bookings'] = bulk_load(connection, Booking,
+                                           ('id', 'start_date', 'end_date', 'status', 'user_id', 'car_id',
+                                            'created_at'),
+                                           booking_chunks(first[Booking], generated),
+                                           rebuild_indexes=bookings >= first[Booking] - 1)
+        if written is not None:
+            report['reviews'] = bulk_load(connection, Review,
+                                          ('id', 'rating', 'comment', 'timestamp', 'user_id', 'car_id'),
+                                          review_chunks(first[Review], written),
+                                          rebuild_indexes=reviews >= first[Review] - 1)
+    finally:
+        connection.close()
+
+    with db.engine.begin() as conn:
+        if db.engine.dialect.name == 'postgresql':
+            # Explicit ids leave the sequences behind
+            for table in report:
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                  f"(SELECT max(id) FROM {table}))"))
+        for table in report:
+            conn.execute(text(f'ANALYZE {table}'))
+    resource_versions.bump(*(name for name in ('cars', 'bookings', 'reviews') if name in report))
+    return report
+
+
+#=========================cli=========================
+seed_cli = AppGroup('seed', help='Create the admin account or generate synthetic data.')
+
+
+@seed_cli.command('admin')
+@click.option('--username', default='admin', show_default=True)
+@click.option('--email', required=True)
+@click.option('--password', prompt=True, hide_input=True, confirmation_prompt=True)
+@with_appcontext
+def admin_command(username, email, password):
+    """Create an admin account."""
+    # Check if username already exists
+    if User.query.filter_by(username=username).first():
+        click.echo("Username already exists.")
+        return
+
+    # Check if email already exists
+    if User.query.filter_by(email=email).first():
+        click.echo("Email already exists.")
+        return
+
+    new_admin = User(
+        username=username,
+        email=email,
+        password_hash=passwords.hash(password),
+        is_admin=True,
+        role='admin'
+    )
+    db.session.add(new_admin)
+    db.session.commit()
+    click.echo("Admin added successfully.")
+
+
+@seed_cli.command('data')
+@click.option('--users', type=int, default=10000, show_default=True)
+@click.option('--cars', type=int, default=1000, show_default=True)
+@click.option('--bookings', type=int, default=100000, show_default=True)
+@click.option('--reviews', type=int, default=20000, show_default=True)
+@click.option('--seed', type=int, default=42, show_default=True, help='Random seed.')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='First booking day (default: two years before --as-of).')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='Bookings fill the window up to this day (default: 90 days after --as-of).')
+@click.option('--as-of', type=click.DateTime(['%Y-%m-%d']), default=None,
+              help='"Today" for statuses and timestamps (default: today).')
+@click.option('--password', default='password', show_default=True, help='Password of every generated user.')
+@with_appcontext
+def data_command(users, cars, bookings, reviews, seed, start, end, as_of, password):
+    """Append generated users, cars, bookings and reviews."""
+    started = time.perf_counter()
+    report = seed_data(users, cars, bookings, reviews, seed=seed,
+                       start=start and start.date(), end=end and end.date(),
+                       as_of=as_of and as_of.date(), password=password)
+    rows = sum(total for total, _ in report.values())
+    elapsed = time.perf_counter() - started
+    click.echo(f"{'total':<10} {rows:>10,} rows in {elapsed:6.1f}s  {rows / max(elapsed, 1e-9):>10,.0f} rows/s "
+               f"(including generation)")
+
+
+if __name__ == '__main__':
+    seed_cli()
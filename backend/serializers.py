@@ -0,0 +1,178 @@
+"""Response schemas for cars, bookings, reviews and users.
+
+A schema is an ordered list of (key, column) fields. Views project their query
+onto just those columns, so list endpoints read plain row tuples instead of
+hydrating every mapped attribute of every ORM object, and the rows are encoded
+with orjson (dates and datetimes come out in ISO 8601, as before).
+
+    page = paginate(CAR.project(query), Car, sortable)
+    return page.apply_headers(CAR.jsonify(page.items)), 200
+
+Unpaginated lists use ``schema.stream(query)``, which fetches and encodes the
+rows in chunks and sends them as a chunked JSON array, so memory stays flat
+however many rows there are.
+"""
+from itertools import islice
+
+import orjson
+from flask import Response, stream_with_context
+from sqlalchemy import func, select
+
+from models import User, Car, Booking, Review
+
+STREAM_CHUNK_SIZE = 1000
+
+
+def json_response(data, status=200):
+    """orjson-encoded counterpart of ``flask.jsonify``."""
+    return Response(orjson.dumps(data), status=status, mimetype='application/json')
+
+
+class Schema:
+    def __init__(self, *fields, convert=None):
+        self.keys = tuple(key for key, _ in fields)
+        self.columns = tuple(column for _, column in fields)
+        # key -> function applied to the raw column value
+        self.convert = convert or {}
+
+    def project(self, query):
+        """Restrict an ORM query to this schema's columns (rows come back as tuples)."""
+        return query.with_entities(*self.columns)
+
+    def dump(self, row):
+        data = dict(zip(self.keys, row))
+        for key, convert in self.convert.items():
+            data[key] = convert(data[key])
+        return data
+
+    def dump_many(self, rows):
+        if not self.convert:
+            keys = self.keys
+            return [dict(zip(keys, row)) for row in rows]
+        return [self.dump(row) for row in rows]
+
+    def jsonify(self, rows, status=200):
+        return json_response(self.dump_many(rows), status)
+
+    def jsonify_one(self, row, status=200):
+        return json_response(self.dump(row), status)
+
+    def iter_json(self, rows, chunk_size=STREAM_CHUNK_SIZE):
+        """Encode ``rows`` as a JSON array, ``chunk_size`` rows per yielded piece."""
+        rows = iter(rows)
+        yield b'['
+        separator = b''
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield separator + self.json_items(chunk)
+            separator = b','
+        yield b']'
+
+    def json_items(self, rows):
+        """``rows`` as the items of a JSON array, without the brackets, to splice into one."""
+        return orjson.dumps(self.dump_many(rows))[1:-1]
+
+    def stream(self, query, chunk_size=STREAM_CHUNK_SIZE):
+        """Stream every row of ``query`` (already projected) as one JSON array."""
+        rows = iter(query.yield_per(chunk_size))
+        session = query.session
+
+        def generate():
+            try:
+                yield from self.iter_json(rows, chunk_size)
+            finally:
+                # Request teardown doesn't give back the connection the rows are
+                # read from; without this every streamed response kept one
+                session.close()
+
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def _or_empty(value):
+    return value.isoformat() if value else ''
+
+
+#=========================schemas=========================
+CAR = Schema(
+    ('id', Car.id),
+    ('brand', Car.brand),
+    ('model', Car.model),
+    ('image1', Car.image1),
+    ('image2', Car.image2),
+    ('price_per_day', Car.price_per_day),
+    ('status', Car.status),
+)
+
+BOOKING = Schema(
+    ('id', Booking.id),
+    ('user_id', Booking.user_id),
+    ('car_id', Booking.car_id),
+    ('start_date', Booking.start_date),
+    ('end_date', Booking.end_date),
+    ('status', Booking.status),
+    ('created_at', Booking.created_at),
+)
+
+# A user's own bookings leave out the user_id
+USER_BOOKING = Schema(
+    ('id', Booking.id),
+    ('car_id', Booking.car_id),
+    ('start_date', Booking.start_date),
+    ('end_date', Booking.end_date),
+    ('status', Booking.status),
+    ('created_at', Booking.created_at),
+)
+
+REVIEW = Schema(
+    ('id', Review.id),
+    ('user_id', Review.user_id),
+    ('car_id', Review.car_id),
+    ('rating', Review.rating),
+    ('comment', Review.comment),
+    ('timestamp', Review.timestamp),
+    convert={'timestamp': _or_empty},
+)
+
+# Reviews shown on a car's page, with names resolved by outer joins
+# (see car_reviews_query) rather than one lazy load per review.
+CAR_REVIEW = Schema(
+    ('id', Review.id),
+    ('username', func.coalesce(User.username, 'Unknown')),
+    ('car_model', func.coalesce(Car.model, 'Unknown')),
+    ('rating', Review.rating),
+    ('comment', Review.comment),
+    ('timestamp', Review.timestamp),
+    convert={'timestamp': _or_empty},
+)
+
+USER = Schema(
+    ('id', User.id),
+    ('username', User.username),
+    ('email', User.email),
+    ('role', User.role),
+    ('is_admin', User.is_admin),
+)
+
+
+def car_reviews_query(car_id):
+    return (
+        CAR_REVIEW.project(Review.query)
+        .outerjoin(User, User.id == Review.user_id)
+        .outerjoin(Car, Car.id == Review.car_id)
+        .filter(Review.car_id == car_id)
+        .order_by(Review.id)
+    )
+
+
+def car_reviews_select(car_id):
+    """car_reviews_query as a Core select(), for the async engine."""
+    return (
+        select(*CAR_REVIEW.columns)
+        .select_from(Review)
+        .outerjoin(User, User.id == Review.user_id)
+        .outerjoin(Car, Car.id == Review.car_id)
+        .where(Review.car_id == car_id)
+        .order_by(Review.id)
+    )
@@ -0,0 +1,129 @@
+"""Counts and recent activity for the admin dashboard.
+
+Everything comes from a handful of grouped aggregate queries (no row
+transfers beyond the few recent items) and is cached per worker for
+``SUMMARY_TTL_SECONDS``, so a busy dashboard costs at most one round of
+queries per interval.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, func
+
+from models import db, User, Car, Booking, Review, CAR_STATUSES, BOOKING_STATUSES
+
+SUMMARY_TTL_SECONDS = 15
+RECENT_ITEMS = 10
+RECENT_WINDOW = timedelta(days=7)
+
+
+def _counts_by(column, values):
+    counts = dict.fromkeys(values, 0)
+    counts.update(db.session.execute(select(column, func.count()).group_by(column)).all())
+    return counts
+
+
+def _recent_bookings():
+    rows = db.session.execute(
+        select(Booking.id, Booking.status, Booking.start_date, Booking.end_date, Booking.created_at,
+               User.username, Car.brand, Car.model)
+        .join(User, User.id == Booking.user_id)
+        .join(Car, Car.id == Booking.car_id)
+        .order_by(Booking.id.desc())
+        .limit(RECENT_ITEMS)
+    ).all()
+    return [
+        {'id': row.id, 'status': row.status, 'start_date': row.start_date, 'end_date': row.end_date,
+         'created_at': row.created_at, 'username': row.username, 'car': f'{row.brand} {row.model}'}
+        for row in rows
+    ]
+
+
+def _recent_reviews():
+    rows = db.session.execute(
+        select(Review.id, Review.rating, Review.comment, Review.timestamp,
+               User.username, Car.brand, Car.model)
+        .join(User, User.id == Review.user_id)
+        .join(Car, Car.id == Review.car_id)
+        .order_by(Review.id.desc())
+        .limit(RECENT_ITEMS)
+    ).all()
+    return [
+        {'id': row.id, 'rating': row.rating, 'comment': row.comment, 'timestamp': row.timestamp,
+         'username': row.username, 'car': f'{row.brand} {row.model}'}
+        for row in rows
+    ]
+
+
+def compute_summary():
+    now = datetime.utcnow()
+    since = now - RECENT_WINDOW
+
+    bookings_by_status = _counts_by(Booking.status, BOOKING_STATUSES)
+    recent_count, oldest_pending = db.session.execute(
+        select(func.count().filter(Booking.created_at >= since),
+               func.min(Booking.created_at).filter(Booking.status == 'pending'))
+    ).one()
+    cars_by_status = _counts_by(Car.status, CAR_STATUSES)
+    review_count, average_rating = db.session.execute(
+        select(func.count(), func.avg(Review.rating))
+    ).one()
+    user_count, admin_count = db.session.execute(
+        select(func.count(), func.count().filter(User.is_admin.is_(True)))
+    ).one()
+
+    return {
+        'generated_at': now,
+        'bookings': {
+            'total': sum(bookings_by_status.values()),
+            'by_status': bookings_by_status,
+            'created_last_7_days': recent_count,
+            'oldest_pending_created_at': oldest_pending,
+        },
+        'cars': {
+            'total': sum(cars_by_status.values()),
+            'by_status': cars_by_status,
+        },
+        'reviews': {
+            'total': review_count,
+            'average_rating': round(float(average_rating), 2) if average_rating is not None else None,
+        },
+        'users': {
+            'total': user_count,
+            'admins': admin_count,
+        },
+        'recent_activity': {
+            'bookings': _recent_bookings(),
+            'reviews': _recent_reviews(),
+        },
+    }
+
+
+class SummaryCache:
+    def __init__(self, ttl=SUMMARY_TTL_SECONDS):
+        self.ttl = ttl
+        self._summary = None
+        self._app = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        # Keyed on the app too: another app in this process (tests) has its own database
+        app = current_app._get_current_object()
+        if self._app is app and time.monotonic() < self._expires:
+            return self._summary
+        # One request recomputes; the others wait for it instead of piling on
+        with self._lock:
+            if self._app is not app or time.monotonic() >= self._expires:
+                self._summary = compute_summary()
+                self._app = app
+                self._expires = time.monotonic() + self.ttl
+            return self._summary
+
+    def clear(self):
+        self._expires = 0.0
+
+
+summary_cache = SummaryCache()
@@ -0,0 +1,71 @@
+"""Fixtures: the app on the test profile, with a few users, cars, reviews and bookings.
+
+The test profile enforces QUERY_BUDGETS: a request over its endpoint's budget,
+or with an N+1, raises QueryBudgetExceeded and fails the test that made it.
+"""
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from models import db, User, Car, Review, Booking
+
+PASSWORD = 'secret-password'
+
+
+@pytest.fixture
+def app():
+    app = create_app('test')
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, email, password=PASSWORD):
+    response = client.post('/login', json={'email': email, 'password_hash': password})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+@pytest.fixture
+def data(app, client):
+    """Ids and auth headers for the seeded rows."""
+    pwhash = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+    users = [User(username=f'user{i}', email=f'user{i}@example.com', password_hash=pwhash,
+                  role='user', is_admin=False) for i in range(4)]
+    admin = User(username='admin', email='admin@example.com', password_hash=pwhash, role='admin', is_admin=True)
+    # Hashed with other parameters than PASSWORD_HASH_METHOD: logging in rehashes it
+    outdated = User(username='outdated', email='outdated@example.com', role='user', is_admin=False,
+                    password_hash=generate_password_hash(PASSWORD, 'pbkdf2:sha256:2000'))
+    cars = [Car(brand=brand, model=model, price_per_day=price, status='available',
+                image1='front.jpg', image2='side.jpg')
+            for brand, model, price in (('Toyota', 'Corolla', 3000), ('Toyota', 'Prado', 9000),
+                                        ('Mazda', 'Demio', 2500), ('Subaru', 'Forester', 6000))]
+    db.session.add_all([*users, admin, outdated, *cars])
+    db.session.flush()
+
+    # One review per user on the first car, so per-review lazy loads would show as an N+1
+    db.session.add_all(Review(user_id=user.id, car_id=cars[0].id, rating=4, comment='Smooth drive')
+                       for user in users)
+    cancelled = Booking(user_id=users[0].id, car_id=cars[1].id, status='cancelled',
+                        start_date=date(2030, 1, 10), end_date=date(2030, 1, 15))
+    confirmed = Booking(user_id=users[1].id, car_id=cars[2].id, status='confirmed',
+                        start_date=date(2030, 2, 1), end_date=date(2030, 2, 4))
+    db.session.add_all([cancelled, confirmed])
+    db.session.commit()
+
+    return SimpleNamespace(
+        user_ids=[user.id for user in users],
+        car_ids=[car.id for car in cars],
+        cancelled_booking_id=cancelled.id,
+        confirmed_booking_id=confirmed.id,
+        user=login(client, users[0].email),
+        admin=login(client, admin.email),
+    )
@@ -0,0 +1,17 @@
+"""Car and fleet calendars at the edge of the dates they can show."""
+import pytest
+
+
+@pytest.mark.parametrize('url', ['/cars/{car}/calendar', '/cars/calendar'])
+def test_calendar_up_to_the_last_month(client, data, url):
+    url = url.format(car=data.car_ids[0])
+    assert client.get(f'{url}?month=9999-11').status_code == 200
+    assert client.get(f'{url}?month=9999-10&months=2').status_code == 200
+
+
+@pytest.mark.parametrize('url', ['/cars/{car}/calendar', '/cars/calendar'])
+@pytest.mark.parametrize('query', ['month=9999-12', 'month=9999-12&months=2', 'month=9999-10&months=3'])
+def test_calendar_past_the_last_month_is_a_bad_request(client, data, url, query):
+    response = client.get(f'{url.format(car=data.car_ids[0])}?{query}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'The calendar only goes up to 9999-11'}
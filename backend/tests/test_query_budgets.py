@@ -0,0 +1,90 @@
+"""Every endpoint in QUERY_BUDGETS, on its slowest path, within its budget and without an N+1.
+
+The test profile sets QUERY_BUDGETS_ENFORCE, so the request itself fails
+(QueryBudgetExceeded, an AssertionError) when it runs more statements than
+its budget. A new budgeted endpoint needs a case here.
+"""
+import pytest
+
+from config import BASE
+from query_inspector import QueryBudgetExceeded, _active_logs, query_budget
+
+# endpoint -> data -> (method, url, request options, expected status)
+CASES = {
+    'car_bp.fetch_all_cars': lambda d: ('GET', '/cars?brand=Toyota&sort=-price_per_day&limit=1', {}, 200),
+    'car_bp.fetch_car': lambda d: ('GET', f'/cars/{d.car_ids[0]}/', {}, 200),
+    'car_bp.search_car_catalog': lambda d: ('GET', '/cars/search?q=toyta', {}, 200),
+    'car_bp.fetch_available_cars': lambda d: ('GET', '/cars/available?start=2030-01-01&end=2030-03-01', {}, 200),
+    'car_bp.fetch_car_calendar': lambda d: ('GET', f'/cars/{d.car_ids[1]}/calendar?month=2030-01&months=3', {}, 200),
+    'car_bp.fetch_fleet_calendar': lambda d: ('GET', '/cars/calendar?month=2030-01&months=3', {}, 200),
+    'review.get_all_reviews': lambda d: ('GET', f'/reviews?car_id={d.car_ids[0]}', {}, 200),
+    'review.get_reviews_by_car': lambda d: ('GET', f'/reviews/car/{d.car_ids[0]}/', {}, 200),
+    'review.create_review': lambda d: ('POST', '/reviews', {
+        'json': {'car_id': d.car_ids[0], 'rating': 5, 'comment': 'Great'}, 'headers': d.user}, 201),
+    'booking.create_booking': lambda d: ('POST', '/bookings', {
+        'json': {'car_id': d.car_ids[3], 'start_date': '2030-05-01', 'end_date': '2030-05-05'},
+        'headers': d.user}, 201),
+    # Re-activating a cancelled booking: locks the car and checks for clashes
+    'booking.update_booking': lambda d: ('PATCH', f'/bookings/{d.cancelled_booking_id}/', {
+        'json': {'status': 'confirmed'}, 'headers': d.admin}, 200),
+    'booking.bulk_update_bookings': lambda d: ('PATCH', '/bookings/bulk', {
+        'json': {'status': 'confirmed', 'ids': [d.cancelled_booking_id, d.confirmed_booking_id]},
+        'headers': d.admin}, 200),
+    'booking.fetch_all_bookings': lambda d: ('GET', '/bookings?status=confirmed', {'headers': d.admin}, 200),
+    'booking.delete_booking': lambda d: ('DELETE', f'/bookings/{d.confirmed_booking_id}/', {'headers': d.admin}, 200),
+    'user.create_user': lambda d: ('POST', '/users', {
+        'json': {'username': 'newcomer', 'email': 'newcomer@example.com', 'password': 'pw'}}, 201),
+    'user.fetch_all_users': lambda d: ('GET', '/users', {'headers': d.admin}, 200),
+    # A stored hash with other parameters: login also stores a new one
+    'auth_bp.login_user': lambda d: ('POST', '/login', {
+        'json': {'email': 'outdated@example.com', 'password_hash': 'secret-password'}}, 200),
+    'auth_bp.fetch_current_user': lambda d: ('GET', '/current_user', {'headers': d.user}, 200),
+    'admin.admin_summary': lambda d: ('GET', '/admin/summary', {'headers': d.admin}, 200),
+}
+
+
+def test_every_budgeted_endpoint_has_a_case():
+    assert sorted(CASES) == sorted(BASE['QUERY_BUDGETS'])
+
+
+@pytest.mark.parametrize('endpoint', sorted(CASES))
+def test_endpoint_within_budget(client, data, endpoint):
+    method, url, options, status = CASES[endpoint](data)
+    # A streamed body runs its queries as it is sent, and is checked once closed
+    with client.open(url, method=method, **options) as response:
+        body = response.get_data(as_text=True)
+    assert response.status_code == status, body
+
+
+def test_over_budget_fails(app, client, data):
+    app.config['QUERY_BUDGETS'] = {**app.config['QUERY_BUDGETS'], 'car_bp.fetch_car': 0}
+    with pytest.raises(QueryBudgetExceeded, match='budget 0'):
+        client.get(f'/cars/{data.car_ids[0]}/')
+
+
+STREAMED = ['/reviews/car/{car}/', '/cars/available?start=2030-01-01&end=2030-03-01']
+
+
+@pytest.mark.parametrize('url', STREAMED)
+def test_head_of_a_streamed_body_leaves_no_query_log(client, data, url):
+    # Werkzeug never iterates the body of a HEAD response, only closes it (as a server does)
+    for _ in range(2):
+        with client.head(url.format(car=data.car_ids[0])) as response:
+            assert response.status_code == 200
+        assert _active_logs() == []
+
+
+def test_car_reviews_load_users_and_cars_in_one_query(client, data):
+    with query_budget(1, n_plus_one_threshold=2) as log:
+        with client.get(f'/reviews/car/{data.car_ids[0]}/') as response:
+            reviews = response.get_json()
+    assert [review['username'] for review in reviews] == ['user0', 'user1', 'user2', 'user3']
+    assert log.count == 1
+
+
+def test_lazy_loading_each_reviews_user_is_an_n_plus_one(app, data):
+    from models import Review
+
+    with pytest.raises(QueryBudgetExceeded, match=r'Review\.user lazily loaded 4 times \(N\+1\)'):
+        with query_budget(None, n_plus_one_threshold=2):
+            [review.user.username for review in Review.query.filter_by(car_id=data.car_ids[0])]
@@ -0,0 +1,99 @@
+"""Replica routing against two local SQLite databases: a primary and a replica.
+
+The two hold different cars, so each response shows which one it was read from.
+"""
+import time
+
+import pytest
+
+from app import create_app
+from models import db, Car, User
+from replicas import WRITE_COOKIE, WRITE_HEADER
+from versions import resource_versions
+
+from conftest import PASSWORD, login
+
+
+def add_car(brand):
+    db.session.add(Car(brand=brand, model='Corolla', price_per_day=3000, status='available',
+                       image1='front.jpg', image2='side.jpg'))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('APP_PROFILE', 'test')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'SQLALCHEMY_REPLICA_URIS': [f"sqlite:///{tmp_path / 'replica.db'}"],
+    })
+    with app.app_context():
+        db.metadata.create_all(db.engines['replica_0'])
+        from werkzeug.security import generate_password_hash
+        db.session.add(User(username='driver', email='driver@example.com', role='user', is_admin=False,
+                            password_hash=generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])))
+        add_car('Primary')
+        db.session.commit()
+        with db.engines['replica_0'].begin() as conn:
+            conn.execute(Car.__table__.insert(), {'brand': 'Replica', 'model': 'Corolla', 'price_per_day': 3000,
+                                                  'status': 'available', 'image1': 'a', 'image2': 'b'})
+        yield app
+        db.session.remove()
+
+
+def brands(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return [car['brand'] for car in response.get_json()]
+
+
+def test_routed_reads_go_to_the_replica(client):
+    assert brands(client.get('/cars')) == ['Replica']
+    assert client.get('/cars/1/').get_json()['brand'] == 'Replica'
+
+
+def test_other_endpoints_use_the_primary(client):
+    assert client.get('/cars/search?q=pri').get_json()[0]['brand'] == 'Primary'
+
+
+def test_failed_replica_falls_back_to_the_primary(app, client):
+    with db.engines['replica_0'].begin() as conn:
+        Car.__table__.drop(conn)
+    assert brands(client.get('/cars')) == ['Primary']
+    # Skipped for REPLICA_RETRY_SECONDS, without trying it first
+    assert app.extensions['replica_router']._down_until['replica_0'] > time.monotonic()
+    assert brands(client.get('/cars')) == ['Primary']
+
+
+def test_a_write_keeps_that_client_on_the_primary(app, client):
+    headers = login(client, 'driver@example.com')
+    response = client.post('/reviews', json={'car_id': 1, 'rating': 5}, headers=headers)
+    assert response.status_code == 201
+    assert response.headers[WRITE_HEADER]
+    assert client.get_cookie(WRITE_COOKIE) is not None
+
+    # /reviews reads 'reviews', bumped by the write; /cars/1/ reads 'cars', which wasn't
+    assert client.get('/cars/1/').get_json()['brand'] == 'Primary'
+    other = app.test_client()
+    assert other.get('/cars/1/').get_json()['brand'] == 'Replica'
+    # Clients without cookies echo the header instead, on any worker
+    echoed = {WRITE_HEADER: response.headers[WRITE_HEADER]}
+    assert other.get('/cars/1/', headers=echoed).get_json()['brand'] == 'Primary'
+
+
+def test_stickiness_expires(app, client):
+    stale = {WRITE_HEADER: str(time.time() - app.config['REPLICA_STICKY_SECONDS'] - 1)}
+    assert client.get('/cars/1/', headers=stale).get_json()['brand'] == 'Replica'
+    for junk in ('soon', str(time.time() + 3600)):
+        assert client.get('/cars/1/', headers={WRITE_HEADER: junk}).get_json()['brand'] == 'Replica'
+
+
+def test_fresh_etags_are_served_from_the_primary(app, client):
+    # Another worker changed the cars just now: the replica may not have it yet
+    resource_versions.bump('cars')
+    response = client.get('/cars')
+    assert brands(response) == ['Primary']
+
+    # Once the change is older than the replica lag, the replica has it
+    app.config['REPLICA_STICKY_SECONDS'] = 0
+    cached = client.get('/cars', headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert brands(client.get('/cars')) == ['Replica']
@@ -0,0 +1,23 @@
+"""The cached admin dashboard summary."""
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from models import db, User
+
+from conftest import PASSWORD, login
+
+
+def test_each_app_has_its_own_summary(client, data):
+    assert client.get('/admin/summary', headers=data.admin).get_json()['cars']['total'] == 4
+
+    # Another app in the same process, with a database of its own
+    other = create_app('test')
+    with other.app_context():
+        db.session.add(User(username='boss', email='boss@example.com', role='admin', is_admin=True,
+                            password_hash=generate_password_hash(PASSWORD, other.config['PASSWORD_HASH_METHOD'])))
+        db.session.commit()
+        other_client = other.test_client()
+        summary = other_client.get('/admin/summary', headers=login(other_client, 'boss@example.com')).get_json()
+        db.session.remove()
+    assert summary['cars']['total'] == 0
+    assert summary['users']['total'] == 1
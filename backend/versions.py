@@ -0,0 +1,196 @@
+"""Version counters for cacheable resources, used for conditional GETs.
+
+Writes call ``resource_versions.touch('cars')`` before committing. Once the
+session commits, the counter row in ``resource_versions`` is bumped in its own
+short transaction (so a busy write path never waits on it) and the local copy
+is updated at once. Other workers pick the new version up from a background
+poll every ``VERSION_SYNC_INTERVAL`` seconds.
+
+Read endpoints wrapped in ``@conditional(...)`` send ETag / Last-Modified
+headers and answer If-None-Match / If-Modified-Since with a 304 straight from
+memory, without touching the database.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import db, ResourceVersion
+from query_inspector import paused
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceVersions:
+    def __init__(self, app=None):
+        self.app = None
+        self._versions = {}  # name -> (version, updated_at)
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('VERSION_SYNC_INTERVAL', 2.0)
+        app.extensions['resource_versions'] = self
+        # A new app (one per test) has its own database: load its versions on first use
+        self._pid = None
+        if not event.contains(Session, 'after_commit', self._after_commit):
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+
+    #=========================writes=========================
+    def touch(self, *names):
+        """Mark resources as changed by the current transaction."""
+        db.session.info.setdefault('touched_resources', set()).update(names)
+
+    def _after_commit(self, session):
+        names = session.info.pop('touched_resources', None)
+        if not names:
+            return
+        try:
+            with paused():
+                self.bump(*names)
+        except Exception:
+            # The data is committed already; clients just revalidate later
+            logger.exception("Could not bump resource versions %s", names)
+
+    def _after_rollback(self, session):
+        session.info.pop('touched_resources', None)
+
+    def bump(self, *names):
+        now = datetime.utcnow()
+        increment = dict(version=ResourceVersion.version + 1, updated_at=now)
+        for name in sorted(names):
+            try:
+                with db.engine.begin() as conn:
+                    result = conn.execute(
+                        update(ResourceVersion).where(ResourceVersion.name == name).values(**increment))
+                    if result.rowcount == 0:
+                        conn.execute(insert(ResourceVersion).values(name=name, version=1, updated_at=now))
+            except IntegrityError:
+                # Another worker created the row first
+                with db.engine.begin() as conn:
+                    conn.execute(
+                        update(ResourceVersion).where(ResourceVersion.name == name).values(**increment))
+
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(ResourceVersion.name, ResourceVersion.version, ResourceVersion.updated_at)
+                .where(ResourceVersion.name.in_(names))
+            ).all()
+        self._store(rows)
+
+    #=========================reads=========================
+    def current(self, *names):
+        """(etag, last_modified) for the combination of ``names``."""
+        self._ensure_started()
+        versions = [self._versions.get(name, (0, None)) for name in names]
+        etag = '-'.join(f'{name}.{version}' for name, (version, _) in zip(names, versions))
+        stamps = [updated_at for _, updated_at in versions if updated_at is not None]
+        last_modified = max(stamps).replace(tzinfo=timezone.utc) if stamps else None
+        return etag, last_modified
+
+    def changed_within(self, names, seconds):
+        """Whether any of ``names`` was bumped less than ``seconds`` ago."""
+        self._ensure_started()
+        since = datetime.utcnow() - timedelta(seconds=seconds)
+        return any(updated_at is not None and updated_at > since
+                   for _, updated_at in (self._versions.get(name, (0, None)) for name in names))
+
+    def _store(self, rows):
+        versions = dict(self._versions)
+        for name, version, updated_at in rows:
+            # Never go backwards if a poll races with a local bump
+            if version >= versions.get(name, (0, None))[0]:
+                versions[name] = (version, updated_at)
+        self._versions = versions
+
+    def sync(self):
+        rows = db.session.execute(
+            select(ResourceVersion.name, ResourceVersion.version, ResourceVersion.updated_at)
+        ).all()
+        db.session.rollback()
+        self._store(rows)
+
+    def _ensure_started(self):
+        # Once per process: a forked worker must not reuse its parent's thread.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._versions = {}
+            with self.app.app_context(), paused():
+                self.sync()
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self._run, name='version-sync', daemon=True)
+            thread.start()
+
+    def _run(self):
+        app = self.app
+        interval = app.config['VERSION_SYNC_INTERVAL']
+        pid = os.getpid()
+        while self._pid == pid and self.app is app:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    self.sync()
+                except Exception:
+                    logger.exception("Resource version sync failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+resource_versions = ResourceVersions()
+
+
+def conditional(*names, key=None):
+    """Serve a GET endpoint with ETag/Last-Modified derived from ``names``.
+
+    ``key()``, if given, returns anything else the body depends on, or None.
+    It goes into the ETag, and Last-Modified is left out, since a date can't
+    tell two such bodies apart.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Read the version before the data: a concurrent write then only
+            # makes the ETag older than the body, never newer.
+            etag, last_modified = resource_versions.current(*names)
+            extra = key() if key else None
+            if extra is not None:
+                etag, last_modified = f'{etag}-{extra}', None
+
+            not_modified = False
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            elif request.if_modified_since and last_modified:
+                not_modified = last_modified.replace(microsecond=0) <= request.if_modified_since
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # Let clients keep the body but always revalidate it
+            response.cache_control.no_cache = True
+            return response
+        # For the replica router: reads behind this ETag need the latest data
+        wrapper.resource_names = names
+        return wrapper
+    return decorator
@@ -2,4 +2,5 @@ from .booking import *
 from .car import *
 from .review import *
 from .user import *
-from .auth import *
\ No newline at end of file
+from .auth import *
+from .admin import *
\ No newline at end of file
@@ -0,0 +1,45 @@
+from datetime import datetime, date, timedelta
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from identity import jwt_is_admin
+from serializers import json_response
+from summary import summary_cache
+from analytics import utilization, BUCKETS, MAX_WINDOW_DAYS
+
+admin_bp = Blueprint('admin', __name__)
+
+#=========================admin dashboard summary=========================
+@admin_bp.route('/admin/summary', methods=['GET'])
+@jwt_required()
+def admin_summary():
+    if not jwt_is_admin():
+        return jsonify({'error': 'Only admins can view the dashboard summary'}), 403
+
+    return json_response(summary_cache.get()), 200
+
+#=========================fleet utilization analytics=========================
+@admin_bp.route('/admin/analytics/utilization', methods=['GET'])
+@jwt_required()
+def fleet_utilization():
+    if not jwt_is_admin():
+        return jsonify({'error': 'Only admins can view analytics'}), 403
+
+    # Defaults to the last 30 days, today included
+    try:
+        end = request.args.get('to')
+        end = datetime.strptime(end, "%Y-%m-%d").date() if end else date.today() + timedelta(days=1)
+        start = request.args.get('from')
+        start = datetime.strptime(start, "%Y-%m-%d").date() if start else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+
+    if start >= end:
+        return jsonify({'error': 'End date must be after start date'}), 400
+    if (end - start).days > MAX_WINDOW_DAYS:
+        return jsonify({'error': f'The window can span at most {MAX_WINDOW_DAYS} days'}), 400
+
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return jsonify({'error': f"bucket must be one of: {', '.join(BUCKETS)}"}), 400
+
+    return json_response(utilization(start, end, bucket)), 200
@@ -1,9 +1,11 @@
 from flask import Flask, request, jsonify, Blueprint
 from models import db, User, TokenBlocklist
-from werkzeug.security import check_password_hash
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt, current_user
 from datetime import datetime
 from datetime import timezone
+from revocation import revocation_cache
+from identity import role_claims
+from passwords import passwords, PasswordPoolBusy
 
 auth_bp = Blueprint('auth_bp', __name__)
 
@@ -18,9 +20,17 @@ def login_user():
 
     user = User.query.filter_by(email=email).first()
 
-   
-    if user and check_password_hash(user.password_hash, password_hash):
-        access_token = create_access_token(identity=user.id)
+    valid = user is not None and passwords.check(user.password_hash, password_hash)
+
+    if valid:
+        # Hashed with older PASSWORD_HASH_METHOD parameters: store a current hash
+        if passwords.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = passwords.hash(password_hash)
+                db.session.commit()
+            except PasswordPoolBusy:
+                pass  # upgraded on a later login
+        access_token = create_access_token(identity=user.id, additional_claims=role_claims(user))
         return jsonify(access_token=access_token), 200
     else:
         return jsonify({'error': 'Invalid email or password'}), 401
@@ -29,8 +39,7 @@ def login_user():
 @auth_bp.route('/current_user', methods=['GET'])
 @jwt_required()
 def fetch_current_user():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_user
 
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -48,10 +57,14 @@ def fetch_current_user():
 @auth_bp.route('/logout', methods=['DELETE'])
 @jwt_required()
 def logout_user():
-    jti = get_jwt()['jti']
-    now = datetime.now(timezone.utc)
+    token = get_jwt()
+    jti = token['jti']
+    # Stored as naive UTC like the column default, so workers can sync on it
+    now = datetime.utcnow()
 
     new_blocked_token = TokenBlocklist(jti=jti, created_at=now)
     db.session.add(new_blocked_token)
     db.session.commit()
+
+    revocation_cache.revoke(jti, datetime.fromtimestamp(token['exp'], timezone.utc).replace(tzinfo=None))
     return jsonify({"message": "Successfully logged out"}), 200
\ No newline at end of file
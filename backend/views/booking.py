@@ -1,25 +1,157 @@
-from models import db, Booking, Car, User
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask_mail import Mail, Message
-from app import  mail
+from models import db, Booking, Car, User, BOOKING_STATUSES
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
+from outbox import enqueue_email, enqueue_emails
+from pagination import paginate
+from identity import jwt_is_admin
+from versions import resource_versions
+from serializers import BOOKING, USER_BOOKING
 from flask import Blueprint, request, jsonify
+from sqlalchemy import update, and_
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
 booking_bp = Blueprint('booking', __name__)
 
+BOOKING_SORTS = {'id': Booking.id, 'start_date': Booking.start_date}
+MAX_BULK_BOOKINGS = 500
+OVERLAP_CONSTRAINT = 'bookings_no_overlap'
+
+
+def is_overlap(error):
+    """Whether an IntegrityError is the bookings_no_overlap exclusion constraint (PostgreSQL)."""
+    diag = getattr(error.orig, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == OVERLAP_CONSTRAINT
+
+
+def filter_bookings(query):
+    """Apply ?status=, ?car_id= and ?from= / ?to= (start date range) to a Booking query."""
+    status = request.args.get('status')
+    if status:
+        if status not in BOOKING_STATUSES:
+            raise ValueError('Invalid status')
+        query = query.filter(Booking.status == status)
+
+    car_id = request.args.get('car_id')
+    if car_id:
+        if not car_id.isdigit():
+            raise ValueError('car_id must be an integer')
+        query = query.filter(Booking.car_id == int(car_id))
+
+    try:
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        if date_from:
+            query = query.filter(Booking.start_date >= datetime.strptime(date_from, "%Y-%m-%d").date())
+        if date_to:
+            query = query.filter(Booking.start_date < datetime.strptime(date_to, "%Y-%m-%d").date())
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+    return query
+
+
+def lock_cars(car_ids):
+    """Load cars and hold a write lock on their rows until the transaction ends.
+
+    PostgreSQL locks just these rows with SELECT ... FOR UPDATE (in id order, so
+    two requests can't deadlock). SQLite has no row locks, so a no-op UPDATE
+    takes the database write lock instead.
+    """
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(update(Car).where(Car.id.in_(car_ids)).values(id=Car.id))
+    return (
+        Car.query.filter(Car.id.in_(car_ids))
+        .order_by(Car.id)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+
+
+def lock_car(car_id):
+    """Load one car with its row locked, or None if it does not exist."""
+    cars = lock_cars([car_id])
+    return cars[0] if cars else None
+
+
+def clashing_reactivations(bookings):
+    """IDs of cancelled ``bookings`` that would overlap another booking if re-activated.
+
+    Checked against the table in one query, then against each other.
+    """
+    if not bookings:
+        return set()
+    other = aliased(Booking)
+    clashing = {
+        booking_id for booking_id, in db.session.query(Booking.id).join(other, and_(
+            other.car_id == Booking.car_id,
+            other.id != Booking.id,
+            other.start_date < Booking.end_date,
+            other.end_date > Booking.start_date,
+            other.status != 'cancelled',
+        )).filter(Booking.id.in_([booking.id for booking in bookings])).distinct()
+    }
+
+    # Two cancelled bookings for the same dates: the first one wins
+    accepted = {}
+    for booking in sorted(bookings, key=lambda b: b.id):
+        if booking.id in clashing:
+            continue
+        taken = accepted.setdefault(booking.car_id, [])
+        if any(start < booking.end_date and end > booking.start_date for start, end in taken):
+            clashing.add(booking.id)
+        else:
+            taken.append((booking.start_date, booking.end_date))
+    return clashing
+
+
+def status_change_email(booking, car, user, new_status):
+    """Subject and body of the email sent when a booking is confirmed or cancelled."""
+    subject = f"Booking {new_status.capitalize()}: {car.brand} {car.model}"
+
+    if new_status == 'confirmed':
+        body = f"""Hello {user.username},
+                
+Your booking for {car.brand} {car.model} has been confirmed!
+                
+Booking Details:
+- Dates: {booking.start_date} to {booking.end_date}
+- Car: {car.brand} {car.model}
+- Total Price: Ksh {car.price_per_day * (booking.end_date - booking.start_date).days}
+                
+Thank you for choosing our service!
+                
+Best regards,
+The Car Rental Team"""
+    else:  # cancelled
+        body = f"""Hello {user.username},
+                
+Your booking for {car.brand} {car.model} has been cancelled.
+                
+Booking Details:
+- Dates: {booking.start_date} to {booking.end_date}
+- Car: {car.brand} {car.model}
+                
+If this was unexpected, please contact our support team.
+                
+Best regards,
+The Car Rental Team"""
+    return subject, body
+
+
 @booking_bp.route('/bookings', methods=['POST'])
 @jwt_required()
 def create_booking():
     data = request.get_json()
 
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
 
-    # Block if user not found or is admin
+    # Block admins (from the token claims) or a user that no longer exists
+    if jwt_is_admin():
+        return jsonify({'error': 'Admins are not allowed to create bookings'}), 403
+    user = current_user
     if not user:
         return jsonify({'error': 'User not found'}), 404
-    if user.is_admin:
-        return jsonify({'error': 'Admins are not allowed to create bookings'}), 403
 
     car_id = data.get('car_id')
     status = data.get('status', 'pending')
@@ -35,21 +167,26 @@ def create_booking():
         return jsonify({'error': 'Missing required fields'}), 400
     if start_date >= end_date:
         return jsonify({'error': 'End date must be after start date'}), 400
+    if status not in BOOKING_STATUSES:
+        return jsonify({'error': 'Invalid status'}), 400
 
-    car = Car.query.get(car_id)
+    # Lock this car's row until commit so concurrent bookings for the same
+    # car queue up behind each other; other cars are unaffected.
+    car = lock_car(car_id)
     if not car:
         return jsonify({'error': 'Car not found'}), 404
     if car.status != 'available':
+        db.session.rollback()
         return jsonify({'error': 'Car is not available'}), 400
 
     # Check for overlapping bookings
     overlapping = Booking.query.filter(
         Booking.car_id == car_id,
-        Booking.start_date < end_date,
-        Booking.end_date > start_date
+        Booking.overlapping(start_date, end_date)
     ).first()
     if overlapping:
-        return jsonify({'error': 'Car is already booked for the selected dates'}), 400
+        db.session.rollback()
+        return jsonify({'error': 'Car is already booked for the selected dates'}), 409
 
     booking = Booking(
         user_id=user_id,
@@ -59,25 +196,29 @@ def create_booking():
         status=status
     )
 
-    try:
-        msg = Message('Booking Confirmation', recipients=[user.email])
-        msg.body = (
-            f"Hello {user.username},\n\n"
-            f"Your booking for car ID {car_id} has been created successfully.\n"
-            f"Start Date: {start_date}\n"
-            f"End Date: {end_date}\n"
-            f"Status: {status}\n\n"
-            "Thank you for choosing our service!\n\n"
-            "Best regards,\nYour Service Team"
-        )
-        mail.send(msg)
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": "Failed to send email notification", "details": str(e)}), 500
-
     db.session.add(booking)
     car.status = 'booked'
-    db.session.commit()
+    resource_versions.touch('cars', 'bookings')
+
+    # Queued in the same transaction; the outbox sender delivers it later
+    enqueue_email(
+        'Booking Confirmation',
+        user.email,
+        f"Hello {user.username},\n\n"
+        f"Your booking for car ID {car_id} has been created successfully.\n"
+        f"Start Date: {start_date}\n"
+        f"End Date: {end_date}\n"
+        f"Status: {status}\n\n"
+        "Thank you for choosing our service!\n\n"
+        "Best regards,\nYour Service Team"
+    )
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_overlap(e):
+            raise
+        return jsonify({'error': 'Car is already booked for the selected dates'}), 409
 
     return jsonify({"message": "Booking created successfully", "booking_id": booking.id}), 201
 
@@ -86,83 +227,53 @@ def create_booking():
 @jwt_required()
 def update_booking(booking_id):
     current_user_id = get_jwt_identity()
-    booking = Booking.query.get(booking_id)
+    # The emails below need the car and the user: load them in the same query
+    booking = db.session.get(Booking, booking_id, options=[joinedload(Booking.user), joinedload(Booking.car)])
 
     if not booking:
         return jsonify({'error': 'Booking not found'}), 404
 
     # Only the user who made the booking or an admin can update it
-    user = User.query.get(current_user_id)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-
-    if booking.user_id != current_user_id and not user.is_admin:
+    if booking.user_id != current_user_id and not jwt_is_admin():
         return jsonify({'error': 'You are not authorized to update this booking'}), 403
 
     data = request.get_json()
     new_status = data.get('status')
-    if new_status not in ['pending', 'confirmed', 'cancelled']:
+    if new_status not in BOOKING_STATUSES:
         return jsonify({'error': 'Invalid status'}), 400
 
+    # Re-activating a cancelled booking must not clash with one made since
+    if booking.status == 'cancelled' and new_status != 'cancelled':
+        lock_car(booking.car_id)
+        clash = Booking.query.filter(
+            Booking.car_id == booking.car_id,
+            Booking.id != booking.id,
+            Booking.overlapping(booking.start_date, booking.end_date)
+        ).first()
+        if clash:
+            db.session.rollback()
+            return jsonify({'error': 'Car is already booked for the selected dates'}), 409
+
     # Get the previous status for comparison
     previous_status = booking.status
     booking.status = new_status
+    resource_versions.touch('bookings')
     
     # Get the car and user details
-    car = Car.query.get(booking.car_id)
-    booking_user = User.query.get(booking.user_id)
+    car = booking.car
+    booking_user = booking.user
     
     try:
-        # Send email notification if status changed to confirmed or cancelled
+        # Queue email notification if status changed to confirmed or cancelled
         if new_status in ['confirmed', 'cancelled'] and new_status != previous_status:
-            subject = f"Booking {new_status.capitalize()}: {car.brand} {car.model}"
-            
-            if new_status == 'confirmed':
-                body = f"""Hello {booking_user.username},
-                
-Your booking for {car.brand} {car.model} has been confirmed!
-                
-Booking Details:
-- Dates: {booking.start_date} to {booking.end_date}
-- Car: {car.brand} {car.model}
-- Total Price: Ksh {car.price_per_day * (booking.end_date - booking.start_date).days}
-                
-Thank you for choosing our service!
-                
-Best regards,
-The Car Rental Team"""
-            else:  # cancelled
-                body = f"""Hello {booking_user.username},
-                
-Your booking for {car.brand} {car.model} has been cancelled.
-                
-Booking Details:
-- Dates: {booking.start_date} to {booking.end_date}
-- Car: {car.brand} {car.model}
-                
-If this was unexpected, please contact our support team.
-                
-Best regards,
-The Car Rental Team"""
-
-            msg = Message(
-                subject=subject,
-                recipients=[booking_user.email],
-                sender='noreply@carrental.com'
-            )
-            msg.body = body
-            mail.send(msg)
+            subject, body = status_change_email(booking, car, booking_user, new_status)
+            enqueue_email(subject, booking_user.email, body, sender='noreply@carrental.com')
             
             # Also notify admin if user cancelled their own booking
             if new_status == 'cancelled' and current_user_id == booking.user_id:
                 admin = User.query.filter_by(is_admin=True).first()
                 if admin:
-                    admin_msg = Message(
-                        subject=f"Booking Cancelled: #{booking.id}",
-                        recipients=[admin.email],
-                        sender='noreply@carrental.com'
-                    )
-                    admin_msg.body = f"""Admin Notification:
+                    admin_body = f"""Admin Notification:
                     
 User {booking_user.username} has cancelled their booking.
 
@@ -172,7 +283,8 @@ Booking Details:
 - Original Status: {previous_status}
                     
 Please review the system for any necessary updates."""
-                    mail.send(admin_msg)
+                    enqueue_email(f"Booking Cancelled: #{booking.id}", admin.email,
+                                  admin_body, sender='noreply@carrental.com')
 
         db.session.commit()
         return jsonify({
@@ -181,6 +293,12 @@ Please review the system for any necessary updates."""
             'notification_sent': new_status in ['confirmed', 'cancelled']
         }), 200
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_overlap(e):
+            raise
+        return jsonify({'error': 'Car is already booked for the selected dates'}), 409
+
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -188,73 +306,124 @@ Please review the system for any necessary updates."""
             'details': str(e)
         }), 500
 
+#=========================bulk update bookings=========================
+@booking_bp.route('/bookings/bulk', methods=['PATCH'])
+@jwt_required()
+def bulk_update_bookings():
+    if not jwt_is_admin():
+        return jsonify({'error': 'Only admins can update bookings in bulk'}), 403
+
+    data = request.get_json() or {}
+    new_status = data.get('status')
+    ids = data.get('ids')
+    if new_status not in BOOKING_STATUSES:
+        return jsonify({'error': 'Invalid status'}), 400
+    if (not isinstance(ids, list) or not ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        return jsonify({'error': 'ids must be a non-empty list of booking IDs'}), 400
+    if len(ids) > MAX_BULK_BOOKINGS:
+        return jsonify({'error': f'At most {MAX_BULK_BOOKINGS} bookings can be updated at once'}), 400
+    ids = list(dict.fromkeys(ids))
+
+    # One query for the bookings with their users and cars
+    bookings = {
+        booking.id: booking
+        for booking in Booking.query.filter(Booking.id.in_(ids))
+        .options(joinedload(Booking.user), joinedload(Booking.car))
+    }
+
+    # Re-activating cancelled bookings must not clash with ones made since
+    reactivating = [b for b in bookings.values() if b.status == 'cancelled' and new_status != 'cancelled']
+    if reactivating:
+        lock_cars({booking.car_id for booking in reactivating})
+    clashing = clashing_reactivations(reactivating)
+
+    results = []
+    changed = []
+    emails = []
+    for booking_id in ids:
+        booking = bookings.get(booking_id)
+        if not booking:
+            results.append({'id': booking_id, 'error': 'Booking not found'})
+            continue
+        if booking_id in clashing:
+            results.append({'id': booking_id, 'error': 'Car is already booked for the selected dates'})
+            continue
+
+        previous_status = booking.status
+        notify = new_status in ['confirmed', 'cancelled'] and new_status != previous_status
+        if new_status != previous_status:
+            changed.append(booking_id)
+        if notify:
+            subject, body = status_change_email(booking, booking.car, booking.user, new_status)
+            emails.append((subject, booking.user.email, body, 'noreply@carrental.com'))
+        results.append({
+            'id': booking_id,
+            'previous_status': previous_status,
+            'status': new_status,
+            'notification_sent': notify
+        })
+
+    try:
+        if changed:
+            db.session.execute(update(Booking).where(Booking.id.in_(changed)).values(status=new_status))
+            resource_versions.touch('bookings')
+        enqueue_emails(emails)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_overlap(e):
+            raise
+        return jsonify({'error': 'Car is already booked for the selected dates'}), 409
+
+    return jsonify({
+        'message': 'Bookings updated',
+        'updated': len(changed),
+        'results': results
+    }), 200
+
 #=========================fetch all bookings=========================
 @booking_bp.route('/bookings', methods=['GET'])  
 @jwt_required()   
 def fetch_all_bookings():
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
 
-    
-    if user.is_admin:
-        bookings = Booking.query.all()
+    if jwt_is_admin():
+        query = Booking.query
     else:
         
-        bookings = Booking.query.filter_by(user_id=current_user_id).all()
+        query = Booking.query.filter_by(user_id=current_user_id)
 
-    if not bookings:
-        return jsonify({'message': 'No bookings found'}), 404
+    try:
+        query = filter_bookings(query)
+        page = paginate(BOOKING.project(query), Booking, BOOKING_SORTS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    booking_list = []
-    for booking in bookings:
-        booking_data = {
-            'id': booking.id,
-            'user_id': booking.user_id,
-            'car_id': booking.car_id,
-            'start_date': booking.start_date.isoformat(),
-            'end_date': booking.end_date.isoformat(),
-            'status': booking.status,
-            'created_at': booking.created_at.isoformat()
-        }
-        booking_list.append(booking_data)
+    if not page.items:
+        return jsonify({'message': 'No bookings found'}), 404
 
-    return jsonify(booking_list), 200
+    return page.apply_headers(BOOKING.jsonify(page.items)), 200
 
 #=========================fetch booking by user=========================
 @booking_bp.route('/bookings/user/<int:user_id>/', methods=['GET'])
 @jwt_required()
 def fetch_bookings_by_user(user_id):
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
 
-    
-    if current_user_id != user_id and not user.is_admin:
+    if current_user_id != user_id and not jwt_is_admin():
         return jsonify({'error': 'You are not authorized to view these bookings'}), 403
 
-    bookings = Booking.query.filter_by(user_id=user_id).all()
+    try:
+        query = filter_bookings(Booking.query.filter_by(user_id=user_id))
+        page = paginate(USER_BOOKING.project(query), Booking, BOOKING_SORTS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if not bookings:
+    if not page.items:
         return jsonify({'message': 'No bookings found for this user'}), 404
 
-    booking_list = []
-    for booking in bookings:
-        booking_data = {
-            'id': booking.id,
-            'car_id': booking.car_id,
-            'start_date': booking.start_date.isoformat(),
-            'end_date': booking.end_date.isoformat(),
-            'status': booking.status,
-            'created_at': booking.created_at.isoformat()
-        }
-        booking_list.append(booking_data)
-
-    return jsonify(booking_list), 200
+    return page.apply_headers(USER_BOOKING.jsonify(page.items)), 200
 
 
 #=========================delete booking by id=========================     
@@ -268,8 +437,10 @@ def delete_booking(booking_id):
     car = Car.query.get(booking.car_id)
     if car:
         car.status = 'available'
+        resource_versions.touch('cars')
 
     db.session.delete(booking)
+    resource_versions.touch('bookings')
     db.session.commit()
 
     return jsonify({'message': 'Booking deleted successfully'}), 200
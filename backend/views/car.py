@@ -1,60 +1,137 @@
+import csv
 from flask import Blueprint, request, jsonify
-from models import db, Car, User
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime, date
+from models import db, Car, Booking, CAR_STATUSES
+from sqlalchemy.exc import IntegrityError
+from pagination import paginate
+from flask_jwt_extended import jwt_required
+from identity import jwt_is_admin
+from versions import resource_versions, conditional
+from serializers import CAR, json_response
+from car_search import search_cars, SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from availability import car_calendar, fleet_calendar, add_months, parse_month, MAX_MONTHS
+from car_import import (validate_car, import_cars, read_csv, read_ndjson,
+                        CSV_MIMETYPES, NDJSON_MIMETYPES)
 
 car_bp = Blueprint('car_bp', __name__)
+
+# ?sort= choices for the car list (the async route in async_reads.py too)
+CAR_SORTS = {'id': Car.id, 'price_per_day': Car.price_per_day}
+
+
+def filter_by_price(query, args):
+    """Apply ?min_price= / ?max_price= to a Car query."""
+    try:
+        min_price = args.get('min_price')
+        max_price = args.get('max_price')
+        if min_price is not None:
+            query = query.filter(Car.price_per_day >= float(min_price))
+        if max_price is not None:
+            query = query.filter(Car.price_per_day <= float(max_price))
+    except ValueError:
+        raise ValueError('Price filters must be valid numbers')
+    return query
+
+
+def calendar_window():
+    """(first month, number of months) from ?month=YYYY-MM (default: this month) and ?months=."""
+    month = request.args.get('month')
+    try:
+        first = parse_month(month) if month else date.today().replace(day=1)
+    except ValueError:
+        raise ValueError('Invalid month format. Use YYYY-MM.')
+    try:
+        months = int(request.args.get('months', 1))
+    except ValueError:
+        raise ValueError('months must be an integer')
+    if not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f'months must be between 1 and {MAX_MONTHS}')
+    try:
+        # The window ends on the first day after its last month, which must be a date too
+        add_months(first, months)
+    except ValueError:
+        raise ValueError('The calendar only goes up to 9999-11')
+    return first, months
+
+
+def default_month():
+    """This month, when ?month= leaves the calendar window to the server's date."""
+    return None if request.args.get('month') else date.today().strftime('%Y-%m')
+
+
 @car_bp.route('/cars', methods=['POST'])
 @jwt_required()
 def create_car():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-
     # Block if user is not admin
-    if not user or not user.is_admin:
+    if not jwt_is_admin():
         return jsonify({'error': 'Only admins are allowed to add cars'}), 403
 
     data = request.get_json()
 
-    brand = data.get('brand')
-    model = data.get('model')
-    image1 = data.get('image1')
-    image2 = data.get('image2')
-    status = data.get('status', 'available')
-
-    # Safely convert price_per_day to float
     try:
-        price_per_day = float(data.get('price_per_day'))
-    except (TypeError, ValueError):
-        return jsonify({'error': 'Price per day must be a valid number'}), 400
-
-    if not brand or not model or not image1 or not image2 or price_per_day is None:
-        return jsonify({'error': 'Missing required fields'}), 400
-
-    if price_per_day <= 0:
-        return jsonify({'error': 'Price per day must be greater than 0'}), 400
+        fields = validate_car(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     # Check for duplicate car
     existing_car = Car.query.filter(
-        (Car.brand == brand) & (Car.model == model)
+        (Car.brand == fields['brand']) & (Car.model == fields['model'])
     ).first()
     if existing_car:
         return jsonify({'error': 'Car with this brand and model already exists'}), 400
 
     # Create and save new car
-    new_car = Car(
-        brand=brand,
-        model=model,
-        image1=image1,
-        image2=image2,
-        price_per_day=price_per_day,
-        status=status
-    )
+    new_car = Car(**fields)
 
     db.session.add(new_car)
-    db.session.commit()
+    resource_versions.touch('cars')
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Lost a race against another request adding the same car
+        db.session.rollback()
+        return jsonify({'error': 'Car with this brand and model already exists'}), 400
 
     return jsonify({"message": "Car created successfully", "car_id": new_car.id}), 201
 
+#=======================bulk import cars=========================
+@car_bp.route('/cars/import', methods=['POST'])
+@jwt_required()
+def import_fleet():
+    if not jwt_is_admin():
+        return jsonify({'error': 'Only admins are allowed to add cars'}), 403
+
+    # Raw CSV / NDJSON body, or a multipart upload in a "file" field
+    stream, mimetype, filename = request.stream, request.mimetype, ''
+    if mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({'error': 'No file provided'}), 400
+        stream, mimetype, filename = upload.stream, upload.mimetype, upload.filename or ''
+
+    if mimetype in CSV_MIMETYPES or filename.endswith('.csv'):
+        rows = read_csv(stream)
+    elif mimetype in NDJSON_MIMETYPES or filename.endswith(('.ndjson', '.jsonl')):
+        rows = read_ndjson(stream)
+    else:
+        return jsonify({'error': 'Upload text/csv or application/x-ndjson'}), 415
+
+    try:
+        report = import_cars(rows)
+        if report['created']:
+            resource_versions.touch('cars')
+        db.session.commit()
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Could not read the file: {e}'}), 400
+
+    return jsonify({
+        'message': 'Import finished',
+        'created': report['created'],
+        'failed': len(report['errors']),
+        'errors': report['errors']
+    }), 200
+
 # =======================update car status=========================
 @car_bp.route('/cars/<int:car_id>/status', methods=['PATCH'])
 @jwt_required()
@@ -65,7 +142,7 @@ def update_car_status(car_id):
             return jsonify({'error': 'No data provided'}), 400
 
         new_status = data.get('status')
-        if not new_status or new_status not in ['available', 'booked', 'under_maintenance']:
+        if not new_status or new_status not in CAR_STATUSES:
             return jsonify({'error': 'Invalid status'}), 400
 
         car = Car.query.get(car_id)
@@ -73,6 +150,7 @@ def update_car_status(car_id):
             return jsonify({'error': 'Car not found'}), 404
 
         car.status = new_status
+        resource_versions.touch('cars')
         db.session.commit()
 
         return jsonify({
@@ -87,10 +165,7 @@ def update_car_status(car_id):
 @car_bp.route('/cars/<int:car_id>/', methods=['PATCH'], strict_slashes=False)
 @jwt_required()
 def update_car(car_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-
-    if not user or not user.is_admin:
+    if not jwt_is_admin():
         return jsonify({'error': 'You are not authorized to update this car'}), 403
 
     car = Car.query.get(car_id)
@@ -98,72 +173,134 @@ def update_car(car_id):
         return jsonify({'error': 'Car not found'}), 404
 
     data = request.get_json()
-    brand = data.get('brand')
-    model = data.get('model')
-    image1 = data.get('image1')
-    image2 = data.get('image2')
-    status = data.get('status', 'available')
-
-    # Safely convert price_per_day
     try:
-        price_per_day = float(data.get('price_per_day'))
-    except (TypeError, ValueError):
-        return jsonify({'error': 'Price per day must be a valid number'}), 400
+        fields = validate_car(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if not brand or not model or not image1 or not image2 or price_per_day is None:
-        return jsonify({'error': 'Missing required fields'}), 400
-
-    if price_per_day <= 0:
-        return jsonify({'error': 'Price per day must be greater than 0'}), 400
+    existing_car = Car.query.filter(
+        (Car.brand == fields['brand']) & (Car.model == fields['model']) & (Car.id != car_id)
+    ).first()
+    if existing_car:
+        return jsonify({'error': 'Car with this brand and model already exists'}), 400
 
     # Update fields
-    car.brand = brand
-    car.model = model
-    car.image1 = image1
-    car.image2 = image2
-    car.price_per_day = price_per_day
-    car.status = status
+    for name, value in fields.items():
+        setattr(car, name, value)
+    resource_versions.touch('cars')
 
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Car with this brand and model already exists'}), 400
     return jsonify({'message': 'Car updated successfully'}), 200
 
 
 #=======================get car by id=========================
 @car_bp.route('/cars/<int:car_id>/', methods=['GET'], strict_slashes=False)
+@conditional('cars')
 def fetch_car(car_id):
-    car = Car.query.get(car_id)
+    car = CAR.project(Car.query.filter(Car.id == car_id)).first()
     if not car:
         return jsonify({'error': 'Car not found'}), 404
 
-    car_data = {
-        'id': car.id,
-        'brand': car.brand,
-        'model': car.model,
-        'image1': car.image1,
-        'image2': car.image2,
-        'price_per_day': car.price_per_day,
-        'status': car.status
-    }
-    return jsonify(car_data), 200
+    return CAR.jsonify_one(car), 200
 #=======================get all cars=========================       
 @car_bp.route('/cars', methods=['GET'])
+@conditional('cars')
 def fetch_all_cars():
-    cars = Car.query.all()
-
-    car_list = []
-    for car in cars:
-        car_data = {
-            'id': car.id,
-            'brand': car.brand,
-            'model': car.model,
-            'image1': car.image1,
-            'image2': car.image2,
-            'price_per_day': car.price_per_day,
-            'status': car.status
-        }
-        car_list.append(car_data)
-    
-    return jsonify(car_list), 200
+    query = Car.query
+
+    brand = request.args.get('brand')
+    status = request.args.get('status')
+    if brand:
+        query = query.filter(Car.brand == brand)
+    if status:
+        if status not in CAR_STATUSES:
+            return jsonify({'error': 'Invalid status'}), 400
+        query = query.filter(Car.status == status)
+
+    try:
+        query = filter_by_price(query, request.args)
+        page = paginate(CAR.project(query), Car, CAR_SORTS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return page.apply_headers(CAR.jsonify(page.items)), 200
+#=======================search cars by brand/model=========================
+@car_bp.route('/cars/search', methods=['GET'])
+@conditional('cars')
+def search_car_catalog():
+    q = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+
+    return CAR.jsonify(search_cars(q, min(limit, MAX_SEARCH_LIMIT))), 200
+#=======================search available cars=========================
+@car_bp.route('/cars/available', methods=['GET'])
+def fetch_available_cars():
+    try:
+        start_date = datetime.strptime(request.args.get('start'), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.args.get('end'), "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+
+    if start_date >= end_date:
+        return jsonify({'error': 'End date must be after start date'}), 400
+
+    brand = request.args.get('brand')
+    status = request.args.get('status')
+
+    # Anti-join: cars with no overlapping booking, resolved in the database
+    # through the (car_id, start_date, end_date) index.
+    booked = (
+        db.session.query(Booking.id)
+        .filter(Booking.car_id == Car.id, Booking.overlapping(start_date, end_date))
+        .exists()
+    )
+    query = Car.query.filter(~booked)
+
+    try:
+        query = filter_by_price(query, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if brand:
+        query = query.filter(Car.brand == brand)
+    if status:
+        if status not in CAR_STATUSES:
+            return jsonify({'error': 'Invalid status'}), 400
+        query = query.filter(Car.status == status)
+
+    return CAR.stream(CAR.project(query).order_by(Car.id)), 200
+#=======================availability calendars=========================
+@car_bp.route('/cars/<int:car_id>/calendar', methods=['GET'])
+@conditional('bookings', 'cars', key=default_month)
+def fetch_car_calendar(car_id):
+    try:
+        first, months = calendar_window()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if db.session.query(Car.id).filter(Car.id == car_id).first() is None:
+        return jsonify({'error': 'Car not found'}), 404
+
+    return json_response(car_calendar(car_id, first, months)), 200
+
+@car_bp.route('/cars/calendar', methods=['GET'])
+@conditional('bookings', 'cars', key=default_month)
+def fetch_fleet_calendar():
+    try:
+        first, months = calendar_window()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    car_ids = db.session.scalars(db.select(Car.id).order_by(Car.id)).all()
+    return json_response(fleet_calendar(car_ids, first, months)), 200
 #=======================delete car by id=========================
 @car_bp.route('/cars/<int:car_id>/', methods=['DELETE'], strict_slashes=False)
 @jwt_required()
@@ -173,5 +310,7 @@ def delete_car(car_id):
         return jsonify({'error': 'Car not found'}), 404
 
     db.session.delete(car)
+    # Deleting a car cascades to its reviews and bookings
+    resource_versions.touch('cars', 'reviews', 'bookings')
     db.session.commit()
     return jsonify({'message': 'Car deleted successfully'}), 200
\ No newline at end of file
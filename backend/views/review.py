@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from models import db, Review,User
+from models import db, Review
+from pagination import paginate
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from identity import jwt_is_admin
+from versions import resource_versions, conditional
+from serializers import REVIEW, CAR_REVIEW, car_reviews_query
 
 review_bp = Blueprint('review', __name__)
 
@@ -26,6 +30,7 @@ def create_review():
         comment=comment
     )
     db.session.add(review)
+    resource_versions.touch('reviews')
     db.session.commit()
 
     return jsonify({"message": "Review created successfully", "review_id": review.id}), 201
@@ -33,37 +38,33 @@ def create_review():
 # ========================== Fetch Reviews by Car ID ==========================
 # Get all reviews
 @review_bp.route('/reviews', methods=['GET'])
+@conditional('reviews')
 def get_all_reviews():
-    reviews = Review.query.all()
-    result = []
-    for review in reviews:
-        result.append({
-            'id': review.id,
-            'user_id': review.user_id,
-            'car_id': review.car_id,
-            'rating': review.rating,
-            'comment': review.comment,
-            'timestamp': review.timestamp.isoformat() if review.timestamp else ''
-        })
-    return jsonify(result), 200
+    query = Review.query
+    try:
+        for arg, column in (('car_id', Review.car_id), ('user_id', Review.user_id), ('rating', Review.rating)):
+            value = request.args.get(arg)
+            if value:
+                query = query.filter(column == int(value))
+        min_rating = request.args.get('min_rating')
+        if min_rating:
+            query = query.filter(Review.rating >= int(min_rating))
+    except ValueError:
+        return jsonify({'error': 'car_id, user_id, rating and min_rating must be integers'}), 400
+
+    try:
+        page = paginate(REVIEW.project(query), Review, {'id': Review.id, 'rating': Review.rating})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return page.apply_headers(REVIEW.jsonify(page.items)), 200
 
 
 # ========================== Fetch Reviews by User ID ==========================
 @review_bp.route('/reviews/car/<int:car_id>/', methods=['GET'])
+@conditional('reviews', 'cars')
 def get_reviews_by_car(car_id):
-    reviews = Review.query.filter_by(car_id=car_id).all()
-
-    result = []
-    for review in reviews:
-        result.append({
-            'id': review.id,
-            'username': review.user.username if review.user else 'Unknown',
-            'car_model': review.car.model if review.car else 'Unknown',
-            'rating': review.rating,
-            'comment': review.comment,
-            'timestamp': review.timestamp.isoformat() if review.timestamp else ''
-        })
-    return jsonify(result), 200
+    return CAR_REVIEW.stream(car_reviews_query(car_id)), 200
 
    
 
@@ -73,15 +74,7 @@ def get_reviews_by_car(car_id):
 @review_bp.route('/reviews/<int:review_id>/', methods=['DELETE'])
 @jwt_required()
 def delete_review(review_id):
-    current_user_id = get_jwt_identity()
-    
-    # ✅ Fix here
-    user = User.query.get(current_user_id)
-
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-
-    if not user.is_admin:
+    if not jwt_is_admin():
         return jsonify({'error': 'Only admins can delete reviews'}), 403
 
     review = Review.query.get(review_id)
@@ -89,6 +82,7 @@ def delete_review(review_id):
         return jsonify({'error': 'Review not found'}), 404
 
     db.session.delete(review)
+    resource_versions.touch('reviews')
     db.session.commit()
 
     return jsonify({'message': 'Review deleted successfully'}), 200
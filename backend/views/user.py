@@ -1,10 +1,12 @@
 from flask import Flask, request, jsonify, Blueprint
 from models import db, User
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash
-# Importing Flask-Mail for email functionalities
-from flask_mail import Message
-from app import app, mail
+from outbox import enqueue_email
+from pagination import paginate
+from identity import jwt_is_admin
+from versions import resource_versions
+from serializers import USER
+from passwords import passwords
 
 
 user_bp = Blueprint('user', __name__)
@@ -13,13 +15,9 @@ user_bp = Blueprint('user', __name__)
 @user_bp.route('/users', methods=['POST'])
 @jwt_required(optional=True)
 def create_user():
-    current_user_id = get_jwt_identity()
-
     # Block admin users from registering anyone
-    if current_user_id:
-        current_user = User.query.get(current_user_id)
-        if current_user and current_user.is_admin:
-            return jsonify({'error': 'Admins are not allowed to create users'}), 403
+    if get_jwt_identity() and jwt_is_admin():
+        return jsonify({'error': 'Admins are not allowed to create users'}), 403
 
     # Get form data
     data = request.get_json()
@@ -35,7 +33,7 @@ def create_user():
     if User.query.filter_by(email=email).first():
         return jsonify({'error': 'Email already exists'}), 400
 
-    hashed_password = generate_password_hash(password)
+    hashed_password = passwords.hash(password)
 
     new_user = User(
         username=username,
@@ -47,13 +45,12 @@ def create_user():
 
     try:
         db.session.add(new_user)
-        db.session.commit()
 
-        # Sending email notification
-        try:
-            msg = Message('Account Registration Confirmation',
-                recipients=[new_user.email])
-            msg.body = f"""Hello {new_user.username},
+        # Registration email is queued in the same transaction as the new user
+        enqueue_email(
+            'Account Registration Confirmation',
+            new_user.email,
+            f"""Hello {new_user.username},
 
              Your account has been created successfully.
 
@@ -64,11 +61,8 @@ def create_user():
 
              Best regards,  
              Your Service Team"""
-            mail.send(msg)
-
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({"error": "Failed to send email notification", "details": str(e)}), 500
+        )
+        db.session.commit()
 
         return jsonify({'message': 'User created successfully', 'user_id': new_user.id}), 201
 
@@ -91,18 +85,13 @@ def update_user(user_id):
         return jsonify({'error': 'Email and password are required'}), 400
 
     user.email = email
-    user.password_hash = generate_password_hash(password)
+    user.password_hash = passwords.hash(password)
 
-    try:
-        msg = Message(
-            'Account Update Notification',
-            recipients=[email]
-        )
-        msg.body = f"Hello {user.username},\n\nYour account email and password have been updated successfully.\n\nBest regards,\nYour Service Team"
-        mail.send(msg)
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": "Failed to send email notification", "details": str(e)}), 500
+    enqueue_email(
+        'Account Update Notification',
+        email,
+        f"Hello {user.username},\n\nYour account email and password have been updated successfully.\n\nBest regards,\nYour Service Team"
+    )
 
     db.session.commit()
     return jsonify({'message': 'User updated successfully'}), 200
@@ -110,37 +99,32 @@ def update_user(user_id):
 @user_bp.route('/users', methods=['GET'])
 
 def fetch_all_users():
-    users = User.query.all()
-
-    user_list = []
-    for user in users:
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'role': user.role,
-            'is_admin': user.is_admin
-        }
-        user_list.append(user_data)
-    return jsonify(user_list), 200
+    query = User.query
+
+    role = request.args.get('role')
+    if role:
+        query = query.filter(User.role == role)
+    is_admin = request.args.get('is_admin')
+    if is_admin:
+        query = query.filter(User.is_admin == (is_admin.lower() in ('1', 'true', 'yes')))
+
+    try:
+        page = paginate(USER.project(query), User, {'id': User.id, 'username': User.username})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return page.apply_headers(USER.jsonify(page.items)), 200
 
 #======================get user by id======================
 @user_bp.route('/users/<int:user_id>/', methods=['GET'], strict_slashes=False)
 @jwt_required()
 def fetch_user_by_id(user_id):
-    user = User.query.get(user_id)
+    user = USER.project(User.query.filter(User.id == user_id)).first()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    user_data = {
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'role': user.role,
-        'is_admin': user.is_admin
-    }
-    return jsonify(user_data), 200
+    return USER.jsonify_one(user), 200
 
 #======================delete user by id======================
 @user_bp.route('/users/<int:user_id>/', methods=['DELETE'], strict_slashes=False)
@@ -152,6 +136,8 @@ def delete_user(user_id):
         return jsonify({'error': 'User not found'}), 404
 
     db.session.delete(user)
+    # The user's reviews and bookings go with them
+    resource_versions.touch('reviews', 'bookings')
     db.session.commit()
     return jsonify({'message': 'User deleted successfully'}), 200
 
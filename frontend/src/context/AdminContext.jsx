@@ -2,6 +2,7 @@ import React, { createContext, useContext, useState, useCallback } from 'react';
 import { api_url } from '../config.json';
 import { toast } from 'react-toastify';
 import { UserContext } from './UserContext';
+import { apiFetch, fetchAllPages } from '../utils/api';
 
 export const AdminContext = createContext();
 
@@ -16,24 +17,17 @@ export const AdminProvider = ({ children }) => {
 
   const fetchAllAdminData = useCallback(async () => {
     try {
-      const [bookingsRes, carsRes, reviewsRes, usersRes] = await Promise.all([
-        fetch(`${api_url}/bookings`, {
+      const [bookingsData, carsData, reviewsData, usersData] = await Promise.all([
+        fetchAllPages(`${api_url}/bookings`, {
           headers: { Authorization: `Bearer ${auth_token}` }
         }),
-        fetch(`${api_url}/cars`),
-        fetch(`${api_url}/reviews`),
-        fetch(`${api_url}/users`, {
+        fetchAllPages(`${api_url}/cars`),
+        fetchAllPages(`${api_url}/reviews`),
+        fetchAllPages(`${api_url}/users`, {
           headers: { Authorization: `Bearer ${auth_token}` }
         }),
       ]);
 
-      const [bookingsData, carsData, reviewsData, usersData] = await Promise.all([
-        bookingsRes.json(),
-        carsRes.json(),
-        reviewsRes.json(),
-        usersRes.json(),
-      ]);
-
       setBookings(bookingsData);
       setCars(carsData);
       setReviews(reviewsData);
@@ -46,7 +40,7 @@ export const AdminProvider = ({ children }) => {
 
  const deleteUser = async (userId) => {
   try {
-    const res = await fetch(`${api_url}/users/${userId}`, {
+    const res = await apiFetch(`${api_url}/users/${userId}`, {
       method: 'DELETE',
       headers: { Authorization: `Bearer ${auth_token}` },
     });
@@ -70,7 +64,7 @@ export const AdminProvider = ({ children }) => {
     const toastId = toast.loading("Updating booking status...");
 
     try {
-      const response = await fetch(`${api_url}/bookings/${id}/`, {
+      const response = await apiFetch(`${api_url}/bookings/${id}/`, {
         method: 'PATCH',
         headers: {
           'Content-Type': 'application/json',
@@ -106,7 +100,7 @@ export const AdminProvider = ({ children }) => {
         const carId = updatedBooking.car_id;
         const carStatus = newStatus === 'cancelled' ? 'available' : 'booked';
 
-        const carRes = await fetch(`${api_url}/cars/${carId}`, {
+        const carRes = await apiFetch(`${api_url}/cars/${carId}`, {
           method: 'PATCH',
           headers: {
             'Content-Type': 'application/json',
@@ -140,7 +134,7 @@ export const AdminProvider = ({ children }) => {
   };
 const deleteBooking = async (id) => {
   try {
-    const res = await fetch(`${api_url}/bookings/${id}/`, {
+    const res = await apiFetch(`${api_url}/bookings/${id}/`, {
       method: 'DELETE',
       headers: { Authorization: `Bearer ${auth_token}` },
     });
@@ -155,7 +149,7 @@ const deleteBooking = async (id) => {
 
 const deleteReview = async (id) => {
   try {
-    const res = await fetch(`${api_url}/reviews/${id}/`, {
+    const res = await apiFetch(`${api_url}/reviews/${id}/`, {
       method: 'DELETE',
       headers: { Authorization: `Bearer ${auth_token}` },
     });
@@ -2,6 +2,7 @@ import React, { createContext, useState, useEffect } from 'react';
 import { toast } from 'react-toastify';
 import { useNavigate } from 'react-router-dom';
 import { api_url } from "../config.json";
+import { apiFetch } from "../utils/api";
 
 export const UserContext = createContext();
 
@@ -17,7 +18,7 @@ export const UserProvider = ({ children }) => {
 function register_user(username, email, password) {
     toast.loading("Registering user...");
 
-    fetch(`${api_url}/users`, {
+    apiFetch(`${api_url}/users`, {
         method: "POST",
         headers: {
             "Content-Type": "application/json"
@@ -47,7 +48,7 @@ function register_user(username, email, password) {
     function login_user(email, password) {
         toast.loading("Logging you in...");
 
-        fetch(`${api_url}/login`, {
+        apiFetch(`${api_url}/login`, {
             method: "POST",
             headers: {
                 "Content-Type": "application/json"
@@ -73,7 +74,7 @@ function register_user(username, email, password) {
 
     // ======= Function to logout a user ========
 function logout_user() {
-  fetch(`${api_url}/logout`, {
+  apiFetch(`${api_url}/logout`, {
     method: "DELETE",
     headers: {
       Authorization: `Bearer ${auth_token}`,
@@ -108,7 +109,7 @@ function delete_profile() {
 
   toast.loading("Deleting profile...");
 
-  fetch(`${api_url}/users/${userId}/`, {
+  apiFetch(`${api_url}/users/${userId}/`, {
     method: "DELETE",
     headers: {
       "Content-Type": "application/json",
@@ -147,7 +148,7 @@ function delete_profile() {
 
   toast.loading("Updating profile...");
 
-  fetch(`${api_url}/users/${user_id}/`, {
+  apiFetch(`${api_url}/users/${user_id}/`, {
     method: "PUT",
     headers: {
       "Content-Type": "application/json",
@@ -185,7 +186,7 @@ function delete_profile() {
     // ======= Get current user data =======
     useEffect(() => {
         if (auth_token) {
-            fetch(`${api_url}/current_user`, {
+            apiFetch(`${api_url}/current_user`, {
                 method: "GET",
                 headers: {
                     "Content-Type": "application/json",
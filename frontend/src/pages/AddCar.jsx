@@ -2,6 +2,7 @@ import React, { useState, useContext } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { UserContext } from '../context/UserContext';
 import { api_url } from '../config.json';
+import { apiFetch } from '../utils/api';
 import { toast } from 'react-toastify';
 
 const AddCar = () => {
@@ -32,7 +33,7 @@ const AddCar = () => {
     }
 
     try {
-      const response = await fetch(`${api_url}/cars`, {
+      const response = await apiFetch(`${api_url}/cars`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
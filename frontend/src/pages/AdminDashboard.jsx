@@ -5,6 +5,7 @@ import { toast } from 'react-toastify';
 import { UserContext } from '../context/UserContext';
 import { AdminContext } from '../context/AdminContext';
 import { api_url } from '../config.json';
+import { apiFetch } from '../utils/api';
 
 const AdminDashboard = () => {
   const { currentUser, logout_user } = useContext(UserContext);
@@ -52,7 +53,7 @@ const AdminDashboard = () => {
 
     const toastId = toast.loading('Updating status...');
     try {
-      const res = await fetch(`${api_url}/bookings/${bookingId}/`, {
+      const res = await apiFetch(`${api_url}/bookings/${bookingId}/`, {
         method: "PATCH",
         headers: {
           "Content-Type": "application/json",
@@ -69,7 +70,7 @@ const AdminDashboard = () => {
                         updatedStatus === 'cancelled' ? 'available' : null;
 
       if (newCarStatus) {
-        await fetch(`${api_url}/cars/${carId}/`, {
+        await apiFetch(`${api_url}/cars/${carId}/`, {
           method: "PATCH",
           headers: {
             "Content-Type": "application/json",
@@ -199,7 +200,7 @@ const AdminDashboard = () => {
                 className: 'bg-blue-50 text-blue-800'
               });
               try {
-                const res = await fetch(`${api_url}/cars/${car.id}/`, {
+                const res = await apiFetch(`${api_url}/cars/${car.id}/`, {
                   method: "PATCH",
                   headers: {
                     "Content-Type": "application/json",
@@ -252,7 +253,7 @@ const AdminDashboard = () => {
                   className: 'bg-blue-50 text-blue-800'
                 });
                 try {
-                  const res = await fetch(`${api_url}/cars/${car.id}/`, {
+                  const res = await apiFetch(`${api_url}/cars/${car.id}/`, {
                     method: "DELETE",
                     headers: {
                       Authorization: `Bearer ${localStorage.getItem("access_token")}`
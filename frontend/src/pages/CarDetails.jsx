@@ -2,6 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { toast } from 'react-toastify';
 import { api_url } from '../config.json';
+import { apiFetch } from '../utils/api';
 
 const CarDetails = () => {
   const { id } = useParams();
@@ -17,8 +18,8 @@ const CarDetails = () => {
   const fetchCarDetails = async () => {
     try {
       const [carRes, reviewsRes] = await Promise.all([
-        fetch(`${api_url}/cars/${id}`),
-        fetch(`${api_url}/reviews/car/${id}`)
+        apiFetch(`${api_url}/cars/${id}`),
+        apiFetch(`${api_url}/reviews/car/${id}`)
       ]);
       
       const carData = await carRes.json();
@@ -44,7 +45,7 @@ const handleSubmitReview = async (e) => {
 
   try {
     
-    const response = await fetch(`${api_url}/reviews`, {
+    const response = await apiFetch(`${api_url}/reviews`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -65,7 +66,7 @@ const handleSubmitReview = async (e) => {
     const result = await response.json();
 
     
-    const userRes = await fetch(`${api_url}/users`, {
+    const userRes = await apiFetch(`${api_url}/users`, {
       headers: {
         Authorization: `Bearer ${token}`
       }
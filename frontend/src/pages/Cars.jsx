@@ -2,6 +2,7 @@ import React, { useEffect, useState, useContext } from 'react';
 import { toast } from 'react-toastify';
 import { api_url } from '../config.json';
 import { UserContext } from '../context/UserContext';
+import { apiFetch, fetchAllPages } from '../utils/api';
 import DatePicker from 'react-datepicker';
 import 'react-datepicker/dist/react-datepicker.css';
 import { useNavigate } from 'react-router-dom';
@@ -13,6 +14,7 @@ const Cars = () => {
   const [selectedCar, setSelectedCar] = useState(null);
   const [startDate, setStartDate] = useState(null);
   const [endDate, setEndDate] = useState(null);
+  const [blockedDates, setBlockedDates] = useState([]);
   const [isBooking, setIsBooking] = useState(false);
   const { auth_token, currentUser } = useContext(UserContext);
   const [activeImageIndex, setActiveImageIndex] = useState({});
@@ -50,13 +52,12 @@ const Cars = () => {
       toast.warning('You must be logged in to view cars.');
       return;
     }
-    fetch(`${api_url}/cars`, {
+    fetchAllPages(`${api_url}/cars`, {
       headers: {
         'Content-Type': 'application/json',
         Authorization: `Bearer ${token}`,
       },
     })
-      .then((res) => res.json())
       .then((data) => {
         const carsWithStatus = data.map((car) => ({
           ...car,
@@ -77,10 +78,9 @@ const Cars = () => {
 
   const fetchBookings = async () => {
     try {
-      const res = await fetch(`${api_url}/bookings`, {
+      const data = await fetchAllPages(`${api_url}/bookings`, {
         headers: { Authorization: `Bearer ${auth_token}` },
       });
-      const data = await res.json();
 
       if (Array.isArray(data)) {
         setCarBookings(data);
@@ -94,6 +94,28 @@ const Cars = () => {
     }
   };
 
+  // Booked days for the next six months, sent as a bitmap: bit i is day i after `from`
+  const fetchCalendar = async (carId) => {
+    try {
+      const res = await apiFetch(`${api_url}/cars/${carId}/calendar?months=6`);
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.error || 'Failed to load availability');
+      const bits = Uint8Array.from(atob(data.bitmap), (c) => c.charCodeAt(0));
+      const [year, month, day] = data.from.split('-').map(Number);
+      const days = [];
+      for (let i = 0; i < data.days; i++) {
+        if (bits[i >> 3] & (1 << (i & 7))) days.push(new Date(year, month - 1, day + i));
+      }
+      setBlockedDates(days);
+    } catch (err) {
+      setBlockedDates([]);
+      console.error('Error fetching availability:', err.message);
+    }
+  };
+
+  // A booking can end on the next booked day (check-out day), not after it
+  const nextBlockedDate = startDate && blockedDates.find((d) => d > startDate);
+
   const getEndDatesForCar = (carId) =>
     Array.isArray(carBookings)
       ? carBookings
@@ -109,6 +131,8 @@ const Cars = () => {
     setSelectedCar(car);
     setStartDate(null);
     setEndDate(null);
+    setBlockedDates([]);
+    fetchCalendar(car.id);
   };
 
   const handleSubmitBooking = async () => {
@@ -122,7 +146,7 @@ const Cars = () => {
     }
     setIsBooking(true);
     try {
-      const response = await fetch(`${api_url}/bookings`, {
+      const response = await apiFetch(`${api_url}/bookings`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -161,7 +185,7 @@ const Cars = () => {
 
   const handleEditFormSubmit = async () => {
     try {
-      const res = await fetch(`${api_url}/cars/${editingCar.id}/`, {
+      const res = await apiFetch(`${api_url}/cars/${editingCar.id}/`, {
         method: 'PATCH',
         headers: {
           'Content-Type': 'application/json',
@@ -311,6 +335,7 @@ const Cars = () => {
                 selected={startDate}
                 onChange={(date) => setStartDate(date)}
                 minDate={new Date()}
+                excludeDates={blockedDates}
                 className="w-full p-2 border rounded"
               />
             </div>
@@ -320,6 +345,7 @@ const Cars = () => {
                 selected={endDate}
                 onChange={(date) => setEndDate(date)}
                 minDate={startDate || new Date()}
+                maxDate={nextBlockedDate || null}
                 className="w-full p-2 border rounded"
               />
             </div>
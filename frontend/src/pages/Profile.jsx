@@ -3,6 +3,7 @@ import { UserContext } from '../context/UserContext';
 import { toast } from 'react-toastify';
 import { useNavigate } from 'react-router-dom';
 import { api_url } from '../config.json';
+import { apiFetch, fetchAllPages } from '../utils/api';
 
 const Profile = () => {
   const { currentUser, update_user_profile, delete_profile, logout_user, auth_token } = useContext(UserContext);
@@ -37,10 +38,9 @@ const Profile = () => {
 
   const fetchCars = async () => {
     try {
-      const res = await fetch(`${api_url}/cars`, {
+      const data = await fetchAllPages(`${api_url}/cars`, {
         headers: { Authorization: `Bearer ${auth_token}` }
       });
-      const data = await res.json();
       setCars(data);
       fetchUserBookings(data);
     } catch (err) {
@@ -51,10 +51,9 @@ const Profile = () => {
   const fetchUserBookings = async (carList) => {
     setIsLoading(true);
     try {
-      const res = await fetch(`${api_url}/bookings/user/${currentUser.id}/`, {
+      const data = await fetchAllPages(`${api_url}/bookings/user/${currentUser.id}/`, {
         headers: { Authorization: `Bearer ${auth_token}` }
       });
-      const data = await res.json();
       const enriched = data.map(b => {
         const car = carList.find(c => c.id === b.car_id);
         return { ...b, car };
@@ -95,7 +94,7 @@ const Profile = () => {
     if (!window.confirm("Cancel this booking?")) return;
     const toastId = toast.loading("Cancelling...");
     try {
-      const res = await fetch(`${api_url}/bookings/${id}/`, {
+      const res = await apiFetch(`${api_url}/bookings/${id}/`, {
         method: 'PATCH',
         headers: {
           'Content-Type': 'application/json',
@@ -107,7 +106,7 @@ const Profile = () => {
       if (!res.ok) throw new Error(data.error || "Error cancelling");
 
       
-      await fetch(`${api_url}/cars/${carId}/status`, {
+      await apiFetch(`${api_url}/cars/${carId}/status`, {
         method: 'PATCH',
         headers: {
           'Content-Type': 'application/json',
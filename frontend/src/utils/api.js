@@ -0,0 +1,41 @@
+// After a write the API answers with X-Last-Write. Sending it back for a while
+// keeps this client's reads on the primary database rather than a read replica
+// that may not have the write yet (the server decides for how long).
+const ECHO_LAST_WRITE_MS = 60 * 1000;
+let lastWrite = null;
+let lastWriteAt = 0;
+
+export const apiFetch = async (url, options = {}) => {
+  const headers = lastWrite && Date.now() - lastWriteAt < ECHO_LAST_WRITE_MS
+    ? { ...options.headers, 'X-Last-Write': lastWrite }
+    : options.headers;
+  const res = await fetch(url, { ...options, headers });
+  const wrote = res.headers.get('X-Last-Write');
+  if (wrote) {
+    lastWrite = wrote;
+    lastWriteAt = Date.now();
+  }
+  return res;
+};
+
+// List endpoints (/cars, /bookings, /reviews, /users) answer one page at a time
+// and put the cursor of the next page in X-Next-Cursor. fetchAllPages follows
+// it and returns every item, or the error body of the first failed page.
+export const PAGE_LIMIT = 500;
+
+export const fetchAllPages = async (url, options = {}) => {
+  const separator = url.includes('?') ? '&' : '?';
+  let items = [];
+  let cursor = null;
+  do {
+    const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+    const res = await apiFetch(`${url}${separator}limit=${PAGE_LIMIT}${cursorParam}`, options);
+    const data = await res.json();
+    if (!res.ok || !Array.isArray(data)) {
+      return data;
+    }
+    items = items.concat(data);
+    cursor = res.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return items;
+};